@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Deterministic generators of synthetic data files used by the benchmarks. Each
+generator takes a random.Random and the number of records, and yields the
+lines of the data file (including the header line for CSV files). The same
+seed always produces the same file, so the results of different versions of
+the code can be compared.
+"""
+
+import json
+import random
+import string
+
+TIMESTAMP_FORMATS = [
+    '{y:04}-{mo:02}-{d:02}T{h:02}:{mi:02}:{s:02}',
+    '{y:04}-{mo:02}-{d:02} {h:02}:{mi:02}:{s:02}.{us:06} UTC',
+    '{y:04}-{mo:02}-{d:02}T{h:02}:{mi:02}:{s:02}+05:30',
+]
+
+
+def random_word(rng, length=8):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def random_scalar(rng):
+    kind = rng.randrange(5)
+    if kind == 0:
+        return rng.randrange(-10**9, 10**9)
+    if kind == 1:
+        return rng.uniform(-1e6, 1e6)
+    if kind == 2:
+        return rng.random() < 0.5
+    if kind == 3:
+        return None
+    return random_word(rng)
+
+
+def random_timestamp(rng):
+    return rng.choice(TIMESTAMP_FORMATS).format(
+        y=rng.randrange(1970, 2038),
+        mo=rng.randrange(1, 13),
+        d=rng.randrange(1, 29),
+        h=rng.randrange(24),
+        mi=rng.randrange(60),
+        s=rng.randrange(60),
+        us=rng.randrange(10**6),
+    )
+
+
+def wide_flat_json(rng, num_records, num_columns=500):
+    """Flat records with many columns of fixed types, each record containing
+    a random half of the columns.
+    """
+    types = [rng.randrange(4) for _ in range(num_columns)]
+    for _ in range(num_records):
+        record = {}
+        for column, column_type in enumerate(types):
+            if rng.random() < 0.5:
+                continue
+            if column_type == 0:
+                value = rng.randrange(10**6)
+            elif column_type == 1:
+                value = rng.uniform(0, 1000)
+            elif column_type == 2:
+                value = rng.random() < 0.5
+            else:
+                value = random_word(rng)
+            record[f'column_{column}'] = value
+        yield json.dumps(record)
+
+
+def deep_nested_json(rng, num_records, depth=30, width=3):
+    """Records nested 'depth' levels deep, with a few scalars per level."""
+    for _ in range(num_records):
+        record = {}
+        node = record
+        for level in range(depth):
+            for i in range(width):
+                node[f'f{i}'] = random_scalar(rng)
+            child = {}
+            node[f'level_{level}'] = child
+            node = child
+        yield json.dumps(record)
+
+
+def big_arrays_json(rng, num_records, array_length=1000):
+    """Records with long arrays of integers, floats and records."""
+    for _ in range(num_records):
+        yield json.dumps({
+            'ints': [rng.randrange(10**6) for _ in range(array_length)],
+            'floats': [rng.random() for _ in range(array_length)],
+            'records': [
+                {'id': i, 'name': random_word(rng, 4)}
+                for i in range(array_length // 10)
+            ],
+        })
+
+
+def many_columns_csv(rng, num_records, num_columns=300):
+    """CSV file with many columns, with some empty values."""
+    yield ','.join(f'column_{column}' for column in range(num_columns))
+    types = [rng.randrange(4) for _ in range(num_columns)]
+    for _ in range(num_records):
+        values = []
+        for column_type in types:
+            if rng.random() < 0.1:
+                values.append('')
+            elif column_type == 0:
+                values.append(str(rng.randrange(10**6)))
+            elif column_type == 1:
+                values.append(repr(rng.uniform(0, 1000)))
+            elif column_type == 2:
+                values.append(rng.choice(['true', 'false']))
+            else:
+                values.append(random_word(rng))
+        yield ','.join(values)
+
+
+def quoted_numerics_json(rng, num_records, num_columns=50):
+    """Records whose values are mostly numbers and booleans in quotes, which
+    exercises the QINTEGER, QFLOAT and QBOOLEAN inference.
+    """
+    for _ in range(num_records):
+        record = {}
+        for column in range(num_columns):
+            kind = column % 3
+            if kind == 0:
+                value = str(rng.randrange(-10**12, 10**12))
+            elif kind == 1:
+                value = repr(rng.uniform(-1e6, 1e6))
+            else:
+                value = rng.choice(['true', 'false', 'True', 'FALSE'])
+            record[f'q{column}'] = value
+        yield json.dumps(record)
+
+
+def timestamps_json(rng, num_records, num_columns=20):
+    """Records of TIMESTAMP, DATE and TIME strings in various formats."""
+    for _ in range(num_records):
+        record = {}
+        for column in range(num_columns):
+            kind = column % 3
+            if kind == 0:
+                value = random_timestamp(rng)
+            elif kind == 1:
+                value = random_timestamp(rng)[:10]
+            else:
+                value = random_timestamp(rng)[11:19]
+            record[f't{column}'] = value
+        yield json.dumps(record)
+
+
+def key_explosion_json(rng, num_records, keys_per_record=20):
+    """Records with an object used as a map, whose keys are mostly unique
+    IDs, so the number of columns grows with the number of records.
+    """
+    for _ in range(num_records):
+        yield json.dumps({
+            'id': rng.randrange(10**9),
+            'users': {
+                f'user_{rng.randrange(10**7)}': {
+                    'score': rng.randrange(100),
+                    'name': random_word(rng, 6),
+                }
+                for _ in range(keys_per_record)
+            },
+        })
+
+
+def stable_events_json(rng, num_records):
+    """Event records whose keys and types never change after the first
+    record, with a nested record and arrays, like the logs of a service.
+    """
+    for i in range(num_records):
+        yield json.dumps({
+            'event_id': i,
+            'timestamp': random_timestamp(rng),
+            'kind': rng.choice(['click', 'view', 'purchase']),
+            'latency': rng.uniform(0, 10),
+            'success': rng.random() < 0.9,
+            'user': {
+                'id': rng.randrange(10**6),
+                'name': random_word(rng),
+                'country': rng.choice(['US', 'FR', 'JP']),
+            },
+            'tags': [random_word(rng, 4) for _ in range(rng.randrange(1, 4))],
+            'items': [
+                {'sku': random_word(rng, 6), 'price': rng.uniform(1, 100)}
+                for _ in range(rng.randrange(1, 3))
+            ],
+        })
+
+
+def heartbeats_json(rng, num_records, num_hosts=20):
+    """Heartbeat records of a few hosts, most of them byte-identical lines."""
+    hosts = [random_word(rng) for _ in range(num_hosts)]
+    for _ in range(num_records):
+        host = rng.randrange(num_hosts)
+        yield json.dumps({
+            'host': hosts[host],
+            'status': 'ok' if rng.random() < 0.99 else 'degraded',
+            'version': '1.4.2',
+            'metrics': {'cpus': 4 + host % 4, 'zone': f'zone-{host % 3}'},
+        })
+
+
+# Map of the benchmark case name to (input_format, generator, default number
+# of records). The number of records is chosen so that each case takes about a
+# second.
+CASES = {
+    'wide_flat_json': ('json', wide_flat_json, 500),
+    'deep_nested_json': ('json', deep_nested_json, 1500),
+    'big_arrays_json': ('json', big_arrays_json, 100),
+    'many_columns_csv': ('csv', many_columns_csv, 1000),
+    'quoted_numerics_json': ('json', quoted_numerics_json, 2000),
+    'timestamps_json': ('json', timestamps_json, 5000),
+    'key_explosion_json': ('json', key_explosion_json, 1000),
+    'stable_events_json': ('json', stable_events_json, 10000),
+    'heartbeats_json': ('json', heartbeats_json, 50000),
+}
+
+
+def write_case(name, path, num_records=None, seed=0):
+    """Write the data file of the benchmark case 'name' to 'path'. Returns
+    the number of records written.
+    """
+    _, generator, default_num_records = CASES[name]
+    if num_records is None:
+        num_records = default_num_records
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for line in generator(rng, num_records):
+            f.write(line)
+            f.write('\n')
+    return num_records
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measure the throughput of SchemaGenerator.deduce_schema() and
+flatten_schema() on the synthetic data files of generators.py. Usage (from the
+top level directory of the repository):
+
+    $ python3 -m benchmarks.run_benchmarks [--cases CASE ...] [--records N]
+        [--repeat N] [--output results.json]
+
+Each run of each case is performed in a separate child process, so that its
+peak RSS is not polluted by the previous cases. The best (fastest) of the
+'--repeat' runs is reported, as a table on the STDERR and optionally as a JSON
+file which can be compared with the results of another version of the code.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.version import __version__
+from benchmarks.generators import CASES
+from benchmarks.generators import write_case
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of the current process."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # The unit of ru_maxrss is bytes on MacOS but kilobytes on Linux.
+    if sys.platform == 'darwin':
+        return max_rss
+    return max_rss * 1024
+
+
+def run_case(input_format, data_path, options):
+    """Run a single benchmark on the data file at 'data_path' in the current
+    process, and return the measurements as a dict.
+    """
+    generator = SchemaGenerator(input_format=input_format, **options)
+    newline = '' if input_format == 'csv' else None
+    start_rss = peak_rss_bytes()
+    with open(data_path, encoding='utf-8', newline=newline) as input_file:
+        start = time.perf_counter()
+        schema_map, error_logs = generator.deduce_schema(input_file)
+        deduce_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    schema = generator.flatten_schema(schema_map)
+    flatten_seconds = time.perf_counter() - start
+    return {
+        'deduce_seconds': deduce_seconds,
+        'flatten_seconds': flatten_seconds,
+        'num_top_level_fields': len(schema),
+        'num_errors': len(error_logs),
+        'start_rss_bytes': start_rss,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def run_case_in_child(name, data_path, options):
+    """Run the benchmark case 'name' in a new Python process."""
+    command = [
+        sys.executable, '-m', 'benchmarks.run_benchmarks',
+        '--child', name, data_path, json.dumps(options),
+    ]
+    output = subprocess.run(
+        command, check=True, stdout=subprocess.PIPE,
+        universal_newlines=True).stdout
+    return json.loads(output)
+
+
+def run_benchmarks(names, num_records, repeat, options, tmpdir):
+    results = []
+    for name in names:
+        input_format = CASES[name][0]
+        data_path = os.path.join(tmpdir, f'{name}.{input_format}')
+        records = write_case(name, data_path, num_records)
+        size = os.path.getsize(data_path)
+
+        runs = [
+            run_case_in_child(name, data_path, options)
+            for _ in range(repeat)
+        ]
+        best = min(runs, key=lambda run: run['deduce_seconds'])
+        deduce_seconds = best['deduce_seconds']
+        results.append({
+            'case': name,
+            'input_format': input_format,
+            'records': records,
+            'bytes': size,
+            'deduce_seconds': deduce_seconds,
+            'flatten_seconds': best['flatten_seconds'],
+            'records_per_sec': records / deduce_seconds,
+            'mb_per_sec': size / 1e6 / deduce_seconds,
+            'num_top_level_fields': best['num_top_level_fields'],
+            'num_errors': best['num_errors'],
+            'peak_rss_mb': best['peak_rss_bytes'] / 1e6,
+            'rss_growth_mb':
+                (best['peak_rss_bytes'] - best['start_rss_bytes']) / 1e6,
+        })
+        os.remove(data_path)
+    return results
+
+
+def print_table(results, file):
+    print(f"{'case':<22}{'records/s':>12}{'MB/s':>8}{'flatten ms':>12}"
+          f"{'fields':>8}{'peak MB':>9}", file=file)
+    for result in results:
+        print(
+            f"{result['case']:<22}"
+            f"{result['records_per_sec']:>12.0f}"
+            f"{result['mb_per_sec']:>8.2f}"
+            f"{result['flatten_seconds'] * 1000:>12.1f}"
+            f"{result['num_top_level_fields']:>8}"
+            f"{result['peak_rss_mb']:>9.1f}",
+            file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the schema deduction on synthetic data')
+    parser.add_argument(
+        '--cases',
+        help='Names of the benchmark cases (default: all)',
+        nargs='+',
+        choices=sorted(CASES),
+        default=list(CASES))
+    parser.add_argument(
+        '--records',
+        help='Number of records of each case (default: per case)',
+        type=int,
+        default=None)
+    parser.add_argument(
+        '--repeat',
+        help='Number of runs of each case, the fastest is reported',
+        type=int,
+        default=3)
+    parser.add_argument(
+        '--options',
+        help='JSON object of additional SchemaGenerator options',
+        default='{}')
+    parser.add_argument(
+        '--output',
+        help='Write the results to this JSON file',
+        default=None)
+    parser.add_argument(
+        '--child',
+        help=argparse.SUPPRESS,
+        nargs=3)
+    args = parser.parse_args()
+
+    if args.child:
+        name, data_path, options = args.child
+        result = run_case(CASES[name][0], data_path, json.loads(options))
+        json.dump(result, sys.stdout)
+        return
+
+    options = json.loads(args.options)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        results = run_benchmarks(
+            args.cases, args.records, args.repeat, options, tmpdir)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print_table(results, sys.stderr)
+    if args.output:
+        report = {
+            'version': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'options': options,
+            'results': results,
+        }
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+            print(file=output_file)
+
+
+if __name__ == '__main__':
+    main()
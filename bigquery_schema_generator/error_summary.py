@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Bounded alternative to the list of error logs collected by SchemaGenerator,
+enabled by the 'max_error_samples' option (--max_error_samples flag). On dirty
+data, the same problem is often repeated on millions of lines. Instead of
+keeping one message per occurrence, the errors are aggregated by their kind
+(the message template given to SchemaGenerator.log_error()) and the path of
+the field, keeping only a count, the first and last locations and a few
+samples. The messages are formatted only when the summary is reported.
+"""
+
+from collections import OrderedDict
+
+# Maximum number of distinct (kind, path) keys. Beyond that, new errors are
+# aggregated by their kind only, which is a small fixed set.
+MAX_ERROR_KEYS = 10000
+
+
+class AggregatedError:
+    """The occurrences of a single kind of error on a single field."""
+
+    __slots__ = ('msg', 'path', 'count', 'first', 'last', 'samples')
+
+    def __init__(self, msg, path):
+        self.msg = msg
+        self.path = path
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.samples = []
+
+
+class ErrorSummary:
+    """Aggregate the errors by (kind, path).
+
+    Usage:
+        summary = ErrorSummary(max_samples=3)
+        summary.add(input_path, line_number, msg, args, path)
+        ...
+        error_logs = summary.to_error_logs()
+    """
+
+    def __init__(self, max_samples=3, max_keys=MAX_ERROR_KEYS):
+        # Always keep at least one sample to format the message.
+        self.max_samples = max(max_samples, 1)
+        self.max_keys = max_keys
+        self.errors = OrderedDict()
+
+    def add(self, input_path, line_number, msg, args, path=None):
+        """Record an error whose message is msg.format(*args). The 'path'
+        (which may be any object whose str() is the path of the field) and
+        the 'args' are kept only for the first 'max_samples' occurrences.
+        """
+        path = None if path is None else str(path)
+        key = (msg, path)
+        error = self.errors.get(key)
+        if error is None:
+            if len(self.errors) >= self.max_keys:
+                path = None
+                key = (msg, None)
+                error = self.errors.get(key)
+            if error is None:
+                error = AggregatedError(msg, path)
+                self.errors[key] = error
+        location = (input_path, line_number)
+        error.count += 1
+        if error.first is None:
+            error.first = location
+        error.last = location
+        if len(error.samples) < self.max_samples:
+            error.samples.append((input_path, line_number, args))
+
+    def merge(self, other):
+        """Merge the 'other' ErrorSummary (e.g. from a different file) into
+        this one.
+        """
+        for key, other_error in other.errors.items():
+            error = self.errors.get(key)
+            if error is None:
+                self.errors[key] = other_error
+                continue
+            error.count += other_error.count
+            error.last = other_error.last
+            room = self.max_samples - len(error.samples)
+            error.samples.extend(other_error.samples[:max(room, 0)])
+        return self
+
+    def to_error_logs(self):
+        """Return the summary in the same format as the list of error logs,
+        one entry per (kind, path), in the order of first occurrence. Each
+        entry has the following additional items:
+
+        * count: total number of occurrences
+        * last_input_path, last_line_number: location of the last occurrence
+        * samples: list of {'input_path', 'line_number', 'msg'} of the first
+          occurrences
+        """
+        error_logs = []
+        for error in self.errors.values():
+            samples = [
+                {
+                    'line_number': line_number,
+                    'input_path': input_path,
+                    'msg': error.msg.format(*args) if args else error.msg,
+                }
+                for input_path, line_number, args in error.samples
+            ]
+            msg = samples[0]['msg']
+            if error.count > 1:
+                msg += f' (repeated {error.count} times)'
+            error_logs.append({
+                'line_number': error.first[1],
+                'input_path': error.first[0],
+                'msg': msg,
+                'count': error.count,
+                'last_line_number': error.last[1],
+                'last_input_path': error.last[0],
+                'samples': samples,
+            })
+        return error_logs
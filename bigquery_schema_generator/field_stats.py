@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-field statistics collected by SchemaGenerator while it deduces the schema,
+when the 'field_stats' option (--stats flag) is enabled. A FieldStats object is
+attached to each schema_entry under the 'stats' key and is merged along with
+the schema_entry itself, so the statistics cover every record which contained
+the field.
+"""
+
+from collections import OrderedDict
+from bigquery_schema_generator.hyperloglog import HyperLogLog
+from bigquery_schema_generator.numeric import parse_integer_literal
+
+# Types which have a numerical min and max.
+NUMERIC_TYPES = frozenset(['INTEGER', 'FLOAT', 'QINTEGER', 'QFLOAT'])
+
+# Types whose values are Python strings.
+STRING_VALUE_TYPES = frozenset([
+    'STRING', 'TIMESTAMP', 'DATE', 'TIME', 'QINTEGER', 'QFLOAT', 'QBOOLEAN'
+])
+
+
+class FieldStats:
+    """Counters for the values of a single field:
+
+    * non_null_count: number of values which were not null
+    * null_count: number of null values (or empty CSV values)
+    * empty_count: number of empty arrays [] or empty records {}
+    * type_counts: {type: count} of the type inferred for each value, before
+      it was widened by merging with other values (e.g. QINTEGER and QFLOAT
+      are counted separately)
+    * min_value, max_value: range of the numerical values
+    * max_length: length of the longest string value
+    * sketch: HyperLogLog sketch of the distinct non-null values, if
+      'track_distinct' is True
+
+    For arrays, the type is the type of the array elements, and the range and
+    length are taken over all the elements.
+    """
+
+    __slots__ = (
+        'non_null_count',
+        'null_count',
+        'empty_count',
+        'type_counts',
+        'min_value',
+        'max_value',
+        'max_length',
+        'sketch',
+        'distinct_values',
+    )
+
+    def __init__(self, track_distinct=False):
+        self.non_null_count = 0
+        self.null_count = 0
+        self.empty_count = 0
+        self.type_counts = {}
+        self.min_value = None
+        self.max_value = None
+        self.max_length = None
+
+        # The FieldStats of a single value holds on to the value itself
+        # instead of allocating a new sketch, which is created only when it is
+        # merged into the FieldStats of the existing schema_entry.
+        self.sketch = None
+        self.distinct_values = [] if track_distinct else None
+
+    def add_value(self, value, value_type):
+        """Add the 'value' whose type was inferred to be 'value_type' by
+        SchemaGenerator.infer_bigquery_type().
+        """
+        if value_type == '__null__':
+            self.null_count += 1
+            return
+        self.non_null_count += 1
+        if value_type in ['__empty_array__', '__empty_record__']:
+            self.empty_count += 1
+            return
+
+        self.type_counts[value_type] = self.type_counts.get(value_type, 0) + 1
+        elements = value if isinstance(value, list) else (value,)
+        if value_type in NUMERIC_TYPES:
+            for element in elements:
+                if isinstance(element, str):
+                    if value_type == 'QINTEGER':
+                        element = parse_integer_literal(element)
+                    else:
+                        element = float(element)
+                self.add_number(element)
+        if value_type in STRING_VALUE_TYPES:
+            length = max(len(element) for element in elements)
+            if self.max_length is None or self.max_length < length:
+                self.max_length = length
+        if (self.distinct_values is not None
+                and value_type not in ['RECORD', 'JSON']):
+            self.distinct_values.extend(elements)
+
+    def add_number(self, number):
+        if self.min_value is None or number < self.min_value:
+            self.min_value = number
+        if self.max_value is None or number > self.max_value:
+            self.max_value = number
+
+    def merge(self, other):
+        """Merge the counters of the 'other' FieldStats into this one."""
+        self.non_null_count += other.non_null_count
+        self.null_count += other.null_count
+        self.empty_count += other.empty_count
+        for value_type, count in other.type_counts.items():
+            self.type_counts[value_type] = \
+                self.type_counts.get(value_type, 0) + count
+        if other.min_value is not None:
+            self.add_number(other.min_value)
+            self.add_number(other.max_value)
+        if other.max_length is not None:
+            if self.max_length is None or self.max_length < other.max_length:
+                self.max_length = other.max_length
+        if self.distinct_values is not None:
+            sketch = self.get_sketch()
+            if other.distinct_values:
+                for value in other.distinct_values:
+                    sketch.add(value)
+                other.distinct_values.clear()
+            if other.sketch is not None:
+                sketch.merge(other.sketch)
+        return self
+
+    def get_sketch(self):
+        """Return the HyperLogLog sketch, creating it from the values of
+        add_value() if necessary.
+        """
+        if self.sketch is None:
+            self.sketch = HyperLogLog()
+        if self.distinct_values:
+            for value in self.distinct_values:
+                self.sketch.add(value)
+            self.distinct_values.clear()
+        return self.sketch
+
+    def to_dict(self):
+        """Return the JSON representation of the statistics. The range and
+        length are omitted if there were no numerical or string values.
+        """
+        result = OrderedDict([
+            ('non_null_count', self.non_null_count),
+            ('null_count', self.null_count),
+            ('empty_count', self.empty_count),
+            ('type_counts', OrderedDict(sorted(self.type_counts.items()))),
+        ])
+        if self.min_value is not None:
+            result['min_value'] = self.min_value
+            result['max_value'] = self.max_value
+        if self.max_length is not None:
+            result['max_length'] = self.max_length
+        if self.distinct_values is not None:
+            result['approx_distinct_count'] = \
+                round(self.get_sketch().estimate())
+        return result
+
+
+def merge_entry_stats(old_schema_entry, new_schema_entry):
+    """Merge the FieldStats of 2 schema entries, and attach the result to
+    both entries, because either one can become the merged schema_entry. A
+    schema_entry created from an existing schema has no 'stats'.
+    """
+    old_stats = old_schema_entry.get('stats')
+    new_stats = new_schema_entry.get('stats')
+    if old_stats is None:
+        stats = new_stats
+    elif new_stats is None:
+        stats = old_stats
+    else:
+        stats = old_stats.merge(new_stats)
+    if stats is not None:
+        old_schema_entry['stats'] = stats
+        new_schema_entry['stats'] = stats
+
+
+def flatten_stats_map(schema_map, sorted_schema=True, base_path=None):
+    """Collect the FieldStats of every schema_entry in 'schema_map' into an
+    OrderedDict of {json_full_path: stats}, in the same order as the fields
+    of the flattened schema. Fields which were ignored or are only 'soft' are
+    included, since their statistics are often the reason for it.
+    """
+    result = OrderedDict()
+    # Depth-first traversal with an explicit stack of (items, base_path).
+    stack = [(iter_schema_map(schema_map, sorted_schema), base_path)]
+    while stack:
+        map_items, base_path = stack[-1]
+        for _, entry in map_items:
+            if not entry:
+                continue
+            info = entry['info']
+            name = info['name']
+            path = name if not base_path else f'{base_path}.{name}'
+            stats = entry.get('stats')
+            if stats is not None:
+                stats_dict = OrderedDict([('status', entry['status'])])
+                stats_dict.update(stats.to_dict())
+                result[path] = stats_dict
+            fields = info.get('fields')
+            if fields:
+                stack.append((iter_schema_map(fields, sorted_schema), path))
+                break
+        else:
+            stack.pop()
+    return result
+
+
+def iter_schema_map(schema_map, sorted_schema):
+    items = sorted(schema_map.items()) if sorted_schema \
+        else schema_map.items()
+    return iter(items)
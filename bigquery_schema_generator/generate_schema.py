@@ -22,20 +22,57 @@ Usage:
     $ generate_schema.py [-h] [flags ...] < file.data.json > file.schema.json
     $ generate_schema.py [-h] [flags ...] --input_format csv < file.data.csv \
         > file.schema.json
+    $ generate_schema.py [-h] [flags ...] file.data.json.gz > file.schema.json
 
 * file.data.json is a newline-delimited JSON data file, one JSON object per
   line.
 * file.data.csv is a CSV file with the column names on the first line
+* file.data.json.gz is a data file given by name instead of on the STDIN,
+  which may be compressed with gzip, bzip2, xz or zstd
 * file.schema.json is the schema definition of the table.
 """
 
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import argparse
+import copy
 import json
 import csv
 import logging
+import os
 import re
 import sys
+from bigquery_schema_generator.error_summary import ErrorSummary
+from bigquery_schema_generator.field_stats import FieldStats
+from bigquery_schema_generator.field_stats import flatten_stats_map
+from bigquery_schema_generator.field_stats import merge_entry_stats
+from bigquery_schema_generator.input_files import expand_input_paths
+from bigquery_schema_generator.input_files import open_input_file
+from bigquery_schema_generator.line_cache import DUPLICATE_LINE
+from bigquery_schema_generator.line_cache import LineCache
+from bigquery_schema_generator.numeric import classify_integer_literal
+from bigquery_schema_generator.numeric import loads_json
+from bigquery_schema_generator.numeric import raw_decode_json
+from bigquery_schema_generator.profiler import ProfileStats
+from bigquery_schema_generator.profiler import install_profiler
+from bigquery_schema_generator.progress import ProgressReporter
+from bigquery_schema_generator.progress import json_lines_callback
+from bigquery_schema_generator.projection import FieldProjection
+from bigquery_schema_generator.router import SchemaRouter
+from bigquery_schema_generator.router import route_file_names
+from bigquery_schema_generator.router import route_name
+from bigquery_schema_generator.schema_common import FieldPath
+from bigquery_schema_generator.schema_common import SchemaIncompatibleError
+from bigquery_schema_generator.schema_common import convert_type
+from bigquery_schema_generator.schema_common import format_location
+from bigquery_schema_generator.schema_common import is_string_type  # noqa
+from bigquery_schema_generator.schema_diff import diff_schema_maps
+from bigquery_schema_generator.schema_diff import summarize_changes
+from bigquery_schema_generator.shape_cache import ShapeCache
+from bigquery_schema_generator.specializer import SchemaSpecializer
+from bigquery_schema_generator.validator import SchemaValidator
+from bigquery_schema_generator.variants import SchemaVariants
+from bigquery_schema_generator.variants import parse_variant
 
 
 class SchemaGenerator:
@@ -76,6 +113,13 @@ class SchemaGenerator:
     # Valid field name characters of BigQuery
     FIELD_NAME_MATCHER = re.compile(r'[^a-zA-Z0-9_]')
 
+    # The types of the columns whose matcher is tried first by
+    # infer_value_type() for their string values. The TIMESTAMP_MATCHER is
+    # always tried first.
+    PREDICTED_TYPES = frozenset([
+        'DATE', 'TIME', 'QINTEGER', 'QFLOAT', 'QBOOLEAN'
+    ])
+
     def __init__(
         self,
         input_format='json',
@@ -87,7 +131,61 @@ class SchemaGenerator:
         sanitize_names=False,
         ignore_invalid_lines=False,
         preserve_input_sort_order=False,
+        field_stats=False,
+        field_cardinality=False,
+        max_record_keys=None,
+        max_error_samples=None,
+        profile=False,
+        progress_callback=None,
+        shape_cache_size=None,
+        fail_fast=False,
+        specialize_after=None,
+        line_cache_size=None,
+        route_by=None,
+        max_routes=None,
+        include_paths=None,
+        exclude_paths=None,
+        max_depth=None,
+        max_depth_type='JSON',
     ):
+        # Keep the constructor arguments so that an identically configured
+        # SchemaGenerator can be created in a worker process. The
+        # 'progress_callback' is not passed on, the progress is reported by
+        # the parent process as each file is completed.
+        self.options = dict(
+            input_format=input_format,
+            infer_mode=infer_mode,
+            keep_nulls=keep_nulls,
+            quoted_values_are_strings=quoted_values_are_strings,
+            debugging_interval=debugging_interval,
+            debugging_map=debugging_map,
+            sanitize_names=sanitize_names,
+            ignore_invalid_lines=ignore_invalid_lines,
+            preserve_input_sort_order=preserve_input_sort_order,
+            field_stats=field_stats,
+            field_cardinality=field_cardinality,
+            max_record_keys=max_record_keys,
+            max_error_samples=max_error_samples,
+            profile=profile,
+            shape_cache_size=shape_cache_size,
+            fail_fast=fail_fast,
+            specialize_after=specialize_after,
+            line_cache_size=line_cache_size,
+            route_by=route_by,
+            max_routes=max_routes,
+            include_paths=include_paths,
+            exclude_paths=exclude_paths,
+            max_depth=max_depth,
+            max_depth_type=max_depth_type,
+        )
+
+        # If 'progress_callback' is given, it is called with a dict of
+        # metrics every 'debugging_interval' records and at the end of each
+        # input. See progress.py.
+        self.progress = None
+        if progress_callback is not None:
+            self.progress = ProgressReporter(progress_callback)
+
         self.input_format = input_format
         self.infer_mode = infer_mode
         self.keep_nulls = keep_nulls
@@ -106,6 +204,40 @@ class SchemaGenerator:
         # rest of the file.
         self.ignore_invalid_lines = ignore_invalid_lines
 
+        # Collect a FieldStats for each schema_entry, stored under its 'stats'
+        # key. See flatten_stats(). If 'field_cardinality' is also set, the
+        # number of distinct values of each field is estimated using a
+        # HyperLogLog sketch of fixed size.
+        self.field_stats = field_stats
+        self.field_cardinality = field_cardinality
+
+        # A value of the same type and mode as the 'hard' and filled entry of
+        # its field is not merged into it, because it cannot change it. The
+        # FieldStats need every value.
+        self.skip_unchanged = not field_stats
+
+        # Maximum number of fields in a nested RECORD. A RECORD with more
+        # fields (usually an object used as a map, keyed by IDs) is converted
+        # into a single JSON column, whose values are no longer inspected.
+        self.max_record_keys = max_record_keys
+
+        # Maximum nesting level of the fields, 1 being the top-level columns.
+        # A RECORD whose fields would be deeper is not descended into, and
+        # becomes a single opaque column of 'max_depth_type' (JSON or
+        # STRING), whose values are not inspected either.
+        if max_depth_type not in ['JSON', 'STRING']:
+            raise Exception(f"Unknown max_depth_type '{max_depth_type}'")
+        self.max_depth = max_depth
+        self.max_depth_type = max_depth_type
+
+        # Raise a SchemaIncompatibleError on the first value which is not
+        # compatible with a field of the existing schema given to
+        # deduce_schema(), instead of logging an error and reading the rest of
+        # the input. The 'existing_paths' are the lower-cased full paths of
+        # the fields of the existing schema, collected on the first call.
+        self.fail_fast = fail_fast
+        self.existing_paths = None
+
         # If CSV, force keep_nulls = True
         if (input_format in ['csv', 'csvdictreader']):
             self.keep_nulls = True
@@ -116,15 +248,146 @@ class SchemaGenerator:
         # CSV column with the respective schema entry using the position of the
         # column in the schema.
         self.sorted_schema = (
-            (input_format in ['json', 'dict'])
+            (input_format in ['json', 'jsonstream', 'dict'])
             and not preserve_input_sort_order
         )
 
+        # The data file currently being read by deduce_schema_from_paths(),
+        # None if the input is not a named file.
+        self.input_path = None
         self.line_number = 0
+        self.error_count = 0
         self.error_logs = []
 
-    def log_error(self, msg):
-        self.error_logs.append({'line_number': self.line_number, 'msg': msg})
+        # Number of strings whose type was, or was not, the current type of
+        # their column. See infer_value_type().
+        self.prediction_hits = 0
+        self.prediction_misses = 0
+
+        # If 'max_error_samples' is given, the errors are aggregated by kind
+        # and field path into an ErrorSummary, keeping only that many samples
+        # of each, instead of being appended to the unbounded 'error_logs'.
+        if max_error_samples is None:
+            self.error_summary = None
+        else:
+            self.error_summary = ErrorSummary(max_samples=max_error_samples)
+
+        # If 'profile' is set, the time spent in each phase (decode,
+        # inference, merge, flatten) and the number of schema entries
+        # allocated, merged, widened and ignored are recorded in a
+        # ProfileStats. The hooks are installed only in that case, so they
+        # cost nothing otherwise.
+        self.stats = None
+        if profile:
+            self.stats = ProfileStats()
+            install_profiler(self, self.stats)
+
+        # If 'shape_cache_size' is given, the records whose structure (keys
+        # and types of values) was already merged into the schema_map are
+        # skipped. See shape_cache.py. The FieldStats need every value, so the
+        # cache is not used with 'field_stats'.
+        self.shape_cache = None
+        if shape_cache_size and not field_stats:
+            self.shape_cache = ShapeCache(
+                self.infer_value_type, shape_cache_size)
+
+        # If 'specialize_after' is given, the schema_map is compiled into a
+        # Python function which accepts the records that cannot change it,
+        # after that many records, and again that many records after the
+        # function rejects a record. See specializer.py. Not used with
+        # 'field_stats' either.
+        self.specializer = None
+        if specialize_after and not field_stats:
+            self.specializer = SchemaSpecializer(self, specialize_after)
+
+        # If 'line_cache_size' is given, the lines of a newline-delimited
+        # JSON file which are identical to a line already merged into the
+        # schema_map are not decoded. See line_cache.py. Not used with
+        # 'field_stats' either.
+        self.line_cache = None
+        if line_cache_size and not field_stats and input_format == 'json':
+            self.line_cache = LineCache(line_cache_size)
+
+        # If 'route_by' is given, a schema is deduced for each value of the
+        # field at that dotted path, up to 'max_routes' values, and the
+        # schema_map of deduce_schema() is an OrderedDict of {route:
+        # schema_map}. See router.py.
+        self.router = None
+        if route_by:
+            self.router = SchemaRouter(self, route_by, max_routes)
+
+        # If 'include_paths' or 'exclude_paths' is given, the fields which
+        # are not projected are removed from each record, before its schema
+        # is deduced or it is validated. See projection.py. The columns of a
+        # CSV file are matched by position, so they are never removed.
+        self.projection = None
+        if ((include_paths or exclude_paths)
+                and input_format not in ['csv', 'csvdictreader']):
+            self.projection = FieldProjection(
+                self, include_paths, exclude_paths)
+
+    def log_error(self, msg, *args, path=None):
+        """Log an error on the current line. The message is
+        msg.format(*args), or just 'msg' if there are no 'args'. The
+        formatting is deferred when the errors are aggregated into the
+        'error_summary', using 'msg' as the kind of error and 'path' as the
+        field which caused it.
+        """
+        if self.shape_cache is not None:
+            self.shape_cache.clear()
+        if self.specializer is not None:
+            self.specializer.invalidate()
+        if self.line_cache is not None:
+            self.line_cache.clear()
+        if self.router is not None:
+            self.router.clear_caches()
+        self.log_skipped_record(msg, *args, path=path)
+
+    def log_skipped_record(self, msg, *args, path=None):
+        """Log an error about a record which is skipped before its schema is
+        deduced (e.g. by the SchemaRouter), like log_error(), but without
+        clearing the caches, which do not depend on it.
+        """
+        self.error_count += 1
+        if self.error_summary is not None:
+            self.error_summary.add(
+                self.input_path, self.line_number, msg, args, path)
+            return
+        self.error_logs.append({
+            'line_number': self.line_number,
+            'input_path': self.input_path,
+            'msg': msg.format(*args) if args else msg,
+        })
+
+    def get_error_logs(self):
+        """Return the list of error logs, one per error, or one per kind of
+        error and field if the errors are aggregated (see ErrorSummary).
+        """
+        if self.error_summary is not None:
+            return self.error_summary.to_error_logs()
+        return self.error_logs
+
+    def create_reader(self, input_data):
+        """Return an iterable of the records of 'input_data' according to the
+        'input_format'.
+        """
+        if self.input_format == 'json' or self.input_format is None:
+            # Newline-delimited JSON file
+            return json_reader(input_data)
+        elif self.input_format == 'jsonstream':
+            # JSON objects which are not one per line, or a JSON array
+            return json_stream_reader(input_data)
+        elif self.input_format == 'csv':
+            # CSV file
+            return csv.DictReader(input_data)
+        elif self.input_format == 'dict':
+            # Iterable of dict, or anything that acts like it
+            return input_data
+        elif self.input_format == 'csvdictreader':
+            # csv.DictReader
+            return input_data
+        else:
+            raise Exception(f"Unknown input_format '{self.input_format}'")
 
     def deduce_schema(self, input_data, *, schema_map=None):
         """Loop through each element of 'input_data' and deduce the
@@ -178,62 +441,283 @@ class SchemaGenerator:
           * an OrderedDict which is sorted by the 'key' of the column name
           * a list of possible errors containing a map of 'line' and 'msg'
 
+        If the 'route_by' option is set, the given and returned 'schema_map'
+        is instead an OrderedDict of {route: schema_map}, with one schema_map
+        per value of the routing field.
+
         An Exception is thrown in the lower-level calls only for programming
         errors, not for data validation errors. Therefore each line in the input
         file is processed without a try-except block and any exception will be
         allowed to escape to the calling routine.
         """
 
-        if self.input_format == 'json' or self.input_format is None:
-            # Newline-delimited JSON file
-            reader = json_reader(input_data)
-        elif self.input_format == 'csv':
-            # CSV file
-            reader = csv.DictReader(input_data)
-        elif self.input_format == 'dict':
-            # Iterable of dict, or anything that acts like it
-            reader = input_data
-        elif self.input_format == 'csvdictreader':
-            # csv.DictReader
-            reader = input_data
+        line_cache = self.line_cache
+        if line_cache is not None:
+            reader = line_cache.reader(input_data)
         else:
-            raise Exception(f"Unknown input_format '{self.input_format}'")
+            reader = self.create_reader(input_data)
+        if self.stats is not None:
+            reader = self.stats.timed_reader(reader)
 
         if schema_map is None:
             schema_map = OrderedDict()
+        if (self.fail_fast and self.existing_paths is None
+                and self.router is None):
+            self.existing_paths = collect_field_paths(schema_map)
 
+        progress = self.progress
+        if progress is not None:
+            progress.start_input(input_data, self.input_path, self.line_number)
         try:
-            for json_object in reader:
+            self.deduce_records(reader, schema_map)
+        finally:
+            logging.info(f'Processed {self.line_number} lines')
+
+        if progress is not None:
+            progress.end_input(self, schema_map)
+
+        return schema_map, self.get_error_logs()
+
+    def deduce_records(self, records, schema_map):
+        """Merge the 'records' yielded by a reader (see create_reader()),
+        counting them as lines of the input, into 'schema_map' in place. The
+        'records' may also contain the Exceptions of the lines which could not
+        be parsed.
+        """
+        line_cache = self.line_cache
+        progress = self.progress
+        shape_cache = self.shape_cache
+        specializer = self.specializer
+        router = self.router
+        projection = self.projection
+        record_map = schema_map
+
+        try:
+            for json_object in records:
 
                 # Print a progress message periodically.
                 self.line_number += 1
                 if self.line_number % self.debugging_interval == 0:
                     logging.info(f'Processing line {self.line_number}')
+                    if progress is not None:
+                        progress.report(self, schema_map)
 
                 # Deduce the schema from this given data record.
+                if json_object is DUPLICATE_LINE:
+                    continue
                 if isinstance(json_object, dict):
-                    self.deduce_schema_for_record(
-                        json_object=json_object,
-                        schema_map=schema_map,
+                    error_count = self.error_count
+                    if router is not None:
+                        route = router.select(schema_map, json_object)
+                        if route is None:
+                            continue
+                        record_map = route.schema_map
+                        shape_cache = route.shape_cache
+                        specializer = route.specializer
+                    record = json_object
+                    if projection is not None:
+                        record = projection.project(json_object)
+                    if (specializer is not None
+                            and specializer.match(record_map, record)):
+                        pass
+                    elif shape_cache is None:
+                        self.deduce_schema_for_record(
+                            json_object=record,
+                            schema_map=record_map,
+                        )
+                    else:
+                        fingerprint = shape_cache.lookup(record_map, record)
+                        if fingerprint is not True:
+                            self.deduce_schema_for_record(
+                                json_object=record,
+                                schema_map=record_map,
+                            )
+                            if self.error_count == error_count:
+                                shape_cache.add(fingerprint)
+                    if (line_cache is not None
+                            and self.error_count == error_count):
+                        line_cache.add_last_line()
+                elif isinstance(json_object, Exception):
+                    self.log_error(
+                        'Record could not be parsed: Exception: {}',
+                        str(json_object),
+                    )
+                    if not self.ignore_invalid_lines:
+                        raise json_object
+                else:
+                    self.log_error(
+                        'Record should be a JSON Object but was a {}',
+                        type(json_object),
                     )
+                    if not self.ignore_invalid_lines:
+                        raise Exception(f'Record must be a JSON Object '
+                                        f'but was a {type(json_object)}')
+        except SchemaIncompatibleError as e:
+            e.record = json_object
+            raise
+
+    def deduce_schema_from_paths(self, input_paths, *, schema_map=None, jobs=1):
+        """Deduce the schema from the data files named by 'input_paths', in
+        the given order, as if they were concatenated into a single input.
+        The files may be compressed (see input_files.open_input_file()). The
+        path '-' refers to the STDIN. Returns the same (schema_map,
+        error_logs) tuple as deduce_schema(). The 'line_number' of each error
+        is relative to the file given by its 'input_path'.
+
+        If 'jobs' is greater than 1, the files are processed concurrently by a
+        pool of 'jobs' worker processes, each one starting from a copy of the
+        given 'schema_map'. The per-file schema maps are then merged in the
+        order of 'input_paths', so the column order of the result (which
+        matters for CSV files and for 'preserve_input_sort_order') is the same
+        as if the files had been read one after another.
+        """
+        if self.input_format not in ['json', 'jsonstream', 'csv']:
+            raise Exception(
+                f"Cannot read files with input_format '{self.input_format}'"
+            )
+
+        if schema_map is None:
+            schema_map = OrderedDict()
+        if (self.fail_fast and self.existing_paths is None
+                and self.router is None):
+            self.existing_paths = collect_field_paths(schema_map)
+
+        if self.progress is not None:
+            self.progress.set_input_paths(input_paths)
+
+        if jobs > 1 and len(input_paths) > 1:
+            # The tasks are pickled by a background thread while the results
+            # are merged into 'schema_map', so they get a copy of it.
+            initial_schema_map = copy.deepcopy(schema_map)
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = executor.map(
+                    deduce_schema_for_path,
+                    [self.options] * len(input_paths),
+                    [initial_schema_map] * len(input_paths),
+                    input_paths,
+                )
+                for input_path, result in zip(input_paths, results):
+                    self.error_count += result['error_count']
+                    self.error_logs.extend(result['error_logs'])
+                    self.prediction_hits += result['prediction_hits']
+                    self.prediction_misses += result['prediction_misses']
+                    if self.error_summary is not None:
+                        self.error_summary.merge(result['error_summary'])
+                    if self.stats is not None:
+                        self.stats.merge(result['stats'])
+                    # Conflicts between files are not tied to a single line.
+                    self.input_path = input_path
+                    self.line_number = None
+                    if self.router is not None:
+                        self.router.merge_schema_maps(
+                            schema_map, result['schema_map'])
+                    else:
+                        self.merge_schema_map(
+                            schema_map, result['schema_map'])
+                    if self.progress is not None:
+                        self.progress.add_input(
+                            self, schema_map, input_path, result['records'])
+            self.input_path = None
+            self.line_number = 0
+            return schema_map, self.get_error_logs()
+
+        # The 'csv' module requires files to be opened with newline=''.
+        newline = '' if self.input_format == 'csv' else None
+        for input_path in input_paths:
+            self.input_path = input_path
+            self.line_number = 0
+            with open_input_file(input_path, newline=newline) as input_file:
+                schema_map, _ = self.deduce_schema(
+                    input_file, schema_map=schema_map
+                )
+        self.input_path = None
+        return schema_map, self.get_error_logs()
+
+    def validate(self, input_data, schema_map, *, validator=None):
+        """Check each record of 'input_data' against the existing 'schema_map'
+        (e.g. read by read_existing_schema_from_file()) without deducing a
+        new schema, which is much faster. Each violation (a new column, a
+        type which must be widened, a REQUIRED field which is missing or
+        null, etc) is logged as an error. Returns the error logs, which are
+        empty if all the records are compatible with the schema. See
+        validator.py.
+
+        The 'schema_map' is compiled into a SchemaValidator, which can be
+        given as 'validator' to check several inputs with the same one.
+        """
+        if validator is None:
+            validator = SchemaValidator(
+                self, schema_map, self.options['shape_cache_size'])
+
+        projection = self.projection
+        try:
+            for json_object in self.create_reader(input_data):
+                # Print a progress message periodically.
+                self.line_number += 1
+                if self.line_number % self.debugging_interval == 0:
+                    logging.info(f'Processing line {self.line_number}')
+
+                if isinstance(json_object, dict):
+                    if projection is not None:
+                        validator.validate_record(
+                            projection.project(json_object))
+                    else:
+                        validator.validate_record(json_object)
                 elif isinstance(json_object, Exception):
                     self.log_error(
-                        f'Record could not be parsed: Exception: {json_object}'
+                        'Record could not be parsed: Exception: {}',
+                        str(json_object),
                     )
                     if not self.ignore_invalid_lines:
                         raise json_object
                 else:
                     self.log_error(
-                        'Record should be a JSON Object '
-                        f'but was a {type(json_object)}'
+                        'Record should be a JSON Object but was a {}',
+                        type(json_object),
                     )
                     if not self.ignore_invalid_lines:
                         raise Exception(f'Record must be a JSON Object '
                                         f'but was a {type(json_object)}')
+        except SchemaIncompatibleError as e:
+            e.record = json_object
+            raise
         finally:
             logging.info(f'Processed {self.line_number} lines')
 
-        return schema_map, self.error_logs
+        return self.get_error_logs()
+
+    def validate_from_paths(self, input_paths, schema_map):
+        """Check the records of the data files named by 'input_paths' against
+        the existing 'schema_map', like validate().
+        """
+        if self.input_format not in ['json', 'jsonstream', 'csv']:
+            raise Exception(
+                f"Cannot read files with input_format '{self.input_format}'"
+            )
+        validator = SchemaValidator(
+            self, schema_map, self.options['shape_cache_size'])
+
+        # The 'csv' module requires files to be opened with newline=''.
+        newline = '' if self.input_format == 'csv' else None
+        for input_path in input_paths:
+            self.input_path = input_path
+            self.line_number = 0
+            with open_input_file(input_path, newline=newline) as input_file:
+                self.validate(input_file, schema_map, validator=validator)
+        self.input_path = None
+        return self.get_error_logs()
+
+    def merge_schema_map(self, schema_map, other_schema_map):
+        """Merge the schema entries of 'other_schema_map' (e.g. deduced from
+        a different data file) into 'schema_map', in place. Keys which are not
+        in 'schema_map' are appended in the order of 'other_schema_map'.
+        """
+        for key, other_entry in other_schema_map.items():
+            schema_map[key] = self.merge_schema_entry(
+                old_schema_entry=schema_map.get(key),
+                new_schema_entry=other_entry,
+            )
+        return schema_map
 
     def deduce_schema_for_record(self, json_object, schema_map, base_path=None):
         """Figures out the BigQuery schema for the given 'json_object' and
@@ -242,26 +726,127 @@ class SchemaGenerator:
         'soft' or 'hard' entry. If both the old and new have the same type,
         then they must be compatible.
 
-        'base_path' is the string representing the current path within the
-        nested record that leads to this specific entry.
+        'base_path' is the path (a string or a FieldPath) within the nested
+        record that leads to this specific entry.
+
+        The nested records are processed depth-first using an explicit stack
+        of RecordFrame instead of recursion, so that deeply nested records do
+        not hit the Python recursion limit. The schema entry of a nested
+        RECORD is merged into its parent's 'schema_map' once all of its
+        fields have been deduced, as if get_schema_entry() had been called.
         """
-        for key, value in json_object.items():
-            # The canonical key is the lower-cased version of the sanitized key
-            # so that the case of the field name is preserved when generating
-            # the schema but we don't create invalid, duplicate, fields since
-            # BigQuery is case insensitive
-            canonical_key = self.sanitize_name(key).lower()
-            schema_entry = schema_map.get(canonical_key)
-            new_schema_entry = self.get_schema_entry(
-                key=key,
-                value=value,
-                base_path=base_path
-            )
-            schema_map[canonical_key] = self.merge_schema_entry(
-                old_schema_entry=schema_entry,
-                new_schema_entry=new_schema_entry,
-                base_path=base_path
-            )
+        stack = [RecordFrame(json_object, iter(()), schema_map, base_path)]
+        # The merge_schema_entry() is inlined, with a single 'pending' stack.
+        pending = []
+        merge_schema_entry_step = self.merge_schema_entry_step
+        skip_unchanged = self.skip_unchanged
+        # The RECORDs in the frames at this depth or deeper are collapsed.
+        collapse_depth = (
+            self.max_depth - 1 if self.max_depth is not None else None)
+        while stack:
+            frame = stack[-1]
+            schema_map = frame.schema_map
+            base_path = frame.base_path
+            for key, value in frame.items:
+                # The canonical key is the lower-cased version of the sanitized
+                # key so that the case of the field name is preserved when
+                # generating the schema but we don't create invalid, duplicate,
+                # fields since BigQuery is case insensitive
+                canonical_key = self.sanitize_name(key).lower()
+                schema_entry = schema_map.get(canonical_key)
+                if (schema_entry and schema_entry['info']['type'] == 'JSON'
+                        and value is not None):
+                    # A JSON column accepts any value, don't look inside it.
+                    new_schema_entry = self.get_json_schema_entry(
+                        key=key,
+                        value=value,
+                        mode=schema_entry['info']['mode'],
+                    )
+                else:
+                    value_mode, value_type = self.infer_bigquery_type(
+                        value,
+                        schema_entry['info']['type'] if schema_entry
+                        else None,
+                        # Only an array can cause an error.
+                        FieldPath(base_path, key) if isinstance(value, list)
+                        else None,
+                    )
+                    if (collapse_depth is not None
+                            and frame.depth >= collapse_depth
+                            and value_type in ('RECORD', '__empty_record__')):
+                        # The fields of the RECORD would be deeper than
+                        # 'max_depth', don't look inside it. An empty RECORD
+                        # is collapsed too, so that it is not kept as a
+                        # RECORD by 'keep_nulls'.
+                        new_schema_entry = self.get_json_schema_entry(
+                            key=key,
+                            value=value,
+                            mode=value_mode,
+                            value_type=self.max_depth_type,
+                        )
+                    elif value_type == 'RECORD':
+                        # Descend into the nested RECORD, or into each element
+                        # of a REPEATED RECORD.
+                        objects = iter(value) if value_mode == 'REPEATED' \
+                            else iter((value,))
+                        child = RecordFrame(
+                            next(objects),
+                            objects,
+                            OrderedDict(),
+                            FieldPath(base_path, key),
+                        )
+                        child.parent_key = key
+                        child.parent_value = value
+                        child.parent_mode = value_mode
+                        child.canonical_key = canonical_key
+                        child.depth = frame.depth + 1
+                        stack.append(child)
+                        break
+                    elif (skip_unchanged and schema_entry is not None
+                            and schema_entry['status'] == 'hard'
+                            and schema_entry['filled']
+                            and schema_entry['info']['type'] == value_type
+                            and schema_entry['info']['mode'] == value_mode
+                            and value != ''):
+                        # Merging a non-empty value of the same type and mode
+                        # into a 'hard' entry would replace it with an
+                        # identical entry, so don't allocate one.
+                        continue
+                    else:
+                        new_schema_entry = self.get_value_schema_entry(
+                            key, value, value_mode, value_type)
+                schema_map[canonical_key] = merge_schema_entry_step(
+                    schema_entry, new_schema_entry, base_path, pending)
+                if pending:
+                    self.merge_pending_entries(pending)
+            else:
+                # All the fields of the current object were deduced. Continue
+                # with the next element of a REPEATED RECORD, if any.
+                json_object = next(frame.objects, None)
+                if json_object is not None:
+                    frame.items = iter(json_object.items())
+                    continue
+
+                stack.pop()
+                if not stack:
+                    break
+                parent = stack[-1]
+                new_schema_entry = self.get_record_schema_entry(
+                    frame.parent_key,
+                    frame.parent_value,
+                    frame.parent_mode,
+                    frame.schema_map,
+                    frame.base_path,
+                )
+                canonical_key = frame.canonical_key
+                parent.schema_map[canonical_key] = merge_schema_entry_step(
+                    parent.schema_map.get(canonical_key),
+                    new_schema_entry,
+                    parent.base_path,
+                    pending,
+                )
+                if pending:
+                    self.merge_pending_entries(pending)
 
     def sanitize_name(self, value):
         """Sanitizes a column name within the schema.
@@ -282,19 +867,51 @@ class SchemaGenerator:
         base_path=None,
     ):
         """Merges the 'new_schema_entry' into the 'old_schema_entry' and return
-        a merged schema entry. Recursively merges in sub-fields as well.
+        a merged schema entry. Merges in sub-fields as well.
 
         Returns the merged schema_entry. This method assumes that both
         'old_schema_entry' and 'new_schema_entry' can be modified in place and
         returned as the new schema_entry.
 
-        'base_path' is the string representing the current path within the
+        'base_path' is the path (a string or a FieldPath) within the
         nested record that leads to this specific entry. This is used during
         error logging.
 
         An Exception is thrown if an unexpected programming error is detected.
         The calling routine should stop processing the file.
         """
+        # The sub-fields of RECORDs are merged depth-first, in the same order
+        # as a recursive implementation, using the 'pending' stack.
+        pending = []
+        schema_entry = self.merge_schema_entry_step(
+            old_schema_entry, new_schema_entry, base_path, pending)
+        if pending:
+            self.merge_pending_entries(pending)
+        return schema_entry
+
+    def merge_pending_entries(self, pending):
+        """Perform the merges of the sub-fields on the 'pending' stack, which
+        is empty on return.
+        """
+        merge_schema_entry_step = self.merge_schema_entry_step
+        while pending:
+            fields, key, new_entry, path = pending.pop()
+            fields[key] = merge_schema_entry_step(
+                fields.get(key), new_entry, path, pending)
+
+    def merge_schema_entry_step(
+        self,
+        old_schema_entry,
+        new_schema_entry,
+        base_path,
+        pending,
+    ):
+        """Merge a single level of the 'new_schema_entry' into the
+        'old_schema_entry', and return the merged schema entry. The merges of
+        the sub-fields of a RECORD are appended to the 'pending' stack as
+        (fields, key, new_entry, base_path) tuples, in reverse order, to be
+        performed by merge_schema_entry().
+        """
         if not old_schema_entry:
             return new_schema_entry
 
@@ -307,6 +924,9 @@ class SchemaGenerator:
             old_schema_entry['filled'] = False
             new_schema_entry['filled'] = False
 
+        if self.field_stats:
+            merge_entry_stats(old_schema_entry, new_schema_entry)
+
         old_status = old_schema_entry['status']
         new_status = new_schema_entry['status']
 
@@ -315,6 +935,13 @@ class SchemaGenerator:
         if old_status == 'ignore':
             return old_schema_entry
 
+        # The new entry can be 'ignore' only when merging two schema_maps,
+        # e.g. deduced from 2 different files. The conflict was already
+        # reported in the other file.
+        if new_status == 'ignore':
+            old_schema_entry['status'] = 'ignore'
+            return old_schema_entry
+
         # new 'soft' retains the old 'hard'
         if old_status == 'hard' and new_status == 'soft':
             mode = self.merge_mode(old_schema_entry,
@@ -353,12 +980,11 @@ class SchemaGenerator:
         new_type = new_info['type']
         new_mode = new_info['mode']
 
-        full_old_name = json_full_path(base_path, old_name)
-        full_new_name = json_full_path(base_path, new_name)
-
         # Defensive check, names should always be the same.
         if old_name != new_name:
             if old_name.lower() != new_name.lower():
+                full_old_name = json_full_path(base_path, old_name)
+                full_new_name = json_full_path(base_path, new_name)
                 raise Exception(
                     'Unexpected difference in name, should never happen:'
                     f' old_name ({full_old_name}) != new_name ({full_new_name})'
@@ -367,37 +993,58 @@ class SchemaGenerator:
                 # preserve old name if case is different
                 new_info['name'] = old_info['name']
 
+        # A JSON column absorbs any other type. This happens when merging a
+        # RECORD which was converted into JSON by 'max_record_keys' in one
+        # schema_map (e.g. from a different file) but not in the other.
+        if old_type == 'JSON' or new_type == 'JSON':
+            if old_type != 'JSON':
+                convert_to_json_entry(old_schema_entry)
+            return old_schema_entry
+
         # Recursively merge in the subfields of a RECORD, allowing
         # NULLABLE to become REPEATED (because 'bq load' allows it).
         if old_type == 'RECORD' and new_type == 'RECORD':
             # Allow NULLABLE RECORD to be upgraded to REPEATED RECORD because
             # 'bq load' allows it.
+            full_old_name = FieldPath(base_path, old_name)
             if old_mode == 'NULLABLE' and new_mode == 'REPEATED':
                 old_info['mode'] = 'REPEATED'
-                self.log_error(
-                    f'Converting schema for "{full_old_name}" from '
-                    'NULLABLE RECORD into REPEATED RECORD'
+                self.log_schema_change(
+                    'Converting schema for "{}" from '
+                    'NULLABLE RECORD into REPEATED RECORD',
+                    full_old_name,
+                    path=full_old_name,
                 )
             elif old_mode == 'REPEATED' and new_mode == 'NULLABLE':
                 # TODO: Maybe remove this warning output. It was helpful during
                 # development, but maybe it's just natural.
                 self.log_error(
-                    f'Leaving schema for "{full_old_name}" as REPEATED RECORD'
+                    'Leaving schema for "{}" as REPEATED RECORD',
+                    full_old_name,
+                    path=full_old_name,
                 )
 
-            # RECORD type needs a recursive merging of sub-fields. We merge into
-            # the 'old_schema_entry' which assumes that the 'old_schema_entry'
-            # can be modified in situ.
+            # RECORD type needs a merging of sub-fields. We merge into the
+            # 'old_schema_entry' which assumes that the 'old_schema_entry' can
+            # be modified in situ.
             old_fields = old_info['fields']
             new_fields = new_info['fields']
-            for key, new_entry in new_fields.items():
-                old_entry = old_fields.get(key)
-                new_base_path = json_full_path(base_path, old_name)
-                old_fields[key] = self.merge_schema_entry(
-                    old_schema_entry=old_entry,
-                    new_schema_entry=new_entry,
-                    base_path=new_base_path,
-                )
+            if self.max_record_keys is not None:
+                new_key_count = sum(
+                    1 for key in new_fields if key not in old_fields)
+                if len(old_fields) + new_key_count > self.max_record_keys:
+                    self.log_schema_change(
+                        'Converting schema for "{}" with more than {} fields'
+                        ' into JSON',
+                        full_old_name,
+                        self.max_record_keys,
+                        path=full_old_name,
+                    )
+                    convert_to_json_entry(old_schema_entry)
+                    return old_schema_entry
+            new_base_path = full_old_name
+            for key, new_entry in reversed(list(new_fields.items())):
+                pending.append((old_fields, key, new_entry, new_base_path))
             return old_schema_entry
 
         new_mode = self.merge_mode(old_schema_entry,
@@ -413,10 +1060,9 @@ class SchemaGenerator:
             # Check that the converted types are compatible.
             candidate_type = convert_type(old_type, new_type)
             if not candidate_type:
-                self.log_error(
-                    f'Ignoring field with mismatched type: '
-                    f'old=({old_status},{full_old_name},{old_mode},{old_type});'
-                    f' new=({new_status},{full_new_name},{new_mode},{new_type})'
+                self.log_mismatch_error(
+                    'Ignoring field with mismatched type: ',
+                    old_schema_entry, new_schema_entry, base_path, new_name,
                 )
                 old_schema_entry['status'] = 'ignore'
                 return old_schema_entry
@@ -424,6 +1070,47 @@ class SchemaGenerator:
             new_info['type'] = candidate_type
         return new_schema_entry
 
+    def log_mismatch_error(
+        self, prefix, old_schema_entry, new_schema_entry, base_path,
+        new_name=None,
+    ):
+        """Log an error about the incompatible old and new schema entries of
+        the same field, whose full paths are computed only here. The
+        'new_name' is the name of the new field before its case was replaced
+        by the one of the old field, if any. See log_schema_change().
+        """
+        old_info = old_schema_entry['info']
+        new_info = new_schema_entry['info']
+        if new_name is None:
+            new_name = new_info['name']
+        full_old_name = json_full_path(base_path, old_info['name'])
+        full_new_name = json_full_path(base_path, new_name)
+        msg = prefix + 'old=({},{},{},{}); new=({},{},{},{})'
+        args = (
+            old_schema_entry['status'], full_old_name, old_info['mode'],
+            old_info['type'],
+            new_schema_entry['status'], full_new_name, new_info['mode'],
+            new_info['type'],
+        )
+        self.log_schema_change(msg, *args, path=full_old_name)
+
+    def log_schema_change(self, msg, *args, path):
+        """Log an error which changes or ignores the field 'path', like
+        log_error(). With 'fail_fast', raise a SchemaIncompatibleError if the
+        field is in the existing schema.
+        """
+        self.log_error(msg, *args, path=path)
+        if not (self.fail_fast and self.existing_paths):
+            return
+        path = str(path)
+        if path.lower() in self.existing_paths:
+            raise SchemaIncompatibleError(
+                msg.format(*args),
+                self.input_path,
+                self.line_number,
+                path,
+            )
+
     def merge_mode(self, old_schema_entry, new_schema_entry, base_path):
         """This method determines if the 'mode' of a schema entry can
         transition from REQUIRED -> NULLABLE. A REQUIRED mode can only have
@@ -451,17 +1138,10 @@ class SchemaGenerator:
         old_info = old_schema_entry['info']
         new_info = new_schema_entry['info']
         old_mode = old_info['mode']
-        old_name = old_info['name']
-        old_type = old_info['type']
         old_status = old_schema_entry['status']
         new_mode = new_info['mode']
-        new_name = new_info['name']
-        new_type = new_info['type']
         new_status = new_schema_entry['status']
 
-        full_old_name = json_full_path(base_path, old_name)
-        full_new_name = json_full_path(base_path, new_name)
-
         # If the old field is a REQUIRED primitive (which could only have come
         # from an existing schema), the new field can be either a
         # NULLABLE(filled) or a NULLABLE(unfilled).
@@ -476,88 +1156,108 @@ class SchemaGenerator:
                 if self.infer_mode:
                     return new_mode
                 else:
-                    self.log_error(
-                        f'Ignoring non-RECORD field with mismatched mode.'
+                    self.log_mismatch_error(
+                        'Ignoring non-RECORD field with mismatched mode.'
                         ' cannot convert to NULLABLE because infer_schema not'
-                        ' set:'
-                        f' old=({old_status},{full_old_name},{old_mode},'
-                        f'{old_type});'
-                        f' new=({new_status},{full_new_name},{new_mode},'
-                        f'{new_type})'
+                        ' set: ',
+                        old_schema_entry, new_schema_entry, base_path,
                     )
                     return None
         elif old_mode == 'NULLABLE' and new_mode == 'REPEATED':
             # Allow NULLABLE(soft) -> REPEATED(hard)
             if not (old_status == 'soft' and new_status == 'hard'):
-                self.log_error(
-                    f'Cannot convert NULLABLE(hard) -> REPEATED: '
-                    f'old=({old_status},{full_old_name},{old_mode},{old_type});'
-                    f' new=({new_status},{full_new_name},{new_mode},{new_type})'
+                self.log_mismatch_error(
+                    'Cannot convert NULLABLE(hard) -> REPEATED: ',
+                    old_schema_entry, new_schema_entry, base_path,
                 )
                 return None
             return new_mode
         elif old_mode == 'REPEATED' and new_mode == 'NULLABLE':
             # Allow REPEATED -> NULLABLE(soft), but retain REPEATED.
             if not (old_status == 'hard' and new_status == 'soft'):
-                self.log_error(
-                    f'Cannot convert REPEATED -> NULLABLE(hard): '
-                    f'old=({old_status},{full_old_name},{old_mode},{old_type});'
-                    f' new=({new_status},{full_new_name},{new_mode},{new_type})'
+                self.log_mismatch_error(
+                    'Cannot convert REPEATED -> NULLABLE(hard): ',
+                    old_schema_entry, new_schema_entry, base_path,
                 )
                 return None
             return old_mode
         elif old_mode != new_mode:
-            self.log_error(
-                f'Ignoring non-RECORD field with mismatched mode: '
-                f'old=({old_status},{full_old_name},{old_mode},{old_type});'
-                f' new=({new_status},{full_new_name},{new_mode},{new_type})'
+            self.log_mismatch_error(
+                'Ignoring non-RECORD field with mismatched mode: ',
+                old_schema_entry, new_schema_entry, base_path,
             )
             return None
         return old_mode
 
     def get_schema_entry(self, key, value, base_path=None):
         """Determines the 'schema_entry' of the (key, value) pair. Calls
-        deduce_schema_for_record() recursively if the value is another object
-        instead of a primitive (this will happen only for JSON input file).
+        deduce_schema_for_record() if the value is another object instead of a
+        primitive (this will happen only for JSON input file).
+
+        'base_path' is the path (a string or a FieldPath) within the nested
+        record that leads to this specific entry.
+        """
+        value_mode, value_type = self.infer_bigquery_type(
+            value, path=FieldPath(base_path, key))
+        if value_type != 'RECORD':
+            return self.get_value_schema_entry(
+                key, value, value_mode, value_type)
+
+        new_base_path = FieldPath(base_path, key)
+        fields = OrderedDict()
+        objects = value if value_mode == 'REPEATED' else (value,)
+        for json_object in objects:
+            self.deduce_schema_for_record(
+                json_object=json_object,
+                schema_map=fields,
+                base_path=new_base_path,
+            )
+        return self.get_record_schema_entry(
+            key, value, value_mode, fields, new_base_path)
+
+    def get_record_schema_entry(self, key, value, value_mode, fields, path):
+        """Return the 'schema_entry' of the RECORD (key, value), whose 'fields'
+        were deduced from the 'value'. 'path' is the full path of the RECORD.
+        """
+        if (self.max_record_keys is not None
+                and len(fields) > self.max_record_keys):
+            self.log_schema_change(
+                'Converting schema for "{}" with more than {} fields'
+                ' into JSON',
+                path,
+                self.max_record_keys,
+                path=path,
+            )
+            return self.get_json_schema_entry(key, value, value_mode)
+
+        schema_entry = OrderedDict([
+            ('status', 'hard'),
+            ('filled', True),
+            ('info', OrderedDict([
+                ('fields', fields),
+                ('mode', value_mode),
+                ('name', self.sanitize_name(key)),
+                ('type', 'RECORD'),
+            ])),
+        ])
+        if self.field_stats:
+            stats = FieldStats(track_distinct=self.field_cardinality)
+            stats.add_value(value, 'RECORD')
+            schema_entry['stats'] = stats
+        return schema_entry
 
-        'base_path' is the string representing the current path within the
-        nested record that leads to this specific entry.
+    def get_value_schema_entry(self, key, value, value_mode, value_type):
+        """Return the 'schema_entry' of the (key, value) pair whose (mode, type)
+        was inferred by infer_bigquery_type(), for any type except a RECORD.
+        Returns None if the type could not be inferred.
         """
-        value_mode, value_type = self.infer_bigquery_type(value)
         if not value_mode or not value_type:
             return None
         sanitized_key = self.sanitize_name(key)
+        stats_type = value_type
 
         # yapf: disable
-        if value_type == 'RECORD':
-            new_base_path = json_full_path(base_path, key)
-            # recursively figure out the RECORD
-            fields = OrderedDict()
-            if value_mode == 'NULLABLE':
-                self.deduce_schema_for_record(
-                    json_object=value,
-                    schema_map=fields,
-                    base_path=new_base_path,
-                )
-            else:
-                for val in value:
-                    self.deduce_schema_for_record(
-                        json_object=val,
-                        schema_map=fields,
-                        base_path=new_base_path,
-                    )
-
-            schema_entry = OrderedDict([
-                ('status', 'hard'),
-                ('filled', True),
-                ('info', OrderedDict([
-                    ('fields', fields),
-                    ('mode', value_mode),
-                    ('name', sanitized_key),
-                    ('type', value_type),
-                ])),
-            ])
-        elif value_type == '__null__':
+        if value_type == '__null__':
             schema_entry = OrderedDict([
                 ('status', 'soft'),
                 ('filled', False),
@@ -594,6 +1294,8 @@ class SchemaGenerator:
             if value == "" and (self.input_format in ['csv', 'csvdictreader']):
                 status = 'soft'
                 filled = False
+                # Count an empty CSV value as a null.
+                stats_type = '__null__'
             else:
                 status = 'hard'
                 filled = True
@@ -607,24 +1309,59 @@ class SchemaGenerator:
                 ])),
             ])
         # yapf: enable
+
+        if self.field_stats:
+            stats = FieldStats(track_distinct=self.field_cardinality)
+            stats.add_value(value, stats_type)
+            schema_entry['stats'] = stats
         return schema_entry
 
-    def infer_bigquery_type(self, node_value):
+    def get_json_schema_entry(self, key, value, mode, value_type='JSON'):
+        """Return the 'schema_entry' of a JSON column, which accepts any
+        'value' without inspecting its contents. The 'value_type' is STRING
+        for a RECORD collapsed into a STRING by 'max_depth', whose 'value' is
+        still counted as a JSON value by the FieldStats.
+        """
+        schema_entry = OrderedDict([
+            ('status', 'hard'),
+            ('filled', True),
+            ('info', OrderedDict([
+                ('mode', mode),
+                ('name', self.sanitize_name(key)),
+                ('type', value_type),
+            ])),
+        ])
+        if self.field_stats:
+            stats = FieldStats(track_distinct=self.field_cardinality)
+            stats.add_value(value, 'JSON')
+            schema_entry['stats'] = stats
+        return schema_entry
+
+    def infer_bigquery_type(self, node_value, expected_type=None, path=None):
         """Determines the BigQuery (mode, type) tuple of the right hand side of
-        the node value.
+        the node value. The 'expected_type' is the current type of the column
+        of the value, if any (see infer_value_type()). The 'path' is the full
+        path of the field of the value, used to report an invalid array.
         """
-        node_type = self.infer_value_type(node_value)
+        node_type = self.infer_value_type(node_value, expected_type)
         if node_type != '__array__':
             return ('NULLABLE', node_type)
 
         # Do further process for arrays.
 
         # Verify that the array elements are identical types.
-        array_type = self.infer_array_type(node_value)
+        array_type = self.infer_array_type(node_value, expected_type)
         if not array_type:
+            # Describe the array by its element types, not by its elements,
+            # which may be arbitrarily large.
+            element_types = OrderedDict.fromkeys(
+                self.infer_value_type(e, expected_type) for e in node_value)
             self.log_error(
                 'All array elements must be the same compatible type:'
-                f' {node_value}'
+                ' {} elements of types {}',
+                len(node_value),
+                ', '.join(element_types),
+                path=path,
             )
             return (None, None)
 
@@ -632,12 +1369,13 @@ class SchemaGenerator:
         # EXCEPTION: allow (REPEATED __empty_record) ([{}]) because it is
         # allowed by 'bq load'.
         if '__' in array_type and array_type != '__empty_record__':
-            self.log_error(f'Unsupported array element type: {array_type}')
+            self.log_error(
+                'Unsupported array element type: {}', array_type, path=path)
             return (None, None)
 
         return ('REPEATED', array_type)
 
-    def infer_value_type(self, value):
+    def infer_value_type(self, value, expected_type=None):
         """Infers the type of the given node value.
 
         * If the value is '{}', the type '__empty_record__' is returned.
@@ -645,12 +1383,23 @@ class SchemaGenerator:
         * If the value is 'null' (python None), the type '__null__' is returned.
         * Integers and floats are inspected inside quotes.
         * Integers which overflow signed 64-bit are considered to be floats, for
-          consistency with 'bq load'.
+          consistency with 'bq load'. The quoted ones are classified without
+          being converted into an int, see classify_integer_literal().
 
         Note that primitive types do not have the string '__' in the returned
         type string, which is a useful marker.
+
+        The values of a column almost always have the same type, so the
+        matcher of the 'expected_type' (the current type of the column) is
+        tried first for a string, see predict_string_type().
         """
         if isinstance(value, str):
+            if expected_type in self.PREDICTED_TYPES:
+                predicted_type = self.predict_string_type(value, expected_type)
+                if predicted_type is not None:
+                    self.prediction_hits += 1
+                    return predicted_type
+                self.prediction_misses += 1
             if self.TIMESTAMP_MATCHER.match(value):
                 return 'TIMESTAMP'
             elif self.DATE_MATCHER.match(value):
@@ -661,8 +1410,7 @@ class SchemaGenerator:
                 # Implement the same type inference algorithm as 'bq load' for
                 # quoted values that look like ints, floats or bools.
                 if self.INTEGER_MATCHER.match(value):
-                    if (int(value) < self.INTEGER_MIN_VALUE
-                            or self.INTEGER_MAX_VALUE < int(value)):
+                    if classify_integer_literal(value) == 'FLOAT':
                         return 'QFLOAT'  # quoted float
                     else:
                         return 'QINTEGER'  # quoted integer
@@ -701,7 +1449,37 @@ class SchemaGenerator:
                 f'Unsupported node type: {type(value)} (should not happen)'
             )
 
-    def infer_array_type(self, elements):
+    def predict_string_type(self, value, expected_type):
+        """Return the type of the string 'value' if it is the
+        'expected_type' (or a QFLOAT instead of an overflowing QINTEGER), or
+        None if it is not, or cannot be known without trying the other
+        matchers. The matchers of the predicted types do not match the same
+        strings, except INTEGER_MATCHER and FLOAT_MATCHER, so the result is
+        the same as the full cascade of infer_value_type().
+        """
+        if expected_type == 'DATE':
+            if self.DATE_MATCHER.match(value):
+                return 'DATE'
+        elif expected_type == 'TIME':
+            if self.TIME_MATCHER.match(value):
+                return 'TIME'
+        elif self.quoted_values_are_strings:
+            return None
+        elif expected_type == 'QINTEGER':
+            if self.INTEGER_MATCHER.match(value):
+                if classify_integer_literal(value) == 'FLOAT':
+                    return 'QFLOAT'
+                return 'QINTEGER'
+        elif expected_type == 'QFLOAT':
+            if (self.FLOAT_MATCHER.match(value)
+                    and not self.INTEGER_MATCHER.match(value)):
+                return 'QFLOAT'
+        elif expected_type == 'QBOOLEAN':
+            if value.lower() in ['true', 'false']:
+                return 'QBOOLEAN'
+        return None
+
+    def infer_array_type(self, elements, expected_type=None):
         """Return the type of all the array elements, accounting for the same
         conversions supported by infer_bigquery_type(). In other words:
 
@@ -715,7 +1493,7 @@ class SchemaGenerator:
 
         candidate_type = ''
         for e in elements:
-            etype = self.infer_value_type(e)
+            etype = self.infer_value_type(e, expected_type)
             if candidate_type == '':
                 candidate_type = etype
                 continue
@@ -737,136 +1515,388 @@ class SchemaGenerator:
             input_format=self.input_format,
         )
 
+    def diff_schema(self, old_schema_map, schema_map):
+        """Return the list of changes (added, widened, relaxed, repeated and
+        ignored columns) from 'old_schema_map' (e.g. a copy of the existing
+        schema_map given to deduce_schema()) to 'schema_map', in the same
+        order as flatten_schema(). See schema_diff.py.
+        """
+        return diff_schema_maps(
+            old_schema_map,
+            schema_map,
+            sorted_schema=self.sorted_schema,
+            keep_nulls=self.keep_nulls,
+        )
+
+    def flatten_stats(self, schema_map):
+        """Return the per-field statistics collected in the 'schema_map' (if
+        'field_stats' is enabled) as an OrderedDict of {json_full_path: stats}
+        in the same order as flatten_schema().
+        """
+        return flatten_stats_map(
+            schema_map=schema_map,
+            sorted_schema=self.sorted_schema,
+        )
+
     def run(
         self,
         input_file=sys.stdin,
         output_file=sys.stdout,
         schema_map=None,
+        input_paths=None,
+        jobs=1,
+        stats_file=None,
+        diff_file=None,
+        output_dir=None,
     ):
         """Read the data records from the input_file and print out the BigQuery
         schema on the output_file. The error logs are printed on the sys.stderr.
+        If the 'route_by' option is set, the schema of each route is written
+        to its own file in the 'output_dir' instead.
         Args:
             input_file: a file-like object (default: sys.stdin)
             output_file: a file-like object (default: sys.stdout)
             schema_map: the existing bigquery schema_map we start with
+            input_paths: list of data files to read instead of input_file
+            jobs: number of processes used to read the input_paths
+            stats_file: a file-like object for the per-field statistics
+            diff_file: a file-like object for the changes from schema_map
+            output_dir: the directory of the schema files of the routes
         """
-        schema_map, error_logs = self.deduce_schema(
-            input_file, schema_map=schema_map
-        )
+        # The schema_map is updated in place, so keep a copy to compare.
+        old_schema_map = None
+        if diff_file is not None:
+            old_schema_map = copy.deepcopy(schema_map) if schema_map \
+                else OrderedDict()
+
+        if input_paths:
+            schema_map, error_logs = self.deduce_schema_from_paths(
+                input_paths, schema_map=schema_map, jobs=jobs
+            )
+        else:
+            schema_map, error_logs = self.deduce_schema(
+                input_file, schema_map=schema_map
+            )
 
-        for error in error_logs:
+        self.log_problems(error_logs)
+
+        if self.router is not None:
+            self.write_route_schemas(schema_map, output_dir)
+        else:
+            self.write_schema(schema_map, output_file)
+
+        if stats_file is not None:
+            json.dump(self.flatten_stats(schema_map), stats_file, indent=2)
+            print(file=stats_file)
+
+        if diff_file is not None:
+            changes = self.diff_schema(old_schema_map, schema_map)
+            write_json(changes, diff_file)
+            print(file=diff_file)
+            logging.info(f'Schema diff: {summarize_changes(changes)}')
+
+        if self.stats is not None:
+            for line in self.stats.format_report():
+                logging.info(f'Profile: {line}')
             logging.info(
-                f"Problem on line {error['line_number']}: {error['msg']}"
+                f'Profile: type predictions {self.prediction_hits} hits,'
+                f' {self.prediction_misses} misses'
             )
 
+        if self.shape_cache is not None:
+            logging.info(
+                f'Shape cache: {self.shape_cache.hits} hits,'
+                f' {self.shape_cache.misses} misses'
+                + ('' if self.shape_cache.enabled else ' (disabled)')
+            )
+
+        if self.specializer is not None:
+            logging.info(
+                f'Specializer: {self.specializer.hits} hits,'
+                f' {self.specializer.misses} misses,'
+                f' {self.specializer.compilations} compilations'
+                + ('' if self.specializer.enabled else ' (disabled)')
+            )
+
+        if self.line_cache is not None:
+            logging.info(
+                f'Line cache: {self.line_cache.hits} hits,'
+                f' {self.line_cache.misses} misses,'
+                f' {self.line_cache.hit_rate():.1%} hit rate'
+                + ('' if self.line_cache.enabled else ' (disabled)')
+            )
+
+        if self.progress is not None:
+            self.progress.report(self, schema_map, 'done')
+
+    def write_schema(self, schema_map, output_file):
+        """Write the schema of 'schema_map' to the 'output_file', or the
+        'schema_map' itself if 'debugging_map' is set.
+        """
         if self.debugging_map:
-            json.dump(schema_map, output_file, indent=2)
-            print(file=output_file)
+            write_json(schema_map, output_file, default=FieldStats.to_dict)
         else:
-            schema = self.flatten_schema(schema_map)
-            json.dump(schema, output_file, indent=2)
-            print(file=output_file)
+            write_json(self.flatten_schema(schema_map), output_file)
+        print(file=output_file)
+
+    def write_route_schemas(self, schema_maps, output_dir):
+        """Write the schema of each route of 'schema_maps' to a file named
+        after the route (see route_file_names()) in 'output_dir', which is
+        created if needed.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        file_names = route_file_names(schema_maps)
+        for route, schema_map in schema_maps.items():
+            path = os.path.join(output_dir, file_names[route])
+            with open(path, 'w') as route_file:
+                self.write_schema(schema_map, route_file)
+            logging.info(f'Route "{route_name(route)}": {path}')
+        logging.info(f'Wrote {len(schema_maps)} schemas to {output_dir}')
+
+    def run_validation(
+        self,
+        schema_map,
+        input_file=sys.stdin,
+        input_paths=None,
+    ):
+        """Read the data records from the input_file (or the input_paths) and
+        check them against the existing 'schema_map' instead of printing a
+        schema. The violations are printed on the sys.stderr. Returns the
+        number of violations.
+        """
+        if input_paths:
+            error_logs = self.validate_from_paths(input_paths, schema_map)
+        else:
+            error_logs = self.validate(input_file, schema_map)
+        self.log_problems(error_logs)
+        logging.info(
+            f'Found {self.error_count} violations of the existing schema')
+        return self.error_count
+
+    def log_problems(self, error_logs):
+        """Print the 'error_logs' on the sys.stderr."""
+        for error in error_logs:
+            location = format_location(
+                error['input_path'], error['line_number'])
+            logging.info(f"Problem on {location}: {error['msg']}")
+
+
+class RecordFrame:
+    """A record being processed by SchemaGenerator.deduce_schema_for_record()
+    on its explicit stack. The 'items' iterator keeps track of the progress
+    within the current object, and 'objects' iterates over the remaining
+    elements of a REPEATED RECORD. The parent_* attributes are the (key,
+    value, mode) of the nested RECORD in the parent record, and
+    'canonical_key' is its key in the parent's 'schema_map'. The 'depth' of
+    the top-level record is 0.
+    """
+
+    __slots__ = (
+        'items',
+        'objects',
+        'schema_map',
+        'base_path',
+        'parent_key',
+        'parent_value',
+        'parent_mode',
+        'canonical_key',
+        'depth',
+    )
+
+    def __init__(self, json_object, objects, schema_map, base_path):
+        self.items = iter(json_object.items())
+        self.objects = objects
+        self.schema_map = schema_map
+        self.base_path = base_path
+        self.parent_key = None
+        self.parent_value = None
+        self.parent_mode = None
+        self.canonical_key = None
+        self.depth = 0
+
+
+def deduce_schema_for_path(options, schema_map, input_path):
+    """Deduce the schema of a single data file using a new SchemaGenerator
+    configured with 'options', starting from 'schema_map'. This is the unit of
+    work performed by the worker processes of
+    SchemaGenerator.deduce_schema_from_paths().
+    """
+    generator = SchemaGenerator(**options)
+    schema_map, _ = generator.deduce_schema_from_paths(
+        [input_path], schema_map=schema_map
+    )
+    return {
+        'schema_map': schema_map,
+        'records': generator.line_number,
+        'error_count': generator.error_count,
+        'error_logs': generator.error_logs,
+        'prediction_hits': generator.prediction_hits,
+        'prediction_misses': generator.prediction_misses,
+        'error_summary': generator.error_summary,
+        'stats': generator.stats,
+    }
 
 
 def json_reader(input_data):
     """A generator that converts an iterable of newline-delimited JSON objects
     ('input_data' could be a 'list' for testing purposes) into an iterable of
     Python dict objects. If the line cannot be parsed as JSON, the exception
-    thrown by the json.loads() is yielded back, instead of the json object.
+    thrown by the loads_json() is yielded back, instead of the json object.
     The calling code can check for this exception with an isinstance() function,
     then continue processing the rest of the file.
     """
     for line in input_data:
         try:
-            yield json.loads(line)
+            yield loads_json(line)
         except Exception as e:
             yield e
 
 
-def convert_type(atype, btype):
-    """Return the compatible type between 'atype' and 'btype'. Return 'None'
-    if there is no compatible type. Type conversions (in order of precedence)
-    are:
-
-    * type + type => type
-    * [Q]BOOLEAN + [Q]BOOLEAN => BOOLEAN
-    * [Q]INTEGER + [Q]INTEGER => INTEGER
-    * [Q]FLOAT + [Q]FLOAT => FLOAT
-    * QINTEGER + QFLOAT = QFLOAT
-    * QFLOAT + QINTEGER = QFLOAT
-    * [Q]INTEGER + [Q]FLOAT => FLOAT (except QINTEGER + QFLOAT)
-    * [Q]FLOAT + [Q]INTEGER => FLOAT (except QFLOAT + QINTEGER)
-    * (DATE, TIME, TIMESTAMP, QBOOLEAN, QINTEGER, QFLOAT, STRING) +
-        (DATE, TIME, TIMESTAMP, QBOOLEAN, QINTEGER, QFLOAT, STRING) => STRING
-
-    The "Q" refers to the quoted (i.e. string) versions of the various types,
-    which are needed to emulate the type inference inside quoted strings
-    performed by BigQuery.
+# Number of characters read at a time by json_stream_reader().
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Whitespace allowed between JSON values.
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# A JSONDecodeError within this many characters of the end of the buffer may
+# be caused by a value cut in the middle of a literal or an escape sequence.
+STREAM_LOOKAHEAD = 16
+
+
+def json_stream_reader(input_data, chunk_size=STREAM_CHUNK_SIZE):
+    """A generator of the JSON values of 'input_data' (a file-like object, or
+    an iterable of strings for testing purposes) which are not necessarily one
+    per line: concatenated or pretty-printed objects, or the elements of a
+    top-level JSON array. The input is read in chunks of 'chunk_size'
+    characters, and only the part of the buffer which was not decoded yet is
+    kept, so the memory is bounded by the size of the largest value instead of
+    the size of the file.
+
+    Like json_reader(), a value which cannot be parsed is yielded as the
+    exception thrown by the decoder. The rest of its line is then skipped.
     """
-    # type + type => type
-    if atype == btype:
-        return atype
-
-    # [Q]BOOLEAN + [Q]BOOLEAN => BOOLEAN
-    if atype == 'BOOLEAN' and btype == 'QBOOLEAN':
-        return 'BOOLEAN'
-    if atype == 'QBOOLEAN' and btype == 'BOOLEAN':
-        return 'BOOLEAN'
-
-    # [Q]INTEGER + [Q]INTEGER => INTEGER
-    if atype == 'QINTEGER' and btype == 'INTEGER':
-        return 'INTEGER'
-    if atype == 'INTEGER' and btype == 'QINTEGER':
-        return 'INTEGER'
-
-    # [Q]FLOAT + [Q]FLOAT => FLOAT
-    if atype == 'QFLOAT' and btype == 'FLOAT':
-        return 'FLOAT'
-    if atype == 'FLOAT' and btype == 'QFLOAT':
-        return 'FLOAT'
-
-    # QINTEGER + QFLOAT => QFLOAT
-    if atype == 'QINTEGER' and btype == 'QFLOAT':
-        return 'QFLOAT'
-
-    # QFLOAT + QINTEGER => QFLOAT
-    if atype == 'QFLOAT' and btype == 'QINTEGER':
-        return 'QFLOAT'
-
-    # [Q]INTEGER + [Q]FLOAT => FLOAT (except QINTEGER + QFLOAT => QFLOAT)
-    if atype == 'INTEGER' and btype == 'FLOAT':
-        return 'FLOAT'
-    if atype == 'INTEGER' and btype == 'QFLOAT':
-        return 'FLOAT'
-    if atype == 'QINTEGER' and btype == 'FLOAT':
-        return 'FLOAT'
-
-    # [Q]FLOAT + [Q]INTEGER => FLOAT (except # QFLOAT + QINTEGER => QFLOAT)
-    if atype == 'FLOAT' and btype == 'INTEGER':
-        return 'FLOAT'
-    if atype == 'FLOAT' and btype == 'QINTEGER':
-        return 'FLOAT'
-    if atype == 'QFLOAT' and btype == 'INTEGER':
-        return 'FLOAT'
-
-    # All remaining combination of:
-    # (DATE, TIME, TIMESTAMP, QBOOLEAN, QINTEGER, QFLOAT, STRING) +
-    #   (DATE, TIME, TIMESTAMP, QBOOLEAN, QINTEGER, QFLOAT, STRING) => STRING
-    if is_string_type(atype) and is_string_type(btype):
-        return 'STRING'
+    if hasattr(input_data, 'read'):
+        chunks = iter(lambda: input_data.read(chunk_size), '')
+    else:
+        chunks = iter(input_data)
+    buffer = ''
+    pos = 0
+    eof = False
+    # None until the first value, then True inside a top-level array.
+    in_array = None
+    # Minimum number of characters to read before retrying to decode a value
+    # which is incomplete. It doubles on each retry, so that a value is
+    # decoded only O(log(size)) times.
+    min_read = chunk_size
+    while True:
+        pos = JSON_WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                return
+            buffer, pos, eof = read_chunks(chunks, buffer, pos, 1)
+            continue
 
-    return None
+        char = buffer[pos]
+        if in_array is None:
+            in_array = char == '['
+            if in_array:
+                pos += 1
+                continue
+        if in_array and char in ',]':
+            pos += 1
+            continue
 
+        try:
+            value, end = raw_decode_json(buffer, pos)
+        except json.JSONDecodeError as e:
+            # A string cannot contain a newline, so a string which is not
+            # terminated before the next newline is malformed, and the rest
+            # of the input must not be buffered to find its end.
+            end = buffer.find('\n', e.pos)
+            incomplete = (
+                (e.msg.startswith('Unterminated string') and end < 0)
+                or e.pos >= len(buffer) - STREAM_LOOKAHEAD
+            )
+            if incomplete and not eof:
+                buffer, pos, eof = read_chunks(chunks, buffer, pos, min_read)
+                min_read = max(min_read, len(buffer) - pos)
+                continue
+            yield e
+            pos = len(buffer) if end < 0 else end + 1
+            continue
+        min_read = chunk_size
+        pos = end
+        yield value
 
-STRING_TYPES = frozenset([
-    'STRING', 'TIMESTAMP', 'DATE', 'TIME', 'QINTEGER', 'QFLOAT', 'QBOOLEAN'
-])
 
+def read_chunks(chunks, buffer, pos, min_read):
+    """Append at least 'min_read' characters from the 'chunks' iterator to the
+    part of the 'buffer' after 'pos'. Returns the new (buffer, pos, eof).
+    """
+    pieces = [buffer[pos:]]
+    size = 0
+    for chunk in chunks:
+        pieces.append(chunk)
+        size += len(chunk)
+        if size >= min_read:
+            return ''.join(pieces), 0, False
+    return ''.join(pieces), 0, True
+
+
+def write_json(obj, output_file, indent=2, default=None):
+    """Write 'obj' to 'output_file' exactly like json.dump(obj, output_file,
+    indent=indent, default=default), but using an explicit stack instead of
+    recursion, so that the schema of deeply nested records can be printed.
+    """
+    write = output_file.write
+    end = object()
+    stack = []
+    value = obj
+    while True:
+        if isinstance(value, dict):
+            if value:
+                write('{')
+                stack.append([iter(value.items()), '}', False])
+            else:
+                write('{}')
+        elif isinstance(value, (list, tuple)):
+            if value:
+                write('[')
+                stack.append([iter(value), ']', False])
+            else:
+                write('[]')
+        elif isinstance(value, (str, int, float, bool)) or value is None:
+            write(json.dumps(value))
+        elif default is not None:
+            value = default(value)
+            continue
+        else:
+            raise TypeError(
+                f'Object of type {type(value).__name__} '
+                'is not JSON serializable'
+            )
 
-def is_string_type(thetype):
-    """Returns true if the type is one of: STRING, TIMESTAMP, DATE, or
-    TIME."""
-    return thetype in STRING_TYPES
+        # Find the next value to write, closing the finished containers.
+        while stack:
+            frame = stack[-1]
+            item = next(frame[0], end)
+            if item is end:
+                stack.pop()
+                write('\n' + ' ' * (indent * len(stack)) + frame[1])
+                continue
+            write((',\n' if frame[2] else '\n')
+                  + ' ' * (indent * len(stack)))
+            frame[2] = True
+            if frame[1] == '}':
+                key, value = item
+                if not isinstance(key, str):
+                    key = json.dumps(key)
+                write(json.dumps(key) + ': ')
+            else:
+                value = item
+            break
+        else:
+            return
 
 
 def flatten_schema_map(
@@ -895,8 +1925,32 @@ def flatten_schema_map(
             f"Unexpected type '{type(schema_map)}' for schema_map"
         )
 
-    # Build the BigQuery schema from the internal 'schema_map'.
+    # Build the BigQuery schema from the internal 'schema_map'. The nested
+    # schema_maps of the RECORDs are flattened using the 'pending' stack
+    # instead of recursion, into the list of 'fields' created for them.
     schema = []
+    pending = [(schema_map, schema)]
+    while pending:
+        schema_map, fields_list = pending.pop()
+        flatten_schema_map_level(
+            schema_map, fields_list, pending, keep_nulls, sorted_schema,
+            infer_mode, input_format)
+    return schema
+
+
+def flatten_schema_map_level(
+    schema_map,
+    schema,
+    pending,
+    keep_nulls,
+    sorted_schema,
+    infer_mode,
+    input_format,
+):
+    """Flatten a single level of the 'schema_map' into the 'schema' list. The
+    non-empty sub-fields of RECORDs are appended to 'pending' as a
+    (schema_map, fields_list) tuple to be flattened by flatten_schema_map().
+    """
     map_items = sorted(schema_map.items()) if sorted_schema \
         else schema_map.items()
     for name, meta in map_items:
@@ -937,14 +1991,9 @@ def flatten_schema_map(
                         ])
                     ]
                 else:
-                    # Recursively flatten the sub-fields of a RECORD entry.
-                    new_value = flatten_schema_map(
-                        schema_map=value,
-                        keep_nulls=keep_nulls,
-                        sorted_schema=sorted_schema,
-                        infer_mode=infer_mode,
-                        input_format=input_format
-                    )
+                    # Flatten the sub-fields of a RECORD entry later.
+                    new_value = []
+                    pending.append((value, new_value))
             elif key == 'type' and value in ['QINTEGER', 'QFLOAT', 'QBOOLEAN']:
                 # Convert QINTEGER -> INTEGER, similarly for QFLOAT and QBOOLEAN
                 new_value = value[1:]
@@ -972,7 +2021,16 @@ def flatten_schema_map(
                 new_value = value
             new_info[key] = new_value
         schema.append(new_info)
-    return schema
+
+
+def convert_to_json_entry(schema_entry):
+    """Convert the given RECORD 'schema_entry' into a JSON column in place,
+    dropping its sub-fields.
+    """
+    info = schema_entry['info']
+    info.pop('fields', None)
+    info['type'] = 'JSON'
+    schema_entry['status'] = 'hard'
 
 
 def bq_schema_to_map(schema):
@@ -980,8 +2038,16 @@ def bq_schema_to_map(schema):
         schema_map representaton """
     if isinstance(schema, dict):
         schema = schema['fields']
-    return OrderedDict((f['name'].lower(), bq_schema_field_to_entry(f))
-                       for f in schema)
+    # The sub-fields of the RECORDs are converted using the 'pending' stack
+    # instead of recursion, into the schema_map created for them.
+    schema_map = OrderedDict()
+    pending = [(schema, schema_map)]
+    while pending:
+        fields, fields_map = pending.pop()
+        for f in fields:
+            fields_map[f['name'].lower()] = bq_schema_field_to_entry(
+                f, pending)
+    return schema_map
 
 
 BQ_TYPES = frozenset([
@@ -995,6 +2061,7 @@ BQ_TYPES = frozenset([
     'TIME',
     'DATETIME',
     'RECORD',
+    'JSON',
 ])
 
 BQ_TYPE_ALIASES = {
@@ -1013,15 +2080,24 @@ def bq_type_to_entry_type(type):
     raise TypeError(f'Unknown BQ type ""{type}"')
 
 
-def bq_schema_field_to_entry(field):
+def bq_schema_field_to_entry(field, pending=None):
+    """Convert the BQ schema 'field' into a schema_map entry. The sub-fields
+    of a RECORD are appended to 'pending' as a (fields, schema_map) tuple to
+    be converted by bq_schema_to_map(), or converted here if it is None.
+    """
     type = bq_type_to_entry_type(field['type'])
     # In some cases with nested fields within a record, bigquery does not
     # populate a mode field. We will assume this is NULLABLE in this case
     mode = field.get('mode', 'NULLABLE')
     # maintain order of info fields
     if type == 'RECORD':
+        if pending is None:
+            fields_map = bq_schema_to_map(field['fields'])
+        else:
+            fields_map = OrderedDict()
+            pending.append((field['fields'], fields_map))
         info = OrderedDict([
-            ('fields', bq_schema_to_map(field['fields'])),
+            ('fields', fields_map),
             ('mode', mode),
             ('name', field['name']),
             ('type', type),
@@ -1047,10 +2123,29 @@ def read_existing_schema_from_file(existing_schema_path):
     return None
 
 
+def collect_field_paths(schema_map):
+    """Return the set of the lower-cased full paths (e.g. 'server.port') of
+    all the fields of 'schema_map', including the sub-fields of RECORDs.
+    """
+    paths = set()
+    pending = [(schema_map, None)]
+    while pending:
+        schema_map, base_path = pending.pop()
+        for schema_entry in schema_map.values():
+            if not schema_entry:
+                continue
+            info = schema_entry['info']
+            path = json_full_path(base_path, info['name'].lower())
+            paths.add(path)
+            if info['type'] == 'RECORD':
+                pending.append((info['fields'], path))
+    return paths
+
+
 def json_full_path(base_path, key):
     """Return the dot-separated JSON full path to a particular key.
     e.g. 'server.config.port'. Column names in CSV files are never nested,
-    so this will always return `key`.
+    so this will always return `key`. The 'base_path' may be a FieldPath.
     """
     if base_path is None or base_path == "":
         return key
@@ -1058,15 +2153,28 @@ def json_full_path(base_path, key):
         return f'{base_path}.{key}'
 
 
+def split_paths(paths):
+    """Return the list of the comma-separated 'paths' of a flag, or None."""
+    if not paths:
+        return None
+    return [path.strip() for path in paths.split(',') if path.strip()]
+
+
 def main():
     # Configure command line flags.
     parser = argparse.ArgumentParser(
         description='Generate BigQuery schema from JSON or CSV file.')
+    parser.add_argument(
+        'input_paths',
+        help='Data files or glob patterns to read instead of the STDIN,'
+        ' optionally compressed with gzip, bzip2, xz or zstd',
+        metavar='input_path',
+        nargs='*')
     parser.add_argument(
         '--input_format',
         help=(
             "Specify an alternative input format "
-            "('csv', 'json', 'dict', 'csvdictreader)"
+            "('csv', 'json', 'jsonstream', 'dict', 'csvdictreader)"
         ),
         default='json')
     parser.add_argument(
@@ -1112,11 +2220,179 @@ def main():
         ' This only impacts `input_format` of json or dict',
         action='store_true'
     )
+    parser.add_argument(
+        '--stats',
+        help='Write the per-field statistics (counts of nulls and types,'
+        ' numerical range, maximum string length) to the given JSON file',
+        metavar='STATS_PATH',
+        default=None)
+    parser.add_argument(
+        '--cardinality',
+        help='Estimate the number of distinct values of each field in the'
+        ' --stats file',
+        action='store_true')
+    parser.add_argument(
+        '--max_record_keys',
+        help='Convert a nested RECORD with more than this number of fields'
+        ' (e.g. an object used as a map) into a single JSON column',
+        type=int,
+        default=None)
+    parser.add_argument(
+        '--max_error_samples',
+        help='Aggregate the errors by kind and field, printing each one once'
+        ' with its count and keeping only this number of samples',
+        type=int,
+        default=None)
+    parser.add_argument(
+        '--profile',
+        help='Print the time spent in each phase and the number of schema'
+        ' entries allocated, merged, widened and ignored',
+        action='store_true')
+    parser.add_argument(
+        '--progress',
+        help='Print the progress as JSON lines on the STDERR',
+        action='store_true')
+    parser.add_argument(
+        '--progress_path',
+        help='Write the progress as JSON lines to this file',
+        default=None)
+    parser.add_argument(
+        '--shape_cache_size',
+        help='Remember up to N distinct record shapes (keys and types of'
+        ' values) merged into the schema, and skip the records with the same'
+        ' shape',
+        type=int,
+        default=None)
+    parser.add_argument(
+        '--specialize_after',
+        help='Compile the schema into a specialized matcher after N records,'
+        ' and skip the records which cannot change it',
+        type=int,
+        default=None)
+    parser.add_argument(
+        '--line_cache_size',
+        help='Remember up to N distinct JSON lines merged into the schema,'
+        ' and skip the identical lines without decoding them',
+        type=int,
+        default=None)
+    parser.add_argument(
+        '--route_by',
+        help='Deduce a schema for each value of the field at this dotted path,'
+        ' written to the --output_dir',
+        metavar='PATH',
+        default=None)
+    parser.add_argument(
+        '--output_dir',
+        help='Directory of the schema files of --route_by or --variant',
+        default=None)
+    parser.add_argument(
+        '--max_routes',
+        help='Maximum number of --route_by values, the records of the other'
+        ' values are ignored (default: 100)',
+        type=int,
+        default=None)
+    parser.add_argument(
+        '--include_paths',
+        help='Comma-separated dotted paths of the only fields to deduce, with'
+        ' wildcards (e.g. "user.*,event")',
+        metavar='PATHS',
+        default=None)
+    parser.add_argument(
+        '--exclude_paths',
+        help='Comma-separated dotted paths of the fields to remove from the'
+        ' records without inspecting them, with wildcards (e.g.'
+        ' "payload,meta.debug_*")',
+        metavar='PATHS',
+        default=None)
+    parser.add_argument(
+        '--max_depth',
+        help='Maximum nesting level of the fields, the deeper RECORDs are'
+        ' collapsed into a single --max_depth_type column',
+        type=int,
+        default=None)
+    parser.add_argument(
+        '--max_depth_type',
+        help='Type of the RECORDs collapsed by --max_depth (default: JSON)',
+        choices=['JSON', 'STRING'],
+        default='JSON')
+    parser.add_argument(
+        '--variant',
+        help='Also deduce the schema with these flags in the same pass, written'
+        ' to <output_dir>/NAME.schema.json (e.g. "strings:'
+        'quoted_values_are_strings,no_keep_nulls"), can be repeated',
+        metavar='NAME:FLAGS',
+        action='append',
+        default=[])
+    parser.add_argument(
+        '--diff',
+        help='Write the columns added, widened, relaxed or ignored relative to'
+        ' the --existing_schema_path to the given JSON file',
+        metavar='DIFF_PATH',
+        default=None)
+    parser.add_argument(
+        '--fail_fast',
+        help='Stop at the first value which is not compatible with the'
+        ' --existing_schema_path, and exit with a non-zero status',
+        action='store_true')
+    parser.add_argument(
+        '--validate_only',
+        help='Check the input against the --existing_schema_path instead of'
+        ' printing a schema, and exit with a non-zero status if it is not'
+        ' compatible',
+        action='store_true')
+    parser.add_argument(
+        '--jobs',
+        help='Number of processes used to read multiple input files',
+        type=int,
+        default=1)
     args = parser.parse_args()
+    variants = OrderedDict()
+    for text in args.variant:
+        try:
+            name, options = parse_variant(text)
+        except ValueError as e:
+            parser.error(str(e))
+        variants[name] = options
+    if args.validate_only and not args.existing_schema_path:
+        parser.error('--validate_only requires --existing_schema_path')
+    if args.fail_fast and not args.existing_schema_path:
+        parser.error('--fail_fast requires --existing_schema_path')
+    if args.max_depth is not None and args.max_depth < 1:
+        parser.error('--max_depth must be at least 1')
+    if ((args.include_paths or args.exclude_paths)
+            and args.input_format == 'csv'):
+        parser.error('--include_paths and --exclude_paths cannot be used with'
+                     ' CSV files')
+    if args.route_by:
+        if not args.output_dir:
+            parser.error('--route_by requires --output_dir')
+        if (args.existing_schema_path or args.validate_only or args.diff
+                or args.stats):
+            parser.error('--route_by cannot be used with'
+                         ' --existing_schema_path, --validate_only, --diff'
+                         ' or --stats')
+
+    if variants:
+        if not args.output_dir:
+            parser.error('--variant requires --output_dir')
+        if (args.existing_schema_path or args.validate_only or args.diff
+                or args.stats or args.route_by or args.jobs > 1
+                or args.line_cache_size):
+            parser.error('--variant cannot be used with'
+                         ' --existing_schema_path, --validate_only, --diff,'
+                         ' --stats, --route_by, --jobs or --line_cache_size')
 
     # Configure logging.
     logging.basicConfig(level=logging.INFO)
 
+    progress_file = None
+    progress_callback = None
+    if args.progress_path:
+        progress_file = open(args.progress_path, 'w')
+        progress_callback = json_lines_callback(progress_file)
+    elif args.progress:
+        progress_callback = json_lines_callback(sys.stderr)
+
     generator = SchemaGenerator(
         input_format=args.input_format,
         infer_mode=args.infer_mode,
@@ -1126,11 +2402,65 @@ def main():
         debugging_map=args.debugging_map,
         sanitize_names=args.sanitize_names,
         ignore_invalid_lines=args.ignore_invalid_lines,
-        preserve_input_sort_order=args.preserve_input_sort_order
+        preserve_input_sort_order=args.preserve_input_sort_order,
+        field_stats=args.stats is not None,
+        field_cardinality=args.cardinality,
+        max_record_keys=args.max_record_keys,
+        max_error_samples=args.max_error_samples,
+        profile=args.profile,
+        progress_callback=progress_callback,
+        shape_cache_size=args.shape_cache_size,
+        fail_fast=args.fail_fast,
+        specialize_after=args.specialize_after,
+        line_cache_size=args.line_cache_size,
+        route_by=args.route_by,
+        max_routes=args.max_routes,
+        include_paths=split_paths(args.include_paths),
+        exclude_paths=split_paths(args.exclude_paths),
+        max_depth=args.max_depth,
+        max_depth_type=args.max_depth_type,
     )
     existing_schema_map = read_existing_schema_from_file(
         args.existing_schema_path)
-    generator.run(schema_map=existing_schema_map)
+    stats_file = open(args.stats, 'w') if args.stats else None
+    diff_file = open(args.diff, 'w') if args.diff else None
+    error_count = 0
+    try:
+        if variants:
+            SchemaVariants(generator, variants).run(
+                sys.stdin,
+                sys.stdout,
+                input_paths=expand_input_paths(args.input_paths),
+                output_dir=args.output_dir,
+            )
+        elif args.validate_only:
+            error_count = generator.run_validation(
+                existing_schema_map,
+                input_paths=expand_input_paths(args.input_paths),
+            )
+        else:
+            generator.run(
+                schema_map=existing_schema_map,
+                input_paths=expand_input_paths(args.input_paths),
+                jobs=args.jobs,
+                stats_file=stats_file,
+                diff_file=diff_file,
+                output_dir=args.output_dir,
+            )
+    except SchemaIncompatibleError as e:
+        logging.error(str(e))
+        if e.record is not None:
+            logging.error(f'Record: {json.dumps(e.record)}')
+        error_count = 1
+    finally:
+        if stats_file is not None:
+            stats_file.close()
+        if diff_file is not None:
+            diff_file.close()
+        if progress_file is not None:
+            progress_file.close()
+    if error_count:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
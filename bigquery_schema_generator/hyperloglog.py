@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A HyperLogLog sketch used to estimate the number of distinct values of each
+field (see field_stats.py). The sketch has a fixed size of 2^precision bytes
+regardless of the number of values added to it, and 2 sketches with the same
+precision can be merged, e.g. when the schemas deduced from different files
+are merged.
+
+The values are hashed with an unkeyed BLAKE2b digest instead of the built-in
+hash(), whose value for strings changes from one process to another, so that
+sketches created by different worker processes can be merged.
+"""
+
+import hashlib
+import math
+
+# The default precision uses 4096 registers (4 kiB) per sketch, for a
+# typical relative error of 1.04 / sqrt(4096) = 1.6%.
+DEFAULT_PRECISION = 12
+
+
+class HyperLogLog:
+    """Estimate the number of distinct values added to the sketch.
+
+    Usage:
+        sketch = HyperLogLog()
+        for value in values:
+            sketch.add(value)
+        count = sketch.estimate()
+    """
+
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not 4 <= precision <= 16:
+            raise Exception(f'Unsupported precision {precision}')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        """Add the 'value' (a string, number or boolean) to the sketch."""
+        if not isinstance(value, str):
+            value = repr(value)
+        digest = hashlib.blake2b(
+            value.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        width = 64 - self.precision
+        index = hashed >> width
+        rank = width - (hashed & ((1 << width) - 1)).bit_length() + 1
+        if self.registers[index] < rank:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Merge the 'other' sketch into this one. The result is the sketch
+        of the union of the 2 sets of values.
+        """
+        if self.precision != other.precision:
+            raise Exception(
+                'Cannot merge sketches with different precisions: '
+                f'{self.precision} != {other.precision}'
+            )
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self):
+        """Return the estimated number of distinct values, using the linear
+        counting correction for small cardinalities.
+        """
+        m = len(self.registers)
+        if m == 16:
+            alpha = 0.673
+        elif m == 32:
+            alpha = 0.697
+        elif m == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        total = sum(2.0 ** -r for r in self.registers)
+        estimate = alpha * m * m / total
+        if estimate <= 2.5 * m:
+            zeros = self.registers.count(0)
+            if zeros:
+                estimate = m * math.log(m / zeros)
+        return estimate
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Helpers for opening the input data files given on the command line of
+generate_schema.py. Compressed files (gzip, bzip2, xz and, if the 'zstandard'
+package is installed, zstd) are detected by their magic bytes and decompressed
+on the fly, so that they do not have to be piped through 'zcat' first.
+
+Usage:
+    with open_input_file('file.data.json.gz') as input_file:
+        for line in input_file:
+            ...
+"""
+
+import bz2
+import glob
+import gzip
+import io
+import lzma
+import os
+import queue
+import sys
+import threading
+
+# Magic bytes at the start of each supported compressed file format.
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Size of each block of decompressed data passed from the decompression thread
+# to the reader.
+CHUNK_SIZE = 1 << 20
+
+# Maximum number of decompressed blocks buffered ahead of the reader.
+MAX_QUEUED_CHUNKS = 4
+
+
+def open_input_file(path, newline=None, encoding='utf-8'):
+    """Open the file at 'path' (or STDIN if 'path' is '-') for reading as text,
+    transparently decompressing gzip, bzip2, xz or zstd data. The decompression
+    runs in a separate thread so that it overlaps with the schema deduction
+    performed by the calling thread.
+
+    The 'newline' parameter is passed to io.TextIOWrapper(). It should be set
+    to '' for CSV files, as recommended by the 'csv' module.
+    """
+    if path == '-':
+        raw_file = sys.stdin.buffer
+    else:
+        raw_file = open(path, 'rb')
+    try:
+        compression = detect_compression(raw_file)
+        if compression is None:
+            binary_file = raw_file
+        else:
+            decompressor = open_decompressor(raw_file, compression)
+            binary_file = io.BufferedReader(
+                PrefetchingReader(decompressor, raw_file), CHUNK_SIZE)
+    except Exception:
+        raw_file.close()
+        raise
+    return io.TextIOWrapper(binary_file, encoding=encoding, newline=newline)
+
+
+def expand_input_paths(patterns):
+    """Expand the glob 'patterns' (e.g. 'data/*.json.gz') into a list of file
+    paths. The order of the 'patterns' is preserved, and the files matching a
+    single pattern are sorted by name, so that the order is deterministic.
+    Patterns without wildcards (including '-') are returned as-is.
+    """
+    input_paths = []
+    for pattern in patterns:
+        if not any(c in pattern for c in '*?['):
+            input_paths.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            raise Exception(f"No input files match '{pattern}'")
+        input_paths.extend(matches)
+    return input_paths
+
+
+def input_position(input_file):
+    """Return the (bytes_consumed, total_bytes) tuple of the given file
+    object opened by open_input_file() (or any text or binary file object).
+    For compressed files, both numbers refer to the compressed bytes on disk.
+    'total_bytes' is None if the file is not seekable (e.g. a pipe), and
+    (None, None) is returned if the position cannot be determined at all.
+    """
+    binary_file = getattr(input_file, 'buffer', input_file)
+    raw = getattr(binary_file, 'raw', None)
+    if isinstance(raw, PrefetchingReader):
+        binary_file = raw.raw_file
+    try:
+        if not binary_file.seekable():
+            return (None, None)
+        return (binary_file.tell(), os.fstat(binary_file.fileno()).st_size)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return (None, None)
+
+
+def detect_compression(binary_file):
+    """Return the name of the compression format ('gzip', 'bz2', 'xz',
+    'zstd') of the given buffered binary file by peeking at its magic bytes,
+    or None if the file does not appear to be compressed.
+    """
+    header = binary_file.peek(len(XZ_MAGIC))[:len(XZ_MAGIC)]
+    if header.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if header.startswith(BZIP2_MAGIC):
+        return 'bz2'
+    if header.startswith(XZ_MAGIC):
+        return 'xz'
+    if header.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+def open_decompressor(binary_file, compression):
+    """Wrap 'binary_file' with a file-like object that decompresses the
+    data using the given 'compression' format.
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=binary_file, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(binary_file, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(binary_file, mode='rb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(
+                "Reading zstd files requires the 'zstandard' package:"
+                " pip3 install zstandard"
+            )
+        # A zstd file may contain several frames, e.g. concatenated files.
+        return zstandard.ZstdDecompressor().stream_reader(
+            binary_file, read_across_frames=True)
+    raise Exception(f"Unknown compression '{compression}'")
+
+
+class PrefetchingReader(io.RawIOBase):
+    """A raw, read-only, binary stream which reads blocks of data from the
+    underlying 'source' file in a background thread. The gzip, bz2, lzma and
+    zstandard modules release the GIL while decompressing, so the
+    decompression of the next block overlaps with the processing of the
+    current block by the reading thread.
+    """
+
+    def __init__(self, source, raw_file=None, chunk_size=CHUNK_SIZE):
+        super().__init__()
+        self.source = source
+        self.raw_file = raw_file
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(MAX_QUEUED_CHUNKS)
+        self.stopped = threading.Event()
+        self.buffer = b''
+        self.offset = 0
+        self.eof = False
+        self.thread = threading.Thread(target=self._fill, daemon=True)
+        self.thread.start()
+
+    def _fill(self):
+        """Runs in the background thread. Read blocks from the source until
+        EOF, an exception, or close() is called. The EOF is signaled with an
+        empty block, an exception is passed through the queue as-is.
+        """
+        try:
+            while not self.stopped.is_set():
+                chunk = self.source.read(self.chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        """Put the 'item' on the queue, giving up if close() is called while
+        waiting for the reader to catch up.
+        """
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.offset >= len(self.buffer):
+            if self.eof:
+                return 0
+            chunk = self.chunks.get()
+            if isinstance(chunk, Exception):
+                self.eof = True
+                raise chunk
+            if not chunk:
+                self.eof = True
+                return 0
+            self.buffer = chunk
+            self.offset = 0
+
+        size = min(len(b), len(self.buffer) - self.offset)
+        b[:size] = self.buffer[self.offset:self.offset + size]
+        self.offset += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.stopped.set()
+            self.thread.join()
+            self.source.close()
+            if self.raw_file is not None:
+                self.raw_file.close()
+        super().close()
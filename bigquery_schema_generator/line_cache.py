@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A bounded cache of the raw lines of a newline-delimited JSON file which were
+already merged into a schema_map, enabled by the 'line_cache_size' option
+(--line_cache_size flag). Log files (e.g. heartbeats or metrics) often contain
+many byte-identical lines. Merging the same record again cannot change the
+schema_map (see shape_cache.py), so a line which is already in the cache is
+not even decoded: the reader yields DUPLICATE_LINE instead of the record.
+
+The lines are kept in a set, so that a line is found by its hash, and is then
+compared with the cached line, so a collision of the hashes of 2 different
+lines cannot skip a record. Only the lines whose record was merged without any
+error are added, and the whole cache is cleared whenever an error is logged,
+so the errors are reported on the same lines with or without the cache.
+"""
+
+from bigquery_schema_generator.numeric import loads_json
+from bigquery_schema_generator.shape_cache import MIN_LOOKUPS
+
+# Yielded by LineCache.reader() instead of the record of a line which was
+# already merged into the schema_map.
+DUPLICATE_LINE = object()
+
+
+class LineCache:
+    """The set of raw lines whose records were merged into the schema_map.
+
+    Usage:
+        cache = LineCache(max_size)
+        for json_object in cache.reader(input_data):
+            if json_object is DUPLICATE_LINE:
+                continue
+            ... merge json_object into schema_map ...
+            if no error:
+                cache.add_last_line()
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lines = set()
+        self.last_line = None
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def reader(self, input_data):
+        """Like json_reader(), but yield DUPLICATE_LINE for the lines which
+        are in the cache.
+        """
+        lines = self.lines
+        for line in input_data:
+            if self.enabled:
+                if line in lines:
+                    self.hits += 1
+                    yield DUPLICATE_LINE
+                    continue
+                self.misses += 1
+                if (self.hits + self.misses >= MIN_LOOKUPS
+                        and self.misses > self.hits):
+                    # Almost all lines are different.
+                    self.enabled = False
+                    lines.clear()
+                self.last_line = line
+            try:
+                yield loads_json(line)
+            except Exception as e:
+                yield e
+
+    def add_last_line(self):
+        """Add the line of the last record yielded by reader(), after it was
+        merged without any error.
+        """
+        if not self.enabled or self.last_line is None:
+            return
+        if len(self.lines) >= self.max_size:
+            self.lines.clear()
+        self.lines.add(self.last_line)
+        self.last_line = None
+
+    def clear(self):
+        self.lines.clear()
+        self.last_line = None
+
+    def hit_rate(self):
+        """Return the fraction of the lines found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Classification of the integer literals, quoted or not, as an INTEGER or as a
+FLOAT if they overflow a signed 64-bit integer, for consistency with 'bq
+load'. The decision is made from the number of digits and a lexical
+comparison with the digits of the limits, without converting the literal into
+an int, which is slow for long literals and raises a ValueError for literals
+longer than the limit of CPython (see sys.get_int_max_str_digits()).
+
+The JSON numbers are decoded into an int by the json module, which raises the
+same ValueError. The lines which contain such a literal are decoded again by
+loads_json() and raw_decode_json() with parse_integer_literal(), which turns
+it into a float, like the other overflowing integers.
+"""
+
+import json
+
+# Number of digits of 2**63 - 1 and of -2**63.
+INTEGER_MAX_DIGITS = 19
+
+# The digits of the INTEGER_MAX_VALUE and of the INTEGER_MIN_VALUE of
+# SchemaGenerator, i.e. 2**63 - 1 and -2**63.
+INTEGER_MAX_LITERAL = '9223372036854775807'
+INTEGER_MIN_LITERAL = '9223372036854775808'
+
+
+def classify_integer_literal(literal):
+    """Return 'INTEGER' if the integer 'literal' (an optional sign followed
+    by decimal digits, as matched by SchemaGenerator.INTEGER_MATCHER) fits
+    in a signed 64-bit integer, or 'FLOAT' if it overflows.
+    """
+    # At most 18 digits, the common case.
+    if len(literal) < INTEGER_MAX_DIGITS:
+        return 'INTEGER'
+    negative = literal[0] == '-'
+    digits = literal[1:] if literal[0] in '+-' else literal
+    digits = digits.lstrip('0')
+    if len(digits) < INTEGER_MAX_DIGITS:
+        return 'INTEGER'
+    if len(digits) > INTEGER_MAX_DIGITS:
+        return 'FLOAT'
+    limit = INTEGER_MIN_LITERAL if negative else INTEGER_MAX_LITERAL
+    # Strings of the same number of digits compare like their numbers.
+    return 'INTEGER' if digits <= limit else 'FLOAT'
+
+
+def parse_integer_literal(literal):
+    """Return the value of the integer 'literal' as an int, or as a float
+    if classify_integer_literal() says it overflows.
+    """
+    if len(literal) < INTEGER_MAX_DIGITS:
+        return int(literal)
+    if classify_integer_literal(literal) == 'FLOAT':
+        return float(literal)
+    # Strip the leading zeros, which count in the limit of CPython.
+    negative = literal[0] == '-'
+    digits = literal[1:] if literal[0] in '+-' else literal
+    value = int(digits.lstrip('0') or '0')
+    return -value if negative else value
+
+
+# Decoders of the JSON values which contain an integer literal too long to be
+# converted into an int.
+DECODER = json.JSONDecoder()
+LITERAL_DECODER = json.JSONDecoder(parse_int=parse_integer_literal)
+
+
+def loads_json(text):
+    """Like json.loads(), but decode the integer literals too long to be
+    converted into an int with parse_integer_literal(), instead of raising a
+    ValueError.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        raise
+    except ValueError:
+        return json.loads(text, parse_int=parse_integer_literal)
+
+
+def raw_decode_json(text, pos=0):
+    """Like json.JSONDecoder().raw_decode(), but decode the integer literals
+    too long to be converted into an int like loads_json().
+    """
+    try:
+        return DECODER.raw_decode(text, pos)
+    except json.JSONDecodeError:
+        raise
+    except ValueError:
+        return LITERAL_DECODER.raw_decode(text, pos)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-phase timing and counters of SchemaGenerator, enabled by the 'profile'
+option (--profile flag). When profiling is enabled, install_profiler() replaces
+the hot methods of the SchemaGenerator instance with wrappers which update a
+ProfileStats. Nothing is wrapped when profiling is disabled, so the hooks have
+no cost in normal runs.
+
+The time of each phase is exclusive: while a phase is active, the time spent
+in a nested phase (e.g. the inference of the type of a value inside the merge
+of a RECORD) is counted only in the nested phase.
+"""
+
+import time
+from collections import OrderedDict
+
+# The phases, in the order of the report. 'other' is the time in
+# deduce_schema() outside of the other phases, mostly the traversal of the
+# records and the creation of the schema entries.
+PHASES = ('decode', 'inference', 'merge', 'other', 'flatten')
+
+COUNTERS = (
+    'records',
+    'entries_allocated',
+    'merges',
+    'widenings',
+    'ignores',
+)
+
+
+class ProfileStats:
+    """The time spent in each phase and the counters of the operations:
+
+    * records: number of records read from the input
+    * entries_allocated: number of schema entries created for the values
+    * merges: number of merges of a new entry into an existing one
+    * widenings: number of merges which changed the type of an existing
+      'hard' entry (e.g. INTEGER -> FLOAT)
+    * ignores: number of merges which changed an entry into 'ignore'
+    """
+
+    def __init__(self):
+        self.seconds = OrderedDict((phase, 0.0) for phase in PHASES)
+        self.counts = OrderedDict((counter, 0) for counter in COUNTERS)
+        self.stack = []
+        self.start = 0.0
+
+    def enter(self, phase):
+        """Start the 'phase', pausing the current one."""
+        now = time.perf_counter()
+        if self.stack:
+            self.seconds[self.stack[-1]] += now - self.start
+        self.stack.append(phase)
+        self.start = now
+
+    def exit(self):
+        """End the current phase, resuming the previous one."""
+        now = time.perf_counter()
+        self.seconds[self.stack.pop()] += now - self.start
+        self.start = now
+
+    def timed(self, function, phase):
+        """Return a wrapper of 'function' which runs in the 'phase'."""
+        def wrapper(*args, **kwargs):
+            self.enter(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit()
+        return wrapper
+
+    def timed_reader(self, reader):
+        """Iterate over the records of 'reader', counting the time spent in
+        the reader itself as the 'decode' phase.
+        """
+        iterator = iter(reader)
+        counts = self.counts
+        while True:
+            self.enter('decode')
+            try:
+                record = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            counts['records'] += 1
+            yield record
+
+    def merge(self, other):
+        """Add the times and counters of the 'other' ProfileStats (e.g. from
+        a worker process) into this one.
+        """
+        for phase, seconds in other.seconds.items():
+            self.seconds[phase] += seconds
+        for counter, count in other.counts.items():
+            self.counts[counter] += count
+        return self
+
+    def to_dict(self):
+        return OrderedDict([
+            ('seconds', OrderedDict(self.seconds)),
+            ('counts', OrderedDict(self.counts)),
+        ])
+
+    def format_report(self):
+        """Return the lines of a human readable report."""
+        total = sum(self.seconds.values())
+        lines = []
+        for phase, seconds in self.seconds.items():
+            percent = 100.0 * seconds / total if total else 0.0
+            lines.append(f'{phase:<18} {seconds:.3f}s ({percent:.1f}%)')
+        for counter, count in self.counts.items():
+            lines.append(f'{counter:<18} {count}')
+        return lines
+
+    def __getstate__(self):
+        # Only the results are sent back by the worker processes.
+        return (self.seconds, self.counts)
+
+    def __setstate__(self, state):
+        self.seconds, self.counts = state
+        self.stack = []
+        self.start = 0.0
+
+
+def install_profiler(generator, stats):
+    """Replace the methods of the SchemaGenerator instance 'generator' with
+    wrappers which record their time and counters into 'stats'.
+    """
+    counts = stats.counts
+
+    generator.deduce_schema = stats.timed(generator.deduce_schema, 'other')
+    generator.flatten_schema = stats.timed(generator.flatten_schema, 'flatten')
+    generator.infer_value_type = stats.timed(
+        generator.infer_value_type, 'inference')
+    generator.infer_array_type = stats.timed(
+        generator.infer_array_type, 'inference')
+
+    def counting_entries(method):
+        def wrapper(*args, **kwargs):
+            schema_entry = method(*args, **kwargs)
+            if schema_entry is not None:
+                counts['entries_allocated'] += 1
+            return schema_entry
+        return wrapper
+
+    for name in ['get_value_schema_entry', 'get_record_schema_entry']:
+        setattr(generator, name, counting_entries(getattr(generator, name)))
+
+    # The merge of each level of the nested schema entries is counted.
+    generator.merge_schema_entry = stats.timed(
+        generator.merge_schema_entry, 'merge')
+    merge_schema_entry_step = stats.timed(
+        generator.merge_schema_entry_step, 'merge')
+
+    def counting_merge_schema_entry_step(
+        old_schema_entry, new_schema_entry, *args, **kwargs
+    ):
+        if not old_schema_entry or not new_schema_entry:
+            return merge_schema_entry_step(
+                old_schema_entry, new_schema_entry, *args, **kwargs)
+        old_status = old_schema_entry['status']
+        old_type = old_schema_entry['info']['type']
+        schema_entry = merge_schema_entry_step(
+            old_schema_entry, new_schema_entry, *args, **kwargs)
+        counts['merges'] += 1
+        if old_status == 'ignore':
+            pass
+        elif schema_entry['status'] == 'ignore':
+            counts['ignores'] += 1
+        elif old_status == 'hard' and schema_entry['info']['type'] != old_type:
+            counts['widenings'] += 1
+        return schema_entry
+
+    generator.merge_schema_entry_step = counting_merge_schema_entry_step
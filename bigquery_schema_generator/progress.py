@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Machine readable progress reports of SchemaGenerator, enabled by the
+'progress_callback' option (--progress and --progress_path flags). A report is
+a dict which is passed to the callback every 'debugging_interval' records,
+at the end of each input, and at the end of the run:
+
+    {
+      "event": "progress" | "input_done" | "done",
+      "input_path": path of the current input file, or null,
+      "elapsed_seconds": 12.5,
+      "records": 250000,
+      "records_per_sec": 20000.0,
+      "bytes_consumed": 52428800,
+      "bytes_total": 104857600,
+      "bytes_per_sec": 4194304.0,
+      "eta_seconds": 12.5,
+      "num_fields": 42,
+      "error_count": 3,
+      "rss_bytes": 73400320
+    }
+
+The bytes are the bytes read from the input files (compressed bytes for
+compressed files). 'bytes_total' and 'eta_seconds' are null if the size of the
+input is unknown (e.g. reading from a pipe), and 'bytes_consumed' is null if
+the position within the input cannot be determined (e.g. a list of lines).
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+from collections import OrderedDict
+from bigquery_schema_generator.input_files import input_position
+
+
+def current_rss_bytes():
+    """Return the current resident set size of the process, or the peak
+    RSS if the current one is not available (i.e. not on Linux).
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # The unit of ru_maxrss is bytes on MacOS but kilobytes on Linux.
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def count_fields(schema_map):
+    """Return the number of schema entries in 'schema_map', including the
+    nested ones.
+    """
+    count = 0
+    stack = [schema_map]
+    while stack:
+        for entry in stack.pop().values():
+            if not entry:
+                continue
+            count += 1
+            fields = entry['info'].get('fields')
+            if fields:
+                stack.append(fields)
+    return count
+
+
+def json_lines_callback(output_file):
+    """Return a progress callback which writes each report as a line of JSON
+    to 'output_file'.
+    """
+    def callback(report):
+        output_file.write(json.dumps(report))
+        output_file.write('\n')
+        output_file.flush()
+    return callback
+
+
+class ProgressReporter:
+    """Keep track of the records and bytes consumed across the inputs of a
+    SchemaGenerator, and pass the reports to the 'callback'.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.start_time = time.perf_counter()
+        self.bytes_total = None
+
+        # Records and bytes of the inputs which were completely read.
+        self.records_done = 0
+        self.bytes_done = 0
+
+        # The input being read by deduce_schema().
+        self.input_file = None
+        self.input_path = None
+        self.start_line_number = 0
+
+    def set_input_paths(self, input_paths):
+        """Compute the total size of the 'input_paths', which makes the ETA
+        available, unless one of them is the STDIN.
+        """
+        if '-' in input_paths:
+            self.bytes_total = None
+            return
+        try:
+            self.bytes_total = sum(os.path.getsize(p) for p in input_paths)
+        except OSError:
+            self.bytes_total = None
+
+    def start_input(self, input_file, input_path, line_number):
+        self.input_file = input_file
+        self.input_path = input_path
+        self.start_line_number = line_number
+
+    def end_input(self, generator, schema_map):
+        records = generator.line_number - self.start_line_number
+        consumed, total = input_position(self.input_file)
+        self.records_done += records
+        if total is not None:
+            self.bytes_done += total
+        elif consumed is not None:
+            self.bytes_done += consumed
+        self.input_file = None
+        self.report(generator, schema_map, 'input_done')
+
+    def add_input(self, generator, schema_map, input_path, records):
+        """Account for the 'input_path' read by a worker process."""
+        self.records_done += records
+        try:
+            self.bytes_done += os.path.getsize(input_path)
+        except OSError:
+            pass
+        self.input_path = input_path
+        self.report(generator, schema_map, 'input_done')
+
+    def report(self, generator, schema_map, event='progress'):
+        elapsed = time.perf_counter() - self.start_time
+        records = self.records_done
+        consumed = self.bytes_done
+        bytes_total = self.bytes_total
+        if self.input_file is not None:
+            records += generator.line_number - self.start_line_number
+            position, total = input_position(self.input_file)
+            if position is None:
+                consumed = None
+            else:
+                consumed += position
+            # A single input which is not given by its path, e.g. STDIN
+            # redirected from a file.
+            if bytes_total is None and self.bytes_done == 0:
+                bytes_total = total
+
+        # The schema_map of the 'route_by' option is a map of schema_maps.
+        if generator.router is not None:
+            num_fields = sum(count_fields(m) for m in schema_map.values())
+        else:
+            num_fields = count_fields(schema_map)
+
+        bytes_per_sec = None
+        eta = None
+        if consumed is not None and elapsed > 0:
+            bytes_per_sec = consumed / elapsed
+            if bytes_total is not None and bytes_per_sec > 0:
+                eta = max(bytes_total - consumed, 0) / bytes_per_sec
+
+        self.callback(OrderedDict([
+            ('event', event),
+            ('input_path', self.input_path),
+            ('elapsed_seconds', elapsed),
+            ('records', records),
+            ('records_per_sec', records / elapsed if elapsed > 0 else None),
+            ('bytes_consumed', consumed),
+            ('bytes_total', bytes_total),
+            ('bytes_per_sec', bytes_per_sec),
+            ('eta_seconds', eta),
+            ('num_fields', num_fields),
+            ('error_count', generator.error_count),
+            ('rss_bytes', current_rss_bytes()),
+        ]))
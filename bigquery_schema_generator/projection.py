@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Projection of the fields of the records, enabled by the 'include_paths' and
+'exclude_paths' options (--include_paths and --exclude_paths flags). Some
+records carry large opaque subtrees (raw payloads, debugging blobs) which are
+not loaded into BigQuery. The fields which are not projected are removed from
+each record before its schema is deduced, without looking inside them, so no
+time or memory is spent on them.
+
+A path is the dotted full path of a field (e.g. 'meta.debug'), like the one
+returned by json_full_path(), matched case-insensitively against the sanitized
+names of the fields. Each component may contain the wildcards of fnmatch
+(e.g. '*' matches the name of any field, 'debug_*' any field starting with
+'debug_'). The elements of a REPEATED RECORD have the path of the RECORD.
+
+* A field matching an 'exclude_paths' pattern is removed, with its subtree.
+* If 'include_paths' is given, a field is kept only if it matches one of its
+  patterns (with its whole subtree), or if it is a RECORD which contains such
+  a field (with only the projected part of its subtree). A field on the path
+  of a pattern which is not a RECORD, or a RECORD which does not contain a
+  projected field, is removed, so that no column is created for it.
+* A RECORD whose fields are all removed is removed as well.
+
+The projected record shares the values of the subtrees which are kept whole
+with the original record, so only the dicts containing a removed field are
+copied.
+"""
+
+from fnmatch import fnmatchcase
+from itertools import islice
+
+# Returned by ProjectionNode.child() for a field which is removed.
+REMOVED = object()
+
+# Maximum number of keys whose projection is remembered by each node, so that
+# the keys of objects used as maps (e.g. IDs) do not grow it without bound.
+MAX_CACHED_KEYS = 1000
+
+
+class ProjectionNode:
+    """The patterns which remain to be matched by the fields below a given
+    path. The 'include' patterns are None if all the fields are included.
+    Each pattern is a tuple of the lower-cased components of its path.
+    """
+
+    __slots__ = ('include', 'exclude', 'children')
+
+    def __init__(self, include, exclude):
+        self.include = include
+        self.exclude = exclude
+        self.children = {}
+
+    def child(self, name):
+        """Return the node of the field with the canonical 'name' (the
+        lower-cased sanitized key), None if the whole subtree of the field is
+        kept, or REMOVED if the field is removed.
+        """
+        node = self.children.get(name, self)
+        if node is not self:
+            return node
+
+        exclude = []
+        for pattern in self.exclude:
+            if fnmatchcase(name, pattern[0]):
+                if len(pattern) == 1:
+                    node = REMOVED
+                    break
+                exclude.append(pattern[1:])
+        else:
+            if self.include is None:
+                include = None
+            else:
+                include = []
+                for pattern in self.include:
+                    if fnmatchcase(name, pattern[0]):
+                        if len(pattern) == 1:
+                            include = None
+                            break
+                        include.append(pattern[1:])
+            if include == []:
+                node = REMOVED
+            elif include is None and not exclude:
+                node = None
+            else:
+                node = ProjectionNode(include, exclude)
+
+        if len(self.children) < MAX_CACHED_KEYS:
+            self.children[name] = node
+        return node
+
+
+class FieldProjection:
+    """Remove the fields which are not projected from the records.
+
+    Usage:
+        projection = FieldProjection(generator, include_paths, exclude_paths)
+        json_object = projection.project(json_object)
+        ... merge json_object into schema_map ...
+    """
+
+    def __init__(self, generator, include_paths=None, exclude_paths=None):
+        self.generator = generator
+        self.root = ProjectionNode(
+            parse_paths(include_paths) if include_paths else None,
+            parse_paths(exclude_paths or []),
+        )
+
+    def project(self, json_object):
+        """Return 'json_object' without the fields which are not projected,
+        or 'json_object' itself if it does not contain any.
+        """
+        return self.project_fields(json_object, self.root)
+
+    def project_record(self, record, node):
+        """Project the nested RECORD 'record'. Returns REMOVED if all its
+        fields were removed, or if it is empty and only some of its fields
+        are included.
+        """
+        projected = self.project_fields(record, node)
+        if not projected and (projected is not record
+                              or node.include is not None):
+            return REMOVED
+        return projected
+
+    def project_fields(self, record, node):
+        sanitize_name = self.generator.sanitize_name
+        projected = None
+        for index, (key, value) in enumerate(record.items()):
+            child = node.child(sanitize_name(key).lower())
+            if child is None:
+                new_value = value
+            elif child is REMOVED:
+                new_value = REMOVED
+            else:
+                new_value = self.project_value(value, child)
+            if projected is None:
+                if new_value is value:
+                    continue
+                # Copy the fields which were kept so far.
+                projected = dict(islice(record.items(), index))
+            if new_value is not REMOVED:
+                projected[key] = new_value
+        return record if projected is None else projected
+
+    def project_value(self, value, node):
+        """Project the nested RECORD 'value', or the RECORD elements of the
+        array 'value'. Returns REMOVED if nothing is left. Other values are
+        returned unchanged, or REMOVED if only some of their fields are
+        included, since they are not RECORDs.
+        """
+        if isinstance(value, dict):
+            return self.project_record(value, node)
+        included = node.include is not None
+        if isinstance(value, list):
+            elements = []
+            changed = False
+            for element in value:
+                if isinstance(element, dict):
+                    new_element = self.project_record(element, node)
+                elif included:
+                    new_element = REMOVED
+                else:
+                    new_element = element
+                if new_element is not element:
+                    changed = True
+                if new_element is not REMOVED:
+                    elements.append(new_element)
+            if not elements and (changed or included):
+                return REMOVED
+            return elements if changed else value
+        return REMOVED if included else value
+
+
+def parse_paths(paths):
+    """Return the tuples of the lower-cased components of the dotted
+    'paths'.
+    """
+    return [tuple(path.lower().split('.')) for path in paths]
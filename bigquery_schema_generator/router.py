@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Deduce one schema per value of a routing field in a single pass, enabled by
+the 'route_by' option (--route_by flag). A stream which mixes many kinds of
+records (e.g. event types) would otherwise have to be split and read once per
+kind. The records are dispatched to the schema_map of the value of the field
+at the dotted 'route_by' path (e.g. 'meta.event_type'), and deduce_schema()
+returns an OrderedDict of {route: schema_map}, in the order of the first
+record of each route.
+
+The route of a record is the string value of the field, or the JSON encoding
+of any other scalar value (e.g. '1', 'true'). A record whose field is missing
+or null has the route None (NULL_ROUTE), named 'null' in the messages and the
+file names, which is distinct from the route of the string 'null'. The number
+of routes is bounded by 'max_routes': the records of any additional route are
+reported as errors and ignored, without clearing the caches of the routes.
+
+Each route has its own ShapeCache and SchemaSpecializer (if enabled), because
+they are tied to a single schema_map.
+"""
+
+import json
+import re
+from collections import OrderedDict
+from bigquery_schema_generator.shape_cache import ShapeCache
+from bigquery_schema_generator.specializer import SchemaSpecializer
+
+# Maximum number of routes by default.
+DEFAULT_MAX_ROUTES = 100
+
+# Route of the records whose routing field is missing or null, which cannot
+# be the route of a value, and its name.
+NULL_ROUTE = None
+NULL_ROUTE_NAME = 'null'
+
+# Characters which are not kept in the name of the schema file of a route.
+FILE_NAME_MATCHER = re.compile(r'[^a-zA-Z0-9_-]')
+
+
+class Route:
+    """The 'schema_map' of a route, with its own 'shape_cache' and
+    'specializer', or None if they are not enabled.
+    """
+
+    __slots__ = ('schema_map', 'shape_cache', 'specializer')
+
+    def __init__(self, schema_map, shape_cache, specializer):
+        self.schema_map = schema_map
+        self.shape_cache = shape_cache
+        self.specializer = specializer
+
+
+class SchemaRouter:
+    """Select the schema_map of each record in the OrderedDict of
+    {route: schema_map} given to deduce_schema(), using the options of the
+    'generator' for the caches of each route.
+
+    Usage:
+        router = SchemaRouter(generator, 'meta.event_type', 100)
+        route = router.select(schema_maps, json_object)
+        if route is not None:
+            ... merge json_object into route.schema_map ...
+    """
+
+    def __init__(self, generator, route_by, max_routes=None):
+        self.generator = generator
+        self.route_by = route_by
+        self.keys = tuple(route_by.split('.'))
+        self.max_routes = max_routes or DEFAULT_MAX_ROUTES
+        self.routes = {}
+
+    def select(self, schema_maps, json_object):
+        """Return the Route of 'json_object', adding its schema_map to
+        'schema_maps' if it is a new route. Returns None after logging an
+        error if the record cannot be routed.
+        """
+        generator = self.generator
+        value = json_object
+        for key in self.keys:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, str):
+            route = value
+        elif value is None:
+            route = NULL_ROUTE
+        elif isinstance(value, (bool, int, float)):
+            route = json.dumps(value)
+        else:
+            generator.log_skipped_record(
+                'Cannot route record by "{}" with a value of type {}',
+                self.route_by,
+                type(value).__name__,
+            )
+            return None
+
+        schema_map = schema_maps.get(route)
+        if schema_map is None:
+            if len(schema_maps) >= self.max_routes:
+                generator.log_skipped_record(
+                    'Ignoring record with route "{}", more than {} routes',
+                    route_name(route),
+                    self.max_routes,
+                )
+                return None
+            schema_map = OrderedDict()
+            schema_maps[route] = schema_map
+
+        state = self.routes.get(route)
+        if state is None or state.schema_map is not schema_map:
+            state = self.new_route(schema_map)
+            self.routes[route] = state
+        return state
+
+    def new_route(self, schema_map):
+        generator = self.generator
+        shape_cache = None
+        if generator.shape_cache is not None:
+            shape_cache = ShapeCache(
+                generator.infer_value_type, generator.shape_cache.max_size)
+        specializer = None
+        if generator.specializer is not None:
+            specializer = SchemaSpecializer(
+                generator, generator.specializer.specialize_after)
+        return Route(schema_map, shape_cache, specializer)
+
+    def clear_caches(self):
+        """Clear the caches of all the routes, called by log_error()."""
+        for state in self.routes.values():
+            if state.shape_cache is not None:
+                state.shape_cache.clear()
+            if state.specializer is not None:
+                state.specializer.invalidate()
+
+    def merge_schema_maps(self, schema_maps, other_schema_maps):
+        """Merge the routes of 'other_schema_maps' (e.g. deduced from another
+        file) into 'schema_maps', in place.
+        """
+        generator = self.generator
+        for route, other_schema_map in other_schema_maps.items():
+            schema_map = schema_maps.get(route)
+            if schema_map is not None:
+                generator.merge_schema_map(schema_map, other_schema_map)
+            elif len(schema_maps) < self.max_routes:
+                schema_maps[route] = other_schema_map
+            else:
+                generator.log_skipped_record(
+                    'Ignoring route "{}", more than {} routes',
+                    route_name(route),
+                    self.max_routes,
+                )
+
+
+def route_name(route):
+    """Return the name of the 'route' in the messages and the file names."""
+    return NULL_ROUTE_NAME if route is NULL_ROUTE else route
+
+
+def route_file_names(routes):
+    """Return the {route: file name} of the schema file of each route, made of
+    the characters of the route which are valid in a file name on any system.
+    Routes which differ only by the other characters get a numbered suffix.
+    """
+    file_names = OrderedDict()
+    used = set()
+    for route in routes:
+        base = FILE_NAME_MATCHER.sub('_', route_name(route)) or '_'
+        name = base
+        suffix = 1
+        while name.lower() in used:
+            suffix += 1
+            name = f'{base}_{suffix}'
+        used.add(name.lower())
+        file_names[route] = f'{name}.schema.json'
+    return file_names
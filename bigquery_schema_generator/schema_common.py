@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+The helpers shared by generate_schema.py and the modules which it imports
+(validator.py, specializer.py): the conversion between the types of the
+values, the paths of the fields, and the SchemaIncompatibleError.
+"""
+
+
+def convert_type(atype, btype):
+    """Return the compatible type between 'atype' and 'btype'. Return 'None'
+    if there is no compatible type. Type conversions (in order of precedence)
+    are:
+
+    * type + type => type
+    * [Q]BOOLEAN + [Q]BOOLEAN => BOOLEAN
+    * [Q]INTEGER + [Q]INTEGER => INTEGER
+    * [Q]FLOAT + [Q]FLOAT => FLOAT
+    * QINTEGER + QFLOAT = QFLOAT
+    * QFLOAT + QINTEGER = QFLOAT
+    * [Q]INTEGER + [Q]FLOAT => FLOAT (except QINTEGER + QFLOAT)
+    * [Q]FLOAT + [Q]INTEGER => FLOAT (except QFLOAT + QINTEGER)
+    * (DATE, TIME, TIMESTAMP, QBOOLEAN, QINTEGER, QFLOAT, STRING) +
+        (DATE, TIME, TIMESTAMP, QBOOLEAN, QINTEGER, QFLOAT, STRING) => STRING
+
+    The "Q" refers to the quoted (i.e. string) versions of the various types,
+    which are needed to emulate the type inference inside quoted strings
+    performed by BigQuery.
+    """
+    # type + type => type
+    if atype == btype:
+        return atype
+
+    # [Q]BOOLEAN + [Q]BOOLEAN => BOOLEAN
+    if atype == 'BOOLEAN' and btype == 'QBOOLEAN':
+        return 'BOOLEAN'
+    if atype == 'QBOOLEAN' and btype == 'BOOLEAN':
+        return 'BOOLEAN'
+
+    # [Q]INTEGER + [Q]INTEGER => INTEGER
+    if atype == 'QINTEGER' and btype == 'INTEGER':
+        return 'INTEGER'
+    if atype == 'INTEGER' and btype == 'QINTEGER':
+        return 'INTEGER'
+
+    # [Q]FLOAT + [Q]FLOAT => FLOAT
+    if atype == 'QFLOAT' and btype == 'FLOAT':
+        return 'FLOAT'
+    if atype == 'FLOAT' and btype == 'QFLOAT':
+        return 'FLOAT'
+
+    # QINTEGER + QFLOAT => QFLOAT
+    if atype == 'QINTEGER' and btype == 'QFLOAT':
+        return 'QFLOAT'
+
+    # QFLOAT + QINTEGER => QFLOAT
+    if atype == 'QFLOAT' and btype == 'QINTEGER':
+        return 'QFLOAT'
+
+    # [Q]INTEGER + [Q]FLOAT => FLOAT (except QINTEGER + QFLOAT => QFLOAT)
+    if atype == 'INTEGER' and btype == 'FLOAT':
+        return 'FLOAT'
+    if atype == 'INTEGER' and btype == 'QFLOAT':
+        return 'FLOAT'
+    if atype == 'QINTEGER' and btype == 'FLOAT':
+        return 'FLOAT'
+
+    # [Q]FLOAT + [Q]INTEGER => FLOAT (except # QFLOAT + QINTEGER => QFLOAT)
+    if atype == 'FLOAT' and btype == 'INTEGER':
+        return 'FLOAT'
+    if atype == 'FLOAT' and btype == 'QINTEGER':
+        return 'FLOAT'
+    if atype == 'QFLOAT' and btype == 'INTEGER':
+        return 'FLOAT'
+
+    # All remaining combination of:
+    # (DATE, TIME, TIMESTAMP, QBOOLEAN, QINTEGER, QFLOAT, STRING) +
+    #   (DATE, TIME, TIMESTAMP, QBOOLEAN, QINTEGER, QFLOAT, STRING) => STRING
+    if is_string_type(atype) and is_string_type(btype):
+        return 'STRING'
+
+    return None
+
+
+STRING_TYPES = frozenset([
+    'STRING', 'TIMESTAMP', 'DATE', 'TIME', 'QINTEGER', 'QFLOAT', 'QBOOLEAN'
+])
+
+
+def is_string_type(thetype):
+    """Returns true if the type is one of: STRING, TIMESTAMP, DATE, or
+    TIME."""
+    return thetype in STRING_TYPES
+
+
+class FieldPath:
+    """The path of a field within nested records, represented by its 'parent'
+    path (a FieldPath, a string, or None) and its 'key'. The dot-separated
+    string returned by str() (e.g. 'server.config.port') is built only when
+    it is needed, i.e. when an error is logged, instead of concatenating the
+    path of every nested field of every record.
+    """
+
+    __slots__ = ('parent', 'key', 'text')
+
+    def __init__(self, parent, key):
+        self.parent = parent
+        self.key = key
+        self.text = None
+
+    def __str__(self):
+        if self.text is None:
+            keys = []
+            path = self
+            while isinstance(path, FieldPath):
+                if path.text is not None:
+                    keys.append(path.text)
+                    break
+                keys.append(path.key)
+                path = path.parent
+            else:
+                if path is not None and path != '':
+                    keys.append(str(path))
+            self.text = '.'.join(reversed(keys))
+        return self.text
+
+    def __repr__(self):
+        return f'FieldPath({str(self)!r})'
+
+
+def format_location(input_path, line_number):
+    """Return the location of an error, e.g. 'file.json:12' or 'line 12' if
+    the input is not a named file.
+    """
+    if input_path is None:
+        return f'line {line_number}'
+    elif line_number is None:
+        return input_path
+    else:
+        return f'{input_path}:{line_number}'
+
+
+class SchemaIncompatibleError(Exception):
+    """Raised with the 'fail_fast' option on the first value which is not
+    compatible with the field 'path' of the existing schema, on the given
+    'line_number' of 'input_path'. The 'record' is the offending record, if
+    known.
+    """
+
+    def __init__(self, msg, input_path, line_number, path):
+        super().__init__(msg, input_path, line_number, path)
+        self.msg = msg
+        self.input_path = input_path
+        self.line_number = line_number
+        self.path = path
+        self.record = None
+
+    def __reduce__(self):
+        # Keep the 'record' when the error is returned by a worker process
+        # of deduce_schema_from_paths().
+        return (
+            self.__class__,
+            (self.msg, self.input_path, self.line_number, self.path),
+            {'record': self.record},
+        )
+
+    def __str__(self):
+        location = format_location(self.input_path, self.line_number)
+        return (f'Field "{self.path}" on {location} is incompatible with the'
+                f' existing schema: {self.msg}')
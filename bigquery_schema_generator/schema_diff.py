@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Structural difference between the schema_map of an existing schema and the
+schema_map deduced from it and the data records, written by the --diff flag.
+The two schema_maps are walked side by side, so only the changes are reported
+instead of the thousands of unchanged columns of a wide table:
+
+* added: a column which is not in the existing schema
+* widened: a column whose type changed (e.g. INTEGER to FLOAT, DATE to STRING,
+  or RECORD to JSON)
+* relaxed: a REQUIRED column which became NULLABLE (with --infer_mode)
+* repeated: a NULLABLE RECORD which became a REPEATED RECORD
+* ignored: a column of the existing schema which had an incompatible value,
+  and which is removed from the deduced schema
+"""
+
+from collections import OrderedDict
+
+# The kinds of changes, in the order of the summary.
+CHANGES = ('added', 'widened', 'relaxed', 'repeated', 'ignored')
+
+
+def diff_schema_maps(old_schema_map, new_schema_map, sorted_schema=True,
+                     keep_nulls=False):
+    """Return the list of changes from 'old_schema_map' to 'new_schema_map',
+    in the order of the columns of the flattened schema (see 'sorted_schema'
+    and 'keep_nulls' in flatten_schema_map()), the sub-fields of a RECORD
+    following the RECORD. Each change is an OrderedDict of 'change', 'path'
+    and the 'old_mode', 'old_type', 'new_mode' and 'new_type' of the column
+    (the old ones are None for an added column, the new ones for an ignored
+    column). The sub-fields of an added, widened or ignored RECORD are not
+    reported.
+    """
+    changes = []
+    # Stack of (old_map, iterator over the items of new_map, base_path), so
+    # that the changes of the sub-fields of a RECORD follow its own changes.
+    stack = [(old_schema_map, iter_items(new_schema_map, sorted_schema), None)]
+    while stack:
+        old_map, items, base_path = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+        key, new_entry = item
+        if not new_entry:
+            continue
+        new_info = new_entry['info']
+        path = new_info['name'] if base_path is None \
+            else f"{base_path}.{new_info['name']}"
+        old_entry = old_map.get(key)
+        if not old_entry:
+            # New columns which are not printed are not reported.
+            if new_entry['status'] == 'hard' or (
+                    new_entry['status'] == 'soft' and keep_nulls):
+                changes.append(make_change('added', path, None, new_info))
+            continue
+
+        old_info = old_entry['info']
+        if new_entry['status'] == 'ignore':
+            changes.append(make_change('ignored', path, old_info, None))
+            continue
+
+        old_type = old_info['type']
+        new_type = new_info['type']
+        if strip_quoted_type(new_type) != old_type:
+            changes.append(make_change('widened', path, old_info, new_info))
+        old_mode = old_info['mode']
+        new_mode = new_info['mode']
+        if old_mode == 'REQUIRED' and new_mode == 'NULLABLE':
+            changes.append(make_change('relaxed', path, old_info, new_info))
+        elif old_mode == 'NULLABLE' and new_mode == 'REPEATED':
+            changes.append(make_change('repeated', path, old_info, new_info))
+        if old_type == 'RECORD' and new_type == 'RECORD':
+            stack.append((
+                old_info['fields'],
+                iter_items(new_info['fields'], sorted_schema),
+                path,
+            ))
+    return changes
+
+
+def iter_items(schema_map, sorted_schema):
+    return iter(sorted(schema_map.items()) if sorted_schema
+                else schema_map.items())
+
+
+def make_change(change, path, old_info, new_info):
+    return OrderedDict([
+        ('change', change),
+        ('path', path),
+        ('old_mode', old_info['mode'] if old_info else None),
+        ('old_type', old_info['type'] if old_info else None),
+        ('new_mode', new_info['mode'] if new_info else None),
+        ('new_type', strip_quoted_type(new_info['type']) if new_info else None),
+    ])
+
+
+def strip_quoted_type(value_type):
+    """Convert QINTEGER -> INTEGER, similarly for QFLOAT and QBOOLEAN, like
+    flatten_schema_map().
+    """
+    if value_type in ['QINTEGER', 'QFLOAT', 'QBOOLEAN']:
+        return value_type[1:]
+    return value_type
+
+
+def summarize_changes(changes):
+    """Return the number of changes of each kind, e.g. '3 added, 1 widened,
+    0 relaxed, 0 repeated, 0 ignored'.
+    """
+    counts = OrderedDict((change, 0) for change in CHANGES)
+    for change in changes:
+        counts[change['change']] += 1
+    return ', '.join(f'{count} {change}' for change, count in counts.items())
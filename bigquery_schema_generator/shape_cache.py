@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A bounded cache of the structural fingerprints of the records which were
+already absorbed into a schema_map, enabled by the 'shape_cache_size' option
+(--shape_cache_size flag). Most data files contain only a handful of distinct
+record shapes (the same keys with the same types of values). Once a record of
+a given shape has been merged into the schema_map without any error, merging
+another record of the same shape cannot change the schema_map, because the
+merge only ever widens the schema (types, modes, the 'soft' to 'hard' status,
+and 'filled' going from True to False). Such records are skipped.
+
+The fingerprint of a record is a tuple of its keys and the type inferred for
+each value, using the same infer_value_type() as the schema deduction, so that
+e.g. a quoted integer and a timestamp have different fingerprints. Nested
+records have nested fingerprints, and an array is represented by the distinct
+fingerprints of its elements.
+
+Records which caused an error are never cached, and the whole cache is cleared
+whenever an error is logged, because the error (e.g. a conversion of a
+NULLABLE RECORD into a REPEATED RECORD) could have been caused by a change of
+the schema_map which makes the merge of a cached shape log an error as well.
+"""
+
+# Nested records deeper than this are not fingerprinted, and are always
+# processed.
+MAX_FINGERPRINT_DEPTH = 64
+
+# The cache disables itself if its hit rate is lower than 50% after this many
+# lookups, because computing the fingerprints of records which are almost all
+# different is pure overhead.
+MIN_LOOKUPS = 256
+
+# Marker of the fingerprint of an array, which cannot be a key of a record.
+ARRAY = object()
+
+
+class ShapeCache:
+    """The set of fingerprints of the records absorbed into 'schema_map'.
+
+    Usage:
+        cache = ShapeCache(generator.infer_value_type, max_size)
+        fingerprint = cache.lookup(schema_map, json_object)
+        if fingerprint is not True:
+            ... merge json_object into schema_map ...
+            if no error:
+                cache.add(fingerprint)
+    """
+
+    def __init__(self, infer_value_type, max_size):
+        self.infer_value_type = infer_value_type
+        self.max_size = max_size
+        self.fingerprints = set()
+        self.schema_map = None
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, schema_map, json_object):
+        """Return True if a record with the same shape as 'json_object' was
+        already absorbed into 'schema_map'. Otherwise, return the fingerprint
+        of 'json_object' to be passed to add(), which is None if the record
+        cannot be cached.
+        """
+        if not self.enabled:
+            return None
+        if schema_map is not self.schema_map:
+            self.fingerprints.clear()
+            self.schema_map = schema_map
+        fingerprint = self.fingerprint(json_object, 0)
+        if fingerprint in self.fingerprints:
+            self.hits += 1
+            return True
+        self.misses += 1
+        if self.hits + self.misses >= MIN_LOOKUPS and self.misses > self.hits:
+            self.enabled = False
+            self.fingerprints.clear()
+            return None
+        return fingerprint
+
+    def add(self, fingerprint):
+        if fingerprint is None:
+            return
+        if len(self.fingerprints) >= self.max_size:
+            self.fingerprints.clear()
+        self.fingerprints.add(fingerprint)
+
+    def clear(self):
+        self.fingerprints.clear()
+
+    def fingerprint(self, value, depth):
+        """Return the fingerprint of the record or array 'value', or None if
+        it is nested too deeply.
+        """
+        if depth > MAX_FINGERPRINT_DEPTH:
+            return None
+        infer_value_type = self.infer_value_type
+        if isinstance(value, list):
+            elements = {}
+            for element in value:
+                if isinstance(element, (dict, list)) and element:
+                    element_fingerprint = self.fingerprint(element, depth + 1)
+                    if element_fingerprint is None:
+                        return None
+                elif element == '':
+                    element_fingerprint = ''
+                else:
+                    element_fingerprint = infer_value_type(element)
+                elements[element_fingerprint] = None
+            return (ARRAY,) + tuple(elements)
+
+        fingerprint = []
+        for key, item in value.items():
+            if isinstance(item, (dict, list)) and item:
+                item_fingerprint = self.fingerprint(item, depth + 1)
+                if item_fingerprint is None:
+                    return None
+            elif item == '':
+                # An empty CSV value is a 'soft' STRING, unlike other strings.
+                item_fingerprint = ''
+            else:
+                item_fingerprint = infer_value_type(item)
+            fingerprint.append(key)
+            fingerprint.append(item_fingerprint)
+        return tuple(fingerprint)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Specialized matcher of the records which cannot change a schema_map, enabled
+by the 'specialize_after' option (--specialize_after flag). After a warm-up
+period, the set of columns and their types is usually fixed. The schema_map is
+then compiled into Python source code, one predicate per column which checks
+a value with the cheapest test for its type (e.g. 'type(v) is int' for an
+INTEGER column), and one function per RECORD which looks up the predicate of
+each key of a record. The source is compiled with exec(). A record accepted
+by the generated function would not change the schema_map if it was merged
+into it, so it is skipped. The other records are deduced as usual, and the
+function is regenerated 'specialize_after' records after the first miss, to
+take the changes of the schema_map into account.
+
+A value is accepted only if merging it leaves its schema entry unchanged:
+
+* the entry is 'hard' and the type of the value is converted into the type of
+  the entry (e.g. an INTEGER value in a FLOAT column, any string in a STRING
+  column),
+* or the value is a null (or an empty CSV value, or an empty array in a
+  REPEATED column) and the entry is already not 'filled',
+* or the entry is a top-level 'ignore' entry and the value is a non-empty
+  scalar, or a top-level JSON entry and the value is not a null.
+
+The schema_map only widens (types, modes, 'filled' from True to False, 'soft'
+to 'hard' to 'ignore'), and a value accepted by an entry is still accepted
+without change by the widened entry. So a function generated from an older
+version of the schema_map is still correct, except when the change logged an
+error (e.g. a NULLABLE RECORD converted into a REPEATED RECORD): the function
+is discarded whenever an error is logged.
+"""
+
+from bigquery_schema_generator.schema_common import convert_type
+from bigquery_schema_generator.shape_cache import MIN_LOOKUPS
+
+# Nested RECORDs deeper than this are not specialized, so that the generated
+# functions, which call each other, do not hit the Python recursion limit.
+MAX_SPECIALIZED_DEPTH = 32
+
+# The types returned by SchemaGenerator.infer_value_type() for a string.
+STRING_VALUE_TYPES = (
+    'TIMESTAMP', 'DATE', 'TIME', 'QINTEGER', 'QFLOAT', 'QBOOLEAN', 'STRING'
+)
+
+
+class SchemaSpecializer:
+    """Generate and call the specialized matcher of the records which cannot
+    change the schema_map.
+
+    Usage:
+        specializer = SchemaSpecializer(generator, specialize_after)
+        if not specializer.match(schema_map, json_object):
+            ... merge json_object into schema_map ...
+    """
+
+    def __init__(self, generator, specialize_after):
+        self.generator = generator
+        self.specialize_after = specialize_after
+        self.schema_map = None
+        self.function = None
+        self.source = None
+        # Number of records until the next compilation, counted only while
+        # there is no function, or after the function rejected a record.
+        self.countdown = specialize_after
+        self.stale = False
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.compilations = 0
+
+    def match(self, schema_map, json_object):
+        """Return True if merging 'json_object' into 'schema_map' would not
+        change it.
+        """
+        if not self.enabled:
+            return False
+        if schema_map is not self.schema_map:
+            self.schema_map = schema_map
+            self.invalidate()
+
+        if self.function is None or self.stale:
+            if self.countdown <= 0:
+                self.compile()
+            else:
+                self.countdown -= 1
+        function = self.function
+        if function is None:
+            return False
+        if function(json_object):
+            self.hits += 1
+            return True
+        self.misses += 1
+        if self.hits + self.misses >= MIN_LOOKUPS and self.misses > self.hits:
+            # The records rarely have the same columns and types.
+            self.enabled = False
+            self.function = None
+            return False
+        self.stale = True
+        return False
+
+    def invalidate(self):
+        """Discard the generated function, e.g. because an error was logged,
+        and wait for another 'specialize_after' records before generating a
+        new one.
+        """
+        self.function = None
+        self.stale = False
+        self.countdown = self.specialize_after
+
+    def compile(self):
+        source, namespace = generate_source(self.schema_map, self.generator)
+        exec(source, namespace)
+        self.function = namespace['match']
+        self.source = source
+        self.compilations += 1
+        self.stale = False
+        self.countdown = self.specialize_after
+
+
+def generate_source(schema_map, generator):
+    """Return the Python source code of the function 'match' which accepts
+    the records that cannot change 'schema_map', and the namespace needed to
+    exec() it. The identical predicates, and the functions of the RECORDs
+    with identical fields (e.g. the values of an object used as a map), are
+    generated only once.
+    """
+    namespace = {
+        'infer': generator.infer_value_type,
+        'MIN': generator.INTEGER_MIN_VALUE,
+        'MAX': generator.INTEGER_MAX_VALUE,
+    }
+    is_csv = generator.input_format in ['csv', 'csvdictreader']
+    null_expression = "v is None or v == ''" if is_csv else 'v is None'
+
+    # The (fields, depth) of the RECORDs in preorder, so that the functions
+    # of the nested RECORDs are generated before the function of their parent
+    # when the list is reversed.
+    records = []
+    pending = [(schema_map, 0)]
+    while pending:
+        fields, depth = pending.pop()
+        records.append((fields, depth))
+        if depth >= MAX_SPECIALIZED_DEPTH:
+            continue
+        for schema_entry in fields.values():
+            if (schema_entry and schema_entry['status'] == 'hard'
+                    and schema_entry['info']['type'] == 'RECORD'):
+                pending.append((schema_entry['info']['fields'], depth + 1))
+
+    lines = []
+    # Map of {expression: predicate name}.
+    predicates = {}
+    # Map of {table: function name}, and of {id(fields): function name}.
+    functions = {}
+    record_functions = {}
+    for fields, depth in reversed(records):
+        table = []
+        for key, schema_entry in fields.items():
+            if not schema_entry:
+                continue
+            info = schema_entry['info']
+            status = schema_entry['status']
+            value_type = info['type']
+            mode = info['mode']
+
+            # The fields of a nested RECORD are first deduced into a new
+            # schema_map, where the values of different types of an 'ignore'
+            # or JSON entry (e.g. of a key repeated with another case, or in
+            # the elements of a REPEATED RECORD) would log an error. They are
+            # only merged directly into the top-level schema_map.
+            if (status == 'ignore' or value_type == 'JSON') and depth > 0:
+                continue
+
+            if status == 'ignore':
+                expression = (
+                    'type(v) in (bool, int, float, str)'
+                    + (" and v != ''" if is_csv else '')
+                )
+            elif status != 'hard':
+                continue
+            elif value_type == 'JSON':
+                expression = 'v is not None'
+            elif value_type == 'RECORD':
+                nested_name = record_functions.get(id(info['fields']))
+                if nested_name is None:
+                    continue
+                if mode == 'REPEATED':
+                    expression = (
+                        f'type(v) is list and v != [] and all(type(e) is dict'
+                        f' and e != {{}} and {nested_name}(e) for e in v)'
+                    )
+                else:
+                    expression = (
+                        f'type(v) is dict and v != {{}} and {nested_name}(v)')
+            else:
+                if value_type in ('INTEGER', 'FLOAT', 'BOOLEAN', 'STRING'):
+                    allowed_name = None
+                else:
+                    # A string whose inferred type converts into this type.
+                    allowed = frozenset(
+                        t for t in STRING_VALUE_TYPES
+                        if convert_type(value_type, t) == value_type)
+                    if not allowed:
+                        continue
+                    allowed_name = f'ALLOWED_{value_type}'
+                    namespace[allowed_name] = allowed
+                if mode == 'REPEATED':
+                    element = scalar_expression(
+                        value_type, 'e', allowed_name, is_csv)
+                    expression = (
+                        f'type(v) is list and v != []'
+                        f' and all({element} for e in v)'
+                    )
+                else:
+                    expression = scalar_expression(
+                        value_type, 'v', allowed_name, is_csv)
+
+            if status == 'hard' and not schema_entry['filled']:
+                if mode == 'REPEATED':
+                    expression = (
+                        f'{null_expression} or v == [] or ({expression})')
+                elif mode == 'NULLABLE':
+                    expression = f'{null_expression} or ({expression})'
+
+            predicate_name = predicates.get(expression)
+            if predicate_name is None:
+                predicate_name = f'p_{len(predicates)}'
+                predicates[expression] = predicate_name
+                lines.append(f'def {predicate_name}(v):')
+                lines.append(f'    return {expression}')
+            # The name of the column is the key of the first record, which
+            # is usually the key of the following ones.
+            table.append((info['name'], predicate_name))
+            if key != info['name']:
+                table.append((key, predicate_name))
+
+        table = tuple(table)
+        function_name = functions.get(table)
+        if function_name is None:
+            function_name = f'match_{len(functions)}'
+            functions[table] = function_name
+            lines.append(f'{function_name.upper()} = {{')
+            lines.extend(f'    {key!r}: {name},' for key, name in table)
+            lines.append('}')
+            lines.append(f'def {function_name}(record):')
+            lines.append(f'    get = {function_name.upper()}.get')
+            lines.append('    for key, v in record.items():')
+            lines.append('        predicate = get(key)')
+            lines.append('        if predicate is None or not predicate(v):')
+            lines.append('            return False')
+            lines.append('    return True')
+        record_functions[id(fields)] = function_name
+    lines.append(f'match = {function_name}')
+    return '\n'.join(lines) + '\n', namespace
+
+
+def scalar_expression(value_type, var, allowed_name, is_csv):
+    """Return the expression which is True if the scalar 'var' can be merged
+    into a column of 'value_type' without changing it.
+    """
+    if value_type == 'INTEGER':
+        return f'type({var}) is int and MIN <= {var} <= MAX'
+    if value_type == 'FLOAT':
+        return f'(type({var}) is float or type({var}) is int)'
+    if value_type == 'BOOLEAN':
+        return f'type({var}) is bool'
+    # An empty CSV value is a 'soft' STRING.
+    not_empty = f" and {var} != ''" if is_csv else ''
+    if value_type == 'STRING':
+        return f'type({var}) is str{not_empty}'
+    return f'type({var}) is str{not_empty} and infer({var}) in {allowed_name}'
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Check data records against an existing schema without deducing a new one,
+used by SchemaGenerator.validate() (--validate_only flag). The schema_map read
+by bq_schema_to_map() is compiled once into a tree of FieldChecker, and each
+value of each record is checked against its FieldChecker using the same type
+inference (infer_value_type(), convert_type()) as the schema deduction. No
+schema entry is allocated and nothing is merged.
+
+A record violates the existing schema if loading it would require a change of
+the schema:
+
+* a new column (a null, an empty array or an empty record only if
+  'keep_nulls' is set, because it would not be printed otherwise),
+* a type which must be widened (e.g. INTEGER to FLOAT) or which is
+  incompatible (e.g. STRING to INTEGER),
+* an array in a NULLABLE or REQUIRED field, or a single value in a REPEATED
+  field,
+* a REQUIRED field which is missing, null or empty.
+
+Since the schema never changes, a record whose shape (see shape_cache.py) was
+already found valid is valid as well, and is skipped. With the 'fail_fast'
+option, the first violation raises a SchemaIncompatibleError.
+"""
+
+from bigquery_schema_generator.schema_common import FieldPath
+from bigquery_schema_generator.schema_common import SchemaIncompatibleError
+from bigquery_schema_generator.schema_common import convert_type
+from bigquery_schema_generator.shape_cache import ShapeCache
+
+# Number of valid record shapes remembered by default.
+VALID_SHAPES_CACHE_SIZE = 1024
+
+# Types of the values which do not define a column unless 'keep_nulls' is set.
+NULL_TYPES = frozenset(['__null__', '__empty_array__', '__empty_record__'])
+
+
+class FieldChecker:
+    """The column 'name', 'type' and 'mode' of a field of the existing schema.
+    The 'fields' of a RECORD are indexed by their canonical (lower-cased)
+    name, and 'required_keys' lists the canonical names of its REQUIRED
+    fields.
+    """
+
+    __slots__ = ('name', 'type', 'mode', 'fields', 'required_keys')
+
+    def __init__(self, name, type, mode):
+        self.name = name
+        self.type = type
+        self.mode = mode
+        self.fields = None
+        self.required_keys = ()
+
+
+def compile_schema_map(schema_map):
+    """Return the FieldChecker of a top-level record with the fields of
+    'schema_map'.
+    """
+    root = FieldChecker(None, 'RECORD', 'REQUIRED')
+    pending = [(root, schema_map)]
+    while pending:
+        checker, fields = pending.pop()
+        checker.fields = {}
+        required_keys = []
+        for key, schema_entry in fields.items():
+            info = schema_entry['info']
+            child = FieldChecker(info['name'], info['type'], info['mode'])
+            checker.fields[key] = child
+            if child.mode == 'REQUIRED':
+                required_keys.append(key)
+            if child.type == 'RECORD':
+                pending.append((child, info['fields']))
+        checker.required_keys = tuple(required_keys)
+    return root
+
+
+def describe_type(value_type):
+    """Return the type of a value for the error messages."""
+    if value_type in ('QBOOLEAN', 'QINTEGER', 'QFLOAT'):
+        return 'quoted ' + value_type[1:]
+    return value_type
+
+
+class SchemaValidator:
+    """Check the records given to validate_record() against 'schema_map',
+    logging each violation with the log_error() of the 'generator'. The
+    'generator' also provides its type inference and options.
+
+    Usage:
+        validator = SchemaValidator(generator, schema_map)
+        for json_object in records:
+            validator.validate_record(json_object)
+    """
+
+    def __init__(self, generator, schema_map, shape_cache_size=None):
+        self.generator = generator
+        self.root = compile_schema_map(schema_map)
+        self.is_csv = generator.input_format in ['csv', 'csvdictreader']
+        self.report_nulls = generator.keep_nulls
+        self.shape_cache = ShapeCache(
+            generator.infer_value_type,
+            shape_cache_size or VALID_SHAPES_CACHE_SIZE)
+
+    def validate_record(self, json_object):
+        """Check the 'json_object' (a dict) against the existing schema.
+        Returns True if it is valid.
+        """
+        shape_cache = self.shape_cache
+        fingerprint = shape_cache.lookup(self.root, json_object)
+        if fingerprint is True:
+            return True
+        generator = self.generator
+        error_count = generator.error_count
+        self.check_record(json_object)
+        if generator.error_count != error_count:
+            return False
+        shape_cache.add(fingerprint)
+        return True
+
+    def log_violation(self, msg, *args, path=None):
+        """Log the violation like log_error(), then raise a
+        SchemaIncompatibleError. Used instead of log_error() with the
+        'fail_fast' option.
+        """
+        generator = self.generator
+        generator.log_error(msg, *args, path=path)
+        raise SchemaIncompatibleError(
+            msg.format(*args),
+            generator.input_path,
+            generator.line_number,
+            str(path),
+        )
+
+    def check_record(self, json_object):
+        """Check the fields of 'json_object' and of its nested records, using
+        an explicit stack of (record, FieldChecker, base_path).
+        """
+        generator = self.generator
+        log_error = self.log_violation if generator.fail_fast \
+            else generator.log_error
+        sanitize_name = generator.sanitize_name
+        infer_value_type = generator.infer_value_type
+        is_csv = self.is_csv
+
+        stack = [(json_object, self.root, None)]
+        while stack:
+            record, record_checker, base_path = stack.pop()
+            fields = record_checker.fields
+            required_keys = record_checker.required_keys
+            seen_keys = set() if required_keys else None
+            for key, value in record.items():
+                canonical_key = sanitize_name(key).lower()
+                checker = fields.get(canonical_key)
+                if seen_keys is not None:
+                    seen_keys.add(canonical_key)
+
+                if value is None or (is_csv and value == ''):
+                    value_type = '__null__'
+                elif checker is not None:
+                    value_type = infer_value_type(value, checker.type)
+                else:
+                    value_type = infer_value_type(value)
+
+                if checker is None:
+                    if self.report_nulls or value_type not in NULL_TYPES:
+                        path = FieldPath(base_path, key)
+                        log_error(
+                            'New column "{}" is not in the existing schema',
+                            path,
+                            path=path,
+                        )
+                    continue
+
+                path = FieldPath(base_path, checker.name)
+                if value_type == '__null__':
+                    if checker.mode == 'REQUIRED':
+                        log_error('REQUIRED field "{}" is null', path,
+                                  path=path)
+                    continue
+
+                # A JSON column accepts any value.
+                if checker.type == 'JSON':
+                    continue
+
+                value_mode = 'NULLABLE'
+                if value_type == '__array__':
+                    value_mode = 'REPEATED'
+                    value_type = generator.infer_array_type(
+                        value, checker.type)
+                    if not value_type:
+                        log_error(
+                            'Elements of "{}" must be the same compatible'
+                            ' type',
+                            path,
+                            path=path,
+                        )
+                        continue
+                    if '__' in value_type and value_type != '__empty_record__':
+                        log_error(
+                            'Unsupported array element type of "{}": {}',
+                            path,
+                            value_type,
+                            path=path,
+                        )
+                        continue
+                elif value_type == '__empty_array__':
+                    value_mode = 'REPEATED'
+
+                if value_mode != checker.mode and (
+                        value_mode == 'REPEATED'
+                        or checker.mode == 'REPEATED'):
+                    log_error(
+                        'Field "{}" of mode {} cannot hold a value of mode'
+                        ' {}',
+                        path,
+                        checker.mode,
+                        value_mode,
+                        path=path,
+                    )
+                    continue
+                if value_type == '__empty_array__':
+                    continue
+
+                if value_type in ('RECORD', '__empty_record__'):
+                    if checker.type != 'RECORD':
+                        log_error(
+                            'Field "{}" of type {} cannot hold a value of'
+                            ' type {}',
+                            path,
+                            checker.type,
+                            'RECORD',
+                            path=path,
+                        )
+                    elif value_type == '__empty_record__':
+                        if checker.mode == 'REQUIRED':
+                            log_error('REQUIRED field "{}" is empty', path,
+                                      path=path)
+                    elif value_mode == 'REPEATED':
+                        for element in reversed(value):
+                            stack.append((element, checker, path))
+                    else:
+                        stack.append((value, checker, path))
+                    continue
+
+                if value_type == checker.type:
+                    continue
+                candidate_type = convert_type(checker.type, value_type)
+                if candidate_type == checker.type:
+                    continue
+                if candidate_type:
+                    log_error(
+                        'Field "{}" must be widened from {} to {}',
+                        path,
+                        checker.type,
+                        candidate_type,
+                        path=path,
+                    )
+                else:
+                    log_error(
+                        'Field "{}" of type {} cannot hold a value of type'
+                        ' {}',
+                        path,
+                        checker.type,
+                        describe_type(value_type),
+                        path=path,
+                    )
+
+            for canonical_key in required_keys:
+                if canonical_key not in seen_keys:
+                    path = FieldPath(base_path, fields[canonical_key].name)
+                    log_error('REQUIRED field "{}" is missing', path,
+                              path=path)
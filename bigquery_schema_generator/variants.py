@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Deduce the schemas of several configurations of the options in a single pass
+over the input, enabled by the --variant flag. Instead of reading the same
+data once per combination of flags (e.g. with and without
+--quoted_values_are_strings), the records are decoded once, and passed in
+chunks to one SchemaGenerator per distinct configuration.
+
+The options which are only used to flatten the schema_map into a schema
+(OUTPUT_OPTIONS) do not change the schema_map, so the configurations which
+differ only by them share the same schema_map, which is deduced once. Each
+configuration has its own SchemaGenerator to flatten it.
+"""
+
+import logging
+import os
+import re
+from collections import OrderedDict
+from itertools import islice
+from bigquery_schema_generator.input_files import open_input_file
+
+# The options which are only used to flatten the schema_map. The 'infer_mode'
+# also relaxes the REQUIRED fields of an existing schema, which is not
+# supported by the variants.
+OUTPUT_OPTIONS = ('keep_nulls', 'infer_mode', 'preserve_input_sort_order')
+
+# The boolean options which can be set by the --variant flag.
+VARIANT_FLAGS = OUTPUT_OPTIONS + ('quoted_values_are_strings', 'sanitize_names')
+
+# The options which must be the same in all the configurations, because they
+# change how the input is read, or the shape of the result.
+FIXED_OPTIONS = ('input_format', 'route_by', 'max_routes', 'line_cache_size')
+
+# Number of records decoded before they are passed to each SchemaGenerator.
+CHUNK_SIZE = 1000
+
+# Valid name of a variant, which is also the name of its schema file.
+VARIANT_NAME_MATCHER = re.compile(r'^[a-zA-Z0-9_-]+$')
+
+
+class SchemaVariants:
+    """Deduce the schema_map of the configuration of 'generator', and of each
+    variant of it, from the same input. The 'variants' is a dict of {name:
+    options}, whose options override those of 'generator'. The configuration
+    of 'generator' itself has the name None.
+
+    Usage:
+        variants = SchemaVariants(generator, {
+            'strings': {'quoted_values_are_strings': True},
+        })
+        variants.deduce_schema(input_data)
+        for name, (schema_map, error_logs) in variants.results().items():
+            schema = variants.generators[name].flatten_schema(schema_map)
+    """
+
+    def __init__(self, generator, variants):
+        if generator.router is not None:
+            raise Exception('Variants cannot be used with route_by')
+        # The LineCache skips the lines merged without error by its own
+        # generator, which may have caused an error in a variant.
+        if generator.line_cache is not None:
+            raise Exception('Variants cannot be used with line_cache_size')
+        self.generator = generator
+        # Map of {name: generator} of each configuration.
+        self.generators = OrderedDict([(None, generator)])
+        # Map of {name: generator} which deduces the schema_map of each
+        # configuration, and the schema_map of each of those generators.
+        self.deducers = OrderedDict([(None, generator)])
+        self.schema_maps = OrderedDict([(generator, OrderedDict())])
+        deducers = {inference_key(generator.options): generator}
+        for name, options in variants.items():
+            for option in options:
+                if option in FIXED_OPTIONS:
+                    raise Exception(
+                        f"Option '{option}' cannot be changed by a variant")
+            variant = type(generator)(**dict(generator.options, **options))
+            self.generators[name] = variant
+            deducer = deducers.setdefault(
+                inference_key(variant.options), variant)
+            self.deducers[name] = deducer
+            if deducer not in self.schema_maps:
+                self.schema_maps[deducer] = OrderedDict()
+
+    def deduce_schema(self, input_data):
+        """Read the records of 'input_data' once, and merge them into the
+        schema_map of each distinct configuration.
+        """
+        generator = self.generator
+        reader = generator.create_reader(input_data)
+        if generator.stats is not None:
+            reader = generator.stats.timed_reader(reader)
+
+        progress = generator.progress
+        if progress is not None:
+            progress.start_input(
+                input_data, generator.input_path, generator.line_number)
+        try:
+            while True:
+                records = list(islice(reader, CHUNK_SIZE))
+                if not records:
+                    break
+                for deducer, schema_map in self.schema_maps.items():
+                    deducer.deduce_records(records, schema_map)
+        finally:
+            logging.info(f'Processed {generator.line_number} lines')
+
+        if progress is not None:
+            progress.end_input(generator, self.schema_maps[generator])
+
+    def deduce_schema_from_paths(self, input_paths):
+        """Read the data files named by 'input_paths' once, like
+        SchemaGenerator.deduce_schema_from_paths().
+        """
+        generator = self.generator
+        if generator.input_format not in ['json', 'jsonstream', 'csv']:
+            raise Exception(
+                f"Cannot read files with input_format"
+                f" '{generator.input_format}'"
+            )
+        if generator.progress is not None:
+            generator.progress.set_input_paths(input_paths)
+
+        # The 'csv' module requires files to be opened with newline=''.
+        newline = '' if generator.input_format == 'csv' else None
+        for input_path in input_paths:
+            for deducer in self.schema_maps:
+                deducer.input_path = input_path
+                deducer.line_number = 0
+            with open_input_file(input_path, newline=newline) as input_file:
+                self.deduce_schema(input_file)
+        for deducer in self.schema_maps:
+            deducer.input_path = None
+
+    def results(self):
+        """Return the OrderedDict of {name: (schema_map, error_logs)} of each
+        configuration. The configurations which share a schema_map share its
+        error logs as well.
+        """
+        results = OrderedDict()
+        for name, deducer in self.deducers.items():
+            results[name] = (
+                self.schema_maps[deducer], deducer.get_error_logs())
+        return results
+
+    def run(self, input_file, output_file, input_paths=None, output_dir=None):
+        """Read the input once, print the schema of the configuration of
+        the 'generator' on the 'output_file', and write the schema of each
+        variant to '<name>.schema.json' in the 'output_dir'. The errors of a
+        variant are printed only if its schema_map is not shared with a
+        configuration printed before it.
+        """
+        if input_paths:
+            self.deduce_schema_from_paths(input_paths)
+        else:
+            self.deduce_schema(input_file)
+
+        os.makedirs(output_dir, exist_ok=True)
+        logged = set()
+        for name, (schema_map, error_logs) in self.results().items():
+            generator = self.generators[name]
+            deducer = self.deducers[name]
+            if deducer not in logged:
+                logged.add(deducer)
+                if name is not None:
+                    logging.info(
+                        f'Variant "{name}": {len(error_logs)} problems')
+                generator.log_problems(error_logs)
+            if name is None:
+                generator.write_schema(schema_map, output_file)
+                continue
+            path = os.path.join(output_dir, f'{name}.schema.json')
+            with open(path, 'w') as variant_file:
+                generator.write_schema(schema_map, variant_file)
+            logging.info(f'Variant "{name}": {path}')
+
+        shared = len(self.deducers) - len(self.schema_maps)
+        logging.info(
+            f'Deduced {len(self.schema_maps)} schemas for'
+            f' {len(self.deducers)} configurations'
+            + (f' ({shared} shared)' if shared else '')
+        )
+
+
+def inference_key(options):
+    """Return a hashable key of the 'options' which can change the
+    schema_map.
+    """
+    return tuple(
+        (option, repr(value)) for option, value in sorted(options.items())
+        if option not in OUTPUT_OPTIONS
+    )
+
+
+def parse_variant(text):
+    """Parse the 'NAME:FLAG,FLAG,...' value of the --variant flag into a
+    (name, options) tuple. Each FLAG is one of the VARIANT_FLAGS, which is
+    set to True, or to False if prefixed by 'no_'. Raises a ValueError if it
+    is not valid.
+    """
+    name, _, flags = text.partition(':')
+    if not VARIANT_NAME_MATCHER.match(name):
+        raise ValueError(f"Invalid variant name '{name}'")
+    options = {}
+    for flag in flags.split(','):
+        flag = flag.strip()
+        if not flag:
+            continue
+        value = not flag.startswith('no_')
+        option = flag if value else flag[len('no_'):]
+        if option not in VARIANT_FLAGS:
+            raise ValueError(f"Invalid flag '{flag}' of variant '{name}'")
+        options[option] = value
+    return name, options
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+from bigquery_schema_generator.error_summary import ErrorSummary
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+
+
+class TestErrorSummary(unittest.TestCase):
+    def test_add_aggregates_by_kind_and_path(self):
+        summary = ErrorSummary(max_samples=2)
+        for line_number in range(1, 6):
+            summary.add(None, line_number, 'Bad "{}": {}', ('a', line_number),
+                        'a')
+        summary.add(None, 6, 'Bad "{}": {}', ('b', 6), 'b')
+        summary.add(None, 7, 'Parse error', ())
+        error_logs = summary.to_error_logs()
+        self.assertEqual(3, len(error_logs))
+
+        first = error_logs[0]
+        self.assertEqual('Bad "a": 1 (repeated 5 times)', first['msg'])
+        self.assertEqual(5, first['count'])
+        self.assertEqual(1, first['line_number'])
+        self.assertEqual(5, first['last_line_number'])
+        self.assertEqual(['Bad "a": 1', 'Bad "a": 2'],
+                         [sample['msg'] for sample in first['samples']])
+
+        self.assertEqual('Bad "b": 6', error_logs[1]['msg'])
+        self.assertEqual('Parse error', error_logs[2]['msg'])
+
+    def test_add_beyond_max_keys(self):
+        summary = ErrorSummary(max_keys=2)
+        for i in range(10):
+            summary.add(None, i, 'Bad "{}"', (i,), str(i))
+        error_logs = summary.to_error_logs()
+        self.assertEqual(3, len(error_logs))
+        self.assertEqual(8, error_logs[2]['count'])
+        self.assertEqual('Bad "2" (repeated 8 times)', error_logs[2]['msg'])
+
+    def test_merge(self):
+        first = ErrorSummary(max_samples=2)
+        first.add('1.json', 1, 'Bad "{}"', ('a',), 'a')
+        second = ErrorSummary(max_samples=2)
+        second.add('2.json', 3, 'Bad "{}"', ('a',), 'a')
+        second.add('2.json', 4, 'Bad "{}"', ('a',), 'a')
+        second.add('2.json', 5, 'Other', ())
+        error_logs = first.merge(second).to_error_logs()
+        self.assertEqual(2, len(error_logs))
+        self.assertEqual(3, error_logs[0]['count'])
+        self.assertEqual('1.json', error_logs[0]['input_path'])
+        self.assertEqual(('2.json', 4), (error_logs[0]['last_input_path'],
+                                         error_logs[0]['last_line_number']))
+        self.assertEqual(2, len(error_logs[0]['samples']))
+
+
+class TestSchemaGeneratorErrorSummary(unittest.TestCase):
+    def test_deduce_schema_aggregates_errors(self):
+        input_data = ['{ "r": [{ "b": 1 }] }'] + [
+            '{ "r": { "b": 2 }, "a": [1, "x"] }'
+        ] * 1000
+        _, error_logs = SchemaGenerator().deduce_schema(input_data)
+        self.assertEqual(2000, len(error_logs))
+
+        generator = SchemaGenerator(max_error_samples=3)
+        _, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual(2000, generator.error_count)
+        self.assertEqual(2, len(error_logs))
+        self.assertEqual(
+            'Leaving schema for "r" as REPEATED RECORD (repeated 1000 times)',
+            error_logs[0]['msg'])
+        self.assertEqual(2, error_logs[0]['line_number'])
+        self.assertEqual(1001, error_logs[0]['last_line_number'])
+        self.assertEqual(3, len(error_logs[0]['samples']))
+        self.assertEqual(
+            'All array elements must be the same compatible type:'
+            ' 2 elements of types INTEGER, STRING (repeated 1000 times)',
+            error_logs[1]['msg'])
+
+    def test_array_errors_keyed_by_field(self):
+        input_data = [
+            json.dumps({'a': [1, 'x' * 10000]}),
+            json.dumps({'b': {'c': [1, {'z': 1}]}}),
+        ] * 2
+        generator = SchemaGenerator(max_error_samples=3)
+        _, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual(
+            [('All array elements must be the same compatible type: {}'
+              ' elements of types {}', path) for path in ['a', 'b.c']],
+            list(generator.error_summary.errors))
+        self.assertEqual(
+            [
+                'All array elements must be the same compatible type:'
+                ' 2 elements of types INTEGER, STRING (repeated 2 times)',
+                'All array elements must be the same compatible type:'
+                ' 2 elements of types INTEGER, RECORD (repeated 2 times)',
+            ],
+            [error_log['msg'] for error_log in error_logs])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+from io import StringIO
+from bigquery_schema_generator.field_stats import FieldStats
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+
+
+class TestFieldStats(unittest.TestCase):
+    def test_add_value(self):
+        stats = FieldStats()
+        stats.add_value(None, '__null__')
+        stats.add_value([], '__empty_array__')
+        stats.add_value(3, 'INTEGER')
+        stats.add_value('-7', 'QINTEGER')
+        stats.add_value('2.5', 'QFLOAT')
+        stats.add_value([10, 1.5], 'FLOAT')
+        stats.add_value(['abc', 'de'], 'STRING')
+        self.assertEqual(1, stats.null_count)
+        self.assertEqual(6, stats.non_null_count)
+        self.assertEqual(1, stats.empty_count)
+        self.assertEqual(
+            {'INTEGER': 1, 'QINTEGER': 1, 'QFLOAT': 1, 'FLOAT': 1,
+             'STRING': 1},
+            stats.type_counts)
+        self.assertEqual(-7, stats.min_value)
+        self.assertEqual(10, stats.max_value)
+        self.assertEqual(3, stats.max_length)
+
+    def test_merge(self):
+        a = FieldStats()
+        a.add_value(5, 'INTEGER')
+        b = FieldStats()
+        b.add_value(None, '__null__')
+        b.add_value(-1.5, 'FLOAT')
+        b.add_value('hello', 'STRING')
+        a.merge(b)
+        self.assertEqual(3, a.non_null_count)
+        self.assertEqual(1, a.null_count)
+        self.assertEqual({'INTEGER': 1, 'FLOAT': 1, 'STRING': 1},
+                         a.type_counts)
+        self.assertEqual(-1.5, a.min_value)
+        self.assertEqual(5, a.max_value)
+        self.assertEqual(5, a.max_length)
+
+
+class TestSchemaGeneratorFieldStats(unittest.TestCase):
+    def test_deduce_schema_collects_stats(self):
+        generator = SchemaGenerator(field_stats=True)
+        input_data = [
+            '{ "i": "1", "r": { "s": "abc" }, "a": [] }',
+            '{ "i": 2.5, "r": { "s": null }, "a": [1, 2] }',
+            '{ "i": null, "r": {}, "a": [3] }',
+        ]
+        schema_map, _ = generator.deduce_schema(input_data)
+        stats = generator.flatten_stats(schema_map)
+        self.assertEqual(['a', 'i', 'r', 'r.s'], list(stats.keys()))
+
+        self.assertEqual(3, stats['a']['non_null_count'])
+        self.assertEqual(1, stats['a']['empty_count'])
+        self.assertEqual(1, stats['a']['min_value'])
+        self.assertEqual(3, stats['a']['max_value'])
+
+        self.assertEqual('hard', stats['i']['status'])
+        self.assertEqual(2, stats['i']['non_null_count'])
+        self.assertEqual(1, stats['i']['null_count'])
+        self.assertEqual({'FLOAT': 1, 'QINTEGER': 1},
+                         stats['i']['type_counts'])
+
+        self.assertEqual(3, stats['r']['non_null_count'])
+        self.assertEqual(1, stats['r']['empty_count'])
+        self.assertEqual(1, stats['r.s']['null_count'])
+        self.assertEqual(3, stats['r.s']['max_length'])
+
+    def test_csv_empty_value_is_null(self):
+        generator = SchemaGenerator(input_format='csv', field_stats=True)
+        schema_map, _ = generator.deduce_schema(StringIO('a\n1\n\n""\n'))
+        stats = generator.flatten_stats(schema_map)
+        self.assertEqual(1, stats['a']['non_null_count'])
+        self.assertEqual(1, stats['a']['null_count'])
+
+    def test_deduce_schema_estimates_cardinality(self):
+        generator = SchemaGenerator(field_stats=True, field_cardinality=True)
+        input_data = [
+            f'{{ "id": {i}, "enum": "e{i % 3}", "a": [{i}, {i + 1}] }}'
+            for i in range(1000)
+        ]
+        schema_map, _ = generator.deduce_schema(input_data)
+        stats = generator.flatten_stats(schema_map)
+        self.assertAlmostEqual(1000, stats['id']['approx_distinct_count'],
+                               delta=50)
+        self.assertEqual(3, stats['enum']['approx_distinct_count'])
+        self.assertAlmostEqual(1001, stats['a']['approx_distinct_count'],
+                               delta=50)
+
+    def test_run_writes_stats_file(self):
+        generator = SchemaGenerator(field_stats=True, debugging_map=True)
+        output = StringIO()
+        stats_file = StringIO()
+        generator.run(StringIO('{ "s": "x" }'), output, stats_file=stats_file)
+        # The debugging map contains the FieldStats as well.
+        schema_map = json.loads(output.getvalue())
+        self.assertEqual(1, schema_map['s']['stats']['non_null_count'])
+        stats = json.loads(stats_file.getvalue())
+        self.assertEqual({'STRING': 1}, stats['s']['type_counts'])
+
+
+if __name__ == '__main__':
+    unittest.main()
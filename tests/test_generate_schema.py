@@ -17,15 +17,20 @@
 import unittest
 import os
 import json
+import pickle
 from io import StringIO
 from collections import OrderedDict
 from bigquery_schema_generator.generate_schema import BQ_TYPES
+from bigquery_schema_generator.generate_schema import FieldPath
 from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.generate_schema import SchemaIncompatibleError
 from bigquery_schema_generator.generate_schema import bq_schema_to_map
 from bigquery_schema_generator.generate_schema import convert_type
 from bigquery_schema_generator.generate_schema import is_string_type
 from bigquery_schema_generator.generate_schema import json_full_path
 from bigquery_schema_generator.generate_schema import json_reader
+from bigquery_schema_generator.generate_schema import json_stream_reader
+from bigquery_schema_generator.generate_schema import write_json
 from .data_reader import DataReader
 
 
@@ -255,6 +260,28 @@ class TestSchemaGeneratorHelpers(unittest.TestCase):
         self.assertEqual('__empty_array__', generator.infer_value_type([]))
         self.assertEqual('__array__', generator.infer_value_type([1, 2, 3]))
 
+    def test_infer_value_type_with_expected_type(self):
+        generator = SchemaGenerator()
+        values = [
+            '2020-01-01T00:00:00', '2020-01-01', '12:00:00', '1',
+            '9223372036854775808', '1.5', '1e5', 'True', 'abc', '',
+        ]
+        for expected_type in sorted(generator.PREDICTED_TYPES):
+            for value in values:
+                with self.subTest(expected_type=expected_type, value=value):
+                    self.assertEqual(
+                        generator.infer_value_type(value),
+                        generator.infer_value_type(value, expected_type))
+
+        generator = SchemaGenerator()
+        generator.deduce_schema([
+            '{ "d": "2020-01-01", "n": "1" }',
+            '{ "d": "2020-01-02", "n": "2" }',
+            '{ "d": "12:00:00", "n": "3" }',
+        ])
+        self.assertEqual(3, generator.prediction_hits)
+        self.assertEqual(1, generator.prediction_misses)
+
     def test_quoted_values_are_strings(self):
         generator = SchemaGenerator(quoted_values_are_strings=True)
         self.assertEqual('STRING', generator.infer_value_type('abcd'))
@@ -488,6 +515,91 @@ class TestSchemaGeneratorHelpers(unittest.TestCase):
 
         self.assertEqual('server.port', json_full_path('server', 'port'))
 
+    def test_field_path(self):
+        self.assertEqual('port', str(FieldPath(None, 'port')))
+        self.assertEqual('port', str(FieldPath('', 'port')))
+        server = FieldPath('root', 'server')
+        port = FieldPath(server, 'port')
+        self.assertEqual('root.server.port', str(port))
+        self.assertEqual('root.server.port', f'{port}')
+        self.assertEqual('root.server.port.x', json_full_path(port, 'x'))
+
+        path = None
+        for i in range(5000):
+            path = FieldPath(path, 'r')
+        self.assertEqual('.'.join(['r'] * 5000), str(path))
+
+    def test_write_json(self):
+        values = [
+            [],
+            {},
+            'é"\\',
+            [1, 2.5, True, None, 'a', [], {}, [[]]],
+            OrderedDict([('b', [OrderedDict([('x', {1: None})])]), ('a', 1)]),
+        ]
+        for value in values:
+            output = StringIO()
+            write_json(value, output)
+            self.assertEqual(json.dumps(value, indent=2), output.getvalue())
+
+        output = StringIO()
+        write_json({'s': {1, 2}}, output, default=sorted)
+        self.assertEqual(
+            json.dumps({'s': {1, 2}}, indent=2, default=sorted),
+            output.getvalue())
+
+        with self.assertRaises(TypeError):
+            write_json({'s': {1, 2}}, StringIO())
+
+        # Deeper than the default Python recursion limit.
+        value = []
+        for _ in range(5000):
+            value = [{'fields': value}]
+        output = StringIO()
+        write_json(value, output)
+        self.assertEqual(5001, output.getvalue().count('['))
+
+    def test_json_stream_reader(self):
+        inputs = [
+            ('{"a": 1}{"b": "x\\"y"}\n  {"c": [1, {"d": null}]}',
+             [{'a': 1}, {'b': 'x"y'}, {'c': [1, {'d': None}]}]),
+            ('[\n  {"a": 1},\n  {\n    "b": true\n  }\n]\n',
+             [{'a': 1}, {'b': True}]),
+            ('{"s": "' + 'x' * 100 + '"}', [{'s': 'x' * 100}]),
+            ('[]', []),
+            (' \n', []),
+        ]
+        for data, expected in inputs:
+            # Values are split across the chunks in every possible way.
+            for chunk_size in range(1, 8):
+                self.assertEqual(
+                    expected,
+                    list(json_stream_reader(StringIO(data), chunk_size)))
+
+        # The rest of the line of an invalid value is skipped.
+        values = list(json_stream_reader(
+            StringIO('{"a": 1}\n{"a": 1,, "b": 2}\n{"c": 2}\n{"d": '), 3))
+        self.assertEqual(4, len(values))
+        self.assertEqual({'a': 1}, values[0])
+        self.assertIsInstance(values[1], json.JSONDecodeError)
+        self.assertEqual({'c': 2}, values[2])
+        self.assertIsInstance(values[3], json.JSONDecodeError)
+
+        # A malformed string does not buffer the rest of the input.
+        lines = ['{"a": "x\n'] + ['{"b": 1}\n'] * 1000
+        read_count = 0
+
+        def read_lines():
+            nonlocal read_count
+            for line in lines:
+                read_count += 1
+                yield line
+
+        values = json_stream_reader(read_lines(), 1)
+        self.assertIsInstance(next(values), json.JSONDecodeError)
+        self.assertLess(read_count, 10)
+        self.assertEqual([{'b': 1}] * 1000, list(values))
+
 
 class TestSchemaGeneratorDeduce(unittest.TestCase):
     def test_run_with_input_and_output(self):
@@ -559,13 +671,404 @@ class TestSchemaGeneratorDeduce(unittest.TestCase):
             ],
         )
 
+    def test_deduce_schema_with_jsonstream_input(self):
+        generator = SchemaGenerator(input_format='jsonstream')
+        input_data = StringIO(
+            '[\n  {\n    "a": 1,\n    "r": {"b": "x"}\n  },\n'
+            '  {\n    "a": "y"\n  }\n]\n')
+        schema_map, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual(['a', 'r'], list(schema_map))
+        # The line number of an error is the number of the record.
+        self.assertEqual(1, len(error_logs))
+        self.assertEqual(2, error_logs[0]['line_number'])
+
+    def test_max_record_keys_converts_map_into_json(self):
+        generator = SchemaGenerator(max_record_keys=3)
+        input_data = [
+            '{ "id": 1, "users": { "user_1": { "a": 1 } } }',
+            '{ "id": 2, "users": { "user_2": { "a": 2 }, "user_3": {} } }',
+            '{ "id": 3, "users": { "user_4": { "a": 3 } } }',
+            '{ "id": 4, "users": { "user_5": { "b": "x" } } }',
+        ]
+        schema_map, error_logs = generator.deduce_schema(input_data)
+        schema = generator.flatten_schema(schema_map)
+        self.assertEqual(
+            [
+                OrderedDict([
+                    ('mode', 'NULLABLE'),
+                    ('name', 'id'),
+                    ('type', 'INTEGER'),
+                ]),
+                OrderedDict([
+                    ('mode', 'NULLABLE'),
+                    ('name', 'users'),
+                    ('type', 'JSON'),
+                ]),
+            ],
+            schema,
+        )
+        # The conversion is reported once, and no more fields are allocated.
+        self.assertEqual(1, len(error_logs))
+        self.assertEqual(3, error_logs[0]['line_number'])
+        self.assertEqual(
+            'Converting schema for "users" with more than 3 fields into JSON',
+            error_logs[0]['msg'],
+        )
+        self.assertNotIn('fields', schema_map['users']['info'])
+
+    def test_max_record_keys_single_large_record(self):
+        generator = SchemaGenerator(max_record_keys=2)
+        input_data = [
+            '{ "r": [{ "a": 1, "b": 2 }, { "c": 3 }], "s": { "x": 1 } }',
+        ]
+        schema_map, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual('JSON', schema_map['r']['info']['type'])
+        self.assertEqual('REPEATED', schema_map['r']['info']['mode'])
+        self.assertEqual('RECORD', schema_map['s']['info']['type'])
+        self.assertEqual(1, len(error_logs))
+
+    def test_max_depth_collapses_deeper_records(self):
+        generator = SchemaGenerator(max_depth=2)
+        input_data = [
+            '{ "a": 1, "r": { "b": 1, "t": { "c": 1 } } }',
+            '{ "r": { "t": [{ "c": "x" }], "u": { "d": [1, "x"] } } }',
+            '{ "r": { "t": 3 } }',
+        ]
+        schema_map, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual([], error_logs)
+        fields = schema_map['r']['info']['fields']
+        self.assertEqual(['b', 't', 'u'], list(fields))
+        self.assertEqual('JSON', fields['t']['info']['type'])
+        self.assertNotIn('fields', fields['u']['info'])
+
+    def test_max_depth_string_type(self):
+        generator = SchemaGenerator(max_depth=1, max_depth_type='STRING')
+        input_data = [
+            '{ "r": { "x": 1 }, "s": [{ "y": 1 }] }',
+            '{ "r": "text" }',
+        ]
+        schema_map, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual([], error_logs)
+        self.assertEqual(
+            [
+                OrderedDict([
+                    ('mode', 'NULLABLE'),
+                    ('name', 'r'),
+                    ('type', 'STRING'),
+                ]),
+                OrderedDict([
+                    ('mode', 'REPEATED'),
+                    ('name', 's'),
+                    ('type', 'STRING'),
+                ]),
+            ],
+            generator.flatten_schema(schema_map),
+        )
+
+    def test_max_depth_collapses_empty_records(self):
+        generator = SchemaGenerator(max_depth=1, keep_nulls=True)
+        input_data = ['{ "a": 1, "r": {}, "s": [{}] }']
+        schema_map, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual([], error_logs)
+        self.assertEqual(
+            [
+                OrderedDict([
+                    ('mode', 'NULLABLE'),
+                    ('name', 'a'),
+                    ('type', 'INTEGER'),
+                ]),
+                OrderedDict([
+                    ('mode', 'NULLABLE'),
+                    ('name', 'r'),
+                    ('type', 'JSON'),
+                ]),
+                OrderedDict([
+                    ('mode', 'REPEATED'),
+                    ('name', 's'),
+                    ('type', 'JSON'),
+                ]),
+            ],
+            generator.flatten_schema(schema_map),
+        )
+
+    def test_deeply_nested_records(self):
+        # Deeper than the default Python recursion limit.
+        depth = 5000
+
+        def make_record(leaf):
+            record = {'leaf': leaf}
+            for level in range(depth):
+                record = {'x': level, 'r': record}
+            return record
+
+        generator = SchemaGenerator(input_format='dict', field_stats=True)
+        schema_map, error_logs = generator.deduce_schema([
+            make_record(1),
+            make_record(2.5),
+            make_record('x'),
+        ])
+        # The conflict is reported with the full path of the innermost field.
+        self.assertEqual(1, len(error_logs))
+        self.assertEqual(3, error_logs[0]['line_number'])
+        self.assertIn('.'.join(['r'] * depth + ['leaf']), error_logs[0]['msg'])
+
+        def innermost_fields(schema):
+            # Return the nesting level and the names of the innermost fields.
+            level = 0
+            fields = schema
+            while True:
+                names = [field['name'] for field in fields]
+                if names == ['r', 'x']:
+                    fields = fields[0]['fields']
+                    level += 1
+                else:
+                    return level, names
+
+        schema = generator.flatten_schema(schema_map)
+        # The 'leaf' column is ignored.
+        self.assertEqual((depth, []), innermost_fields(schema))
+
+        stats = generator.flatten_stats(schema_map)
+        self.assertEqual(2 * depth + 1, len(stats))
+
+        # The schema can be read back as an existing schema.
+        leaf_generator = SchemaGenerator(input_format='dict')
+        leaf_map, _ = leaf_generator.deduce_schema([make_record(1)])
+        existing_schema_map = bq_schema_to_map(
+            leaf_generator.flatten_schema(leaf_map))
+        self.assertEqual(
+            (depth, ['leaf']),
+            innermost_fields(
+                leaf_generator.flatten_schema(existing_schema_map)))
+
+        # The merge of two deep schema maps, e.g. from 2 files.
+        other_map, _ = SchemaGenerator(input_format='dict').deduce_schema(
+            [make_record(True)])
+        generator.merge_schema_map(schema_map, other_map)
+        self.assertEqual(1, len(generator.error_logs))
+
+    def test_fail_fast(self):
+        existing_schema_map = bq_schema_to_map([
+            {'name': 'a', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+            {'name': 'r', 'type': 'RECORD', 'mode': 'NULLABLE', 'fields': [
+                {'name': 'X', 'type': 'BOOLEAN', 'mode': 'NULLABLE'},
+            ]},
+        ])
+        input_data = [
+            '{ "a": 1, "r": { "x": true } }',
+            '{ "a": 2.5, "n": 1 }',
+            '{ "n": "x" }',
+            '{ "r": { "x": 1 } }',
+            '{ "a": 3 }',
+        ]
+
+        # Widening the type and the conflict on a new field are not fatal.
+        generator = SchemaGenerator(fail_fast=True)
+        with self.assertRaises(SchemaIncompatibleError) as context:
+            generator.deduce_schema(
+                input_data, schema_map=existing_schema_map)
+        e = context.exception
+        self.assertEqual(4, e.line_number)
+        self.assertEqual('r.X', e.path)
+        self.assertEqual({'r': {'x': 1}}, e.record)
+        self.assertEqual(
+            'Field "r.X" on line 4 is incompatible with the existing schema:'
+            ' Ignoring field with mismatched type:'
+            ' old=(hard,r.X,NULLABLE,BOOLEAN); new=(hard,r.x,NULLABLE,INTEGER)',
+            str(e))
+        # The last line was not read.
+        self.assertEqual(4, generator.line_number)
+        self.assertEqual(2, len(generator.error_logs))
+
+        # Without an existing schema, nothing is fatal.
+        generator = SchemaGenerator(fail_fast=True)
+        _, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual(2, len(error_logs))
+
+    def test_fail_fast_record_changes(self):
+        existing_schema = [
+            {'name': 'r', 'type': 'RECORD', 'mode': 'NULLABLE', 'fields': [
+                {'name': 'x', 'type': 'BOOLEAN', 'mode': 'NULLABLE'},
+            ]},
+        ]
+        input_data = [
+            '{ "n": { "x": 1 } }',
+            '{ "n": [{ "x": 2 }] }',
+            '{ "r": [{ "x": true }] }',
+        ]
+        # A NULLABLE RECORD of the existing schema becoming REPEATED.
+        generator = SchemaGenerator(fail_fast=True)
+        with self.assertRaises(SchemaIncompatibleError) as context:
+            generator.deduce_schema(
+                input_data, schema_map=bq_schema_to_map(existing_schema))
+        self.assertEqual(3, context.exception.line_number)
+        self.assertEqual('r', context.exception.path)
+        self.assertEqual({'r': [{'x': True}]}, context.exception.record)
+
+        # A RECORD of the existing schema converted into JSON.
+        generator = SchemaGenerator(fail_fast=True, max_record_keys=1)
+        with self.assertRaises(SchemaIncompatibleError) as context:
+            generator.deduce_schema(
+                ['{ "n": { "x": 1, "y": 2 } }', '{ "r": { "y": 1 } }'],
+                schema_map=bq_schema_to_map(existing_schema))
+        self.assertEqual(2, context.exception.line_number)
+        self.assertEqual('r', context.exception.path)
+
+    def test_schema_incompatible_error_pickle(self):
+        error = SchemaIncompatibleError('Bad', 'file.json', 2, 'a')
+        error.record = {'a': 'x'}
+        copy = pickle.loads(pickle.dumps(error))
+        self.assertEqual(str(error), str(copy))
+        self.assertEqual({'a': 'x'}, copy.record)
+
+
+class TestSkipUnchanged(unittest.TestCase):
+    """The values which cannot change the 'hard' and filled entry of their
+    field are not merged into it (see SchemaGenerator.skip_unchanged). Each
+    test checks that the schema_map and the errors are the same as when every
+    value is merged.
+    """
+
+    def deduce_schema(self, records, existing_schema=None, **kwargs):
+        results = []
+        for skip_unchanged in [True, False]:
+            generator = SchemaGenerator(**kwargs)
+            generator.skip_unchanged = skip_unchanged
+            schema_map, error_logs = generator.deduce_schema(
+                records,
+                schema_map=bq_schema_to_map(existing_schema)
+                if existing_schema else None,
+            )
+            results.append((schema_map, error_logs))
+        self.assertEqual(results[1], results[0])
+        return results[0][0], [e['msg'] for e in results[0][1]]
+
+    def test_values_are_skipped(self):
+        generator = SchemaGenerator()
+        entries = []
+
+        def get_value_schema_entry(*args):
+            entries.append(args)
+            return SchemaGenerator.get_value_schema_entry(generator, *args)
+
+        generator.get_value_schema_entry = get_value_schema_entry
+        generator.deduce_schema(['{ "a": 1, "b": [1] }'] * 3)
+        self.assertEqual(['a', 'b'], [args[0] for args in entries])
+
+    def test_soft_entry_is_promoted(self):
+        schema_map, errors = self.deduce_schema(
+            ['{ "a": null }', '{ "a": 1 }', '{ "a": 2 }', '{ "a": "x" }'])
+        self.assertEqual('ignore', schema_map['a']['status'])
+        self.assertEqual(1, len(errors))
+
+        schema_map, errors = self.deduce_schema(
+            ['{ "a": [] }', '{ "a": [1] }', '{ "a": [2.5] }'])
+        self.assertEqual('hard', schema_map['a']['status'])
+        self.assertEqual(
+            ('REPEATED', 'FLOAT'),
+            (schema_map['a']['info']['mode'],
+             schema_map['a']['info']['type']))
+
+    def test_required_is_relaxed_with_infer_mode(self):
+        existing_schema = [
+            {'name': 'a', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+        ]
+        records = ['{ "a": 1 }', '{ "a": 2 }', '{ "a": null }', '{ "a": 3 }']
+        schema_map, errors = self.deduce_schema(
+            records, existing_schema, infer_mode=True)
+        self.assertEqual([], errors)
+        self.assertEqual('NULLABLE', schema_map['a']['info']['mode'])
+
+        schema_map, errors = self.deduce_schema(
+            records[:2], existing_schema, infer_mode=True)
+        self.assertEqual('REQUIRED', schema_map['a']['info']['mode'])
+
+        schema_map, errors = self.deduce_schema(records, existing_schema)
+        self.assertEqual('ignore', schema_map['a']['status'])
+        self.assertEqual(1, len(errors))
+
+    def test_csv_empty_values(self):
+        schema_map, errors = self.deduce_schema(
+            ['a,b,c,d,e\n', '1,x,,u,\n', '2,y,,v,p\n', ',z,3,,q\n',
+             '4,w,5,t,r\n'],
+            input_format='csv', infer_mode=True)
+        self.assertEqual([], errors)
+        self.assertEqual(
+            [('hard', False, 'QINTEGER'), ('hard', True, 'STRING'),
+             ('hard', False, 'QINTEGER'), ('hard', False, 'STRING'),
+             ('hard', False, 'STRING')],
+            [(entry['status'], entry['filled'], entry['info']['type'])
+             for entry in schema_map.values()])
+
+    def test_filled(self):
+        schema_map, _ = self.deduce_schema(
+            ['{ "a": 1, "b": "x" }', '{ "a": 2, "b": null }',
+             '{ "a": 3, "b": "y" }'])
+        self.assertTrue(schema_map['a']['filled'])
+        self.assertFalse(schema_map['b']['filled'])
+
+
+class TestSkipUnchangedDataChunks(unittest.TestCase):
+    """Differential test of SchemaGenerator.skip_unchanged: the schema_map and
+    the errors of each data chunk of TESTDATA_FILE, read twice in a row so
+    that most values are skipped, are the same as when every value is merged.
+    """
+
+    TESTDATA_FILE = 'testdata.txt'
+
+    def test_all_data_chunks(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        testdata_path = os.path.join(dir_path, self.TESTDATA_FILE)
+        with open(testdata_path) as testdatafile:
+            data_reader = DataReader(testdatafile)
+            while True:
+                chunk = data_reader.read_chunk()
+                if chunk is None:
+                    break
+                with self.subTest(line_number=chunk['line_number']):
+                    self.verify_data_chunk(chunk)
+
+    def verify_data_chunk(self, chunk):
+        data_flags = chunk['data_flags']
+        input_format = 'csv' if 'csv' in data_flags else 'json'
+        records = chunk['records']
+        if input_format == 'json':
+            records = records + records
+        else:
+            # Repeat the rows after the header line.
+            records = records + records[1:]
+        results = []
+        for skip_unchanged in [True, False]:
+            generator = SchemaGenerator(
+                input_format=input_format,
+                infer_mode='infer_mode' in data_flags,
+                keep_nulls='keep_nulls' in data_flags,
+                quoted_values_are_strings=(
+                    'quoted_values_are_strings' in data_flags),
+                sanitize_names='sanitize_names' in data_flags,
+                ignore_invalid_lines=True,
+                preserve_input_sort_order=(
+                    'preserve_input_sort_order' in data_flags),
+            )
+            generator.skip_unchanged = skip_unchanged
+            existing_schema_map = None
+            if chunk['existing_schema']:
+                existing_schema_map = bq_schema_to_map(
+                    json.loads(chunk['existing_schema']))
+            schema_map, error_logs = generator.deduce_schema(
+                records, schema_map=existing_schema_map)
+            results.append(
+                (schema_map, error_logs, generator.flatten_schema(schema_map)))
+        self.assertEqual(results[1], results[0])
+
 
 class TestDataChunksFromFile(unittest.TestCase):
     """Read the test case data from TESTDATA_FILE and verify that the expected
     schema matches the one produced by SchemaGenerator.deduce_schema(). Multiple
     test cases are stored in TESTDATA_FILE. The data_reader.py module knows how
     to parse that file.
-    JSON chunks are verified as JSON but also as dict.
+    JSON chunks are verified as JSON but also as dict, and as pretty-printed
+    'jsonstream'.
     """
 
     TESTDATA_FILE = 'testdata.txt'
@@ -592,12 +1095,18 @@ class TestDataChunksFromFile(unittest.TestCase):
     def verify_data_chunk(self, chunk):
         self.verify_data_chunk_as_csv_json_dict(chunk=chunk, as_dict=False)
         self.verify_data_chunk_as_csv_json_dict(chunk=chunk, as_dict=True)
+        self.verify_data_chunk_as_csv_json_dict(
+            chunk=chunk, as_dict=False, as_stream=True)
 
-    def verify_data_chunk_as_csv_json_dict(self, *, chunk, as_dict):
+    def verify_data_chunk_as_csv_json_dict(
+        self, *, chunk, as_dict, as_stream=False
+    ):
         """Verify the given chunk from the testdata.txt file. If `as_dict` is
         True, then if the input_format of the chunk is 'json', pretend
         that the input data was given as an internal Python dict, and verify
-        the 'input_format=dict' code path in SchemaGenerator.
+        the 'input_format=dict' code path in SchemaGenerator. If `as_stream`
+        is True, the JSON records are pretty-printed over multiple lines and
+        read with 'input_format=jsonstream'.
         """
         chunk_count = chunk['chunk_count']
         line_number = chunk['line_number']
@@ -615,7 +1124,22 @@ class TestDataChunksFromFile(unittest.TestCase):
         expected_schema = chunk['schema']
         existing_schema = chunk['existing_schema']
 
-        if as_dict:
+        if as_stream:
+            # Invalid lines are not pretty-printed, and the line numbers of
+            # the errors are the record numbers.
+            if (input_format != 'json' or ignore_invalid_lines
+                    or not all(r.lstrip().startswith('{') for r in records)):
+                return
+            print(
+                f"Test chunk: {chunk_count}; line_number: {line_number}; "
+                f"input_format='jsonstream'"
+            )
+            input_format = 'jsonstream'
+            records = [
+                json.dumps(json.loads(record), indent=2) + '\n'
+                for record in records
+            ]
+        elif as_dict:
             if input_format == 'json':
                 print(
                     f"Test chunk: {chunk_count}; line_number: {line_number}; "
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+import unittest
+from bigquery_schema_generator.hyperloglog import HyperLogLog
+
+
+class TestHyperLogLog(unittest.TestCase):
+    def assert_estimate(self, expected, sketch):
+        estimate = sketch.estimate()
+        self.assertLessEqual(abs(estimate - expected), 0.05 * expected + 1,
+                             f'expected {expected} but got {estimate}')
+
+    def test_estimate(self):
+        sketch = HyperLogLog()
+        self.assertEqual(0, sketch.estimate())
+        for count in [1, 10, 1000, 50000]:
+            sketch = HyperLogLog()
+            for i in range(count):
+                sketch.add(f'value{i}')
+                # Duplicates do not change the estimate.
+                sketch.add(f'value{i}')
+            self.assert_estimate(count, sketch)
+
+    def test_memory_is_bounded(self):
+        sketch = HyperLogLog(precision=10)
+        for i in range(10000):
+            sketch.add(i)
+        self.assertEqual(1024, len(sketch.registers))
+
+    def test_merge(self):
+        first = HyperLogLog()
+        second = HyperLogLog()
+        for i in range(20000):
+            first.add(i)
+        for i in range(10000, 30000):
+            second.add(i)
+        # The sketch survives a round trip through a worker process.
+        second = pickle.loads(pickle.dumps(second))
+        self.assert_estimate(30000, first.merge(second))
+
+        with self.assertRaises(Exception):
+            first.merge(HyperLogLog(precision=10))
+
+
+if __name__ == '__main__':
+    unittest.main()
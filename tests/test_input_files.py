@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.generate_schema import SchemaIncompatibleError
+from bigquery_schema_generator.generate_schema import bq_schema_to_map
+from bigquery_schema_generator.generate_schema import format_location
+from bigquery_schema_generator.input_files import detect_compression
+from bigquery_schema_generator.input_files import expand_input_paths
+from bigquery_schema_generator.input_files import open_input_file
+
+DATA = ''.join(
+    f'{{ "i": {i}, "s": "string{i}" }}\n' for i in range(10000)
+).encode('utf-8')
+
+
+class TestInputFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_file(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_detect_compression(self):
+        cases = [
+            ('plain.json', DATA, None),
+            ('data.json.gz', gzip.compress(DATA), 'gzip'),
+            ('data.json.bz2', bz2.compress(DATA), 'bz2'),
+            ('data.json.xz', lzma.compress(DATA), 'xz'),
+        ]
+        for name, data, expected in cases:
+            path = self.write_file(name, data)
+            with open(path, 'rb') as f:
+                self.assertEqual(expected, detect_compression(f))
+
+    def test_open_input_file_decompresses(self):
+        cases = [
+            ('plain.json', DATA),
+            ('data.json.gz', gzip.compress(DATA)),
+            ('data.json.bz2', bz2.compress(DATA)),
+            ('data.json.xz', lzma.compress(DATA)),
+            # The compression is detected from the content, not the name.
+            ('noext', gzip.compress(DATA)),
+        ]
+        for name, data in cases:
+            path = self.write_file(name, data)
+            with open_input_file(path) as f:
+                self.assertEqual(DATA.decode('utf-8'), f.read())
+
+    def test_open_input_file_zstd(self):
+        try:
+            import zstandard
+        except ImportError:
+            self.skipTest('zstandard is not installed')
+        path = self.write_file(
+            'data.json.zst', zstandard.ZstdCompressor().compress(DATA))
+        with open_input_file(path) as f:
+            self.assertEqual(DATA.decode('utf-8'), f.read())
+
+        # The frames of concatenated files are all decompressed.
+        compressor = zstandard.ZstdCompressor()
+        path = self.write_file(
+            'frames.json.zst',
+            compressor.compress(DATA) + compressor.compress(DATA))
+        with open_input_file(path) as f:
+            self.assertEqual(2 * DATA.decode('utf-8'), f.read())
+
+    def test_open_input_file_truncated(self):
+        path = self.write_file('data.json.gz', gzip.compress(DATA)[:1000])
+        with self.assertRaises(EOFError):
+            with open_input_file(path) as f:
+                f.read()
+
+    def test_run_with_input_paths(self):
+        first = self.write_file('first.json.gz', gzip.compress(DATA))
+        second = self.write_file('second.json.bz2', bz2.compress(
+            b'{ "x": 3.1 }\n{ "i": 2.5 }\n'))
+        generator = SchemaGenerator()
+        output = StringIO()
+        generator.run(output_file=output, input_paths=[first, second])
+        expected = """\
+[
+  {
+    "mode": "NULLABLE",
+    "name": "i",
+    "type": "FLOAT"
+  },
+  {
+    "mode": "NULLABLE",
+    "name": "s",
+    "type": "STRING"
+  },
+  {
+    "mode": "NULLABLE",
+    "name": "x",
+    "type": "FLOAT"
+  }
+]
+"""
+        self.assertEqual(expected, output.getvalue())
+
+    def test_expand_input_paths(self):
+        b = self.write_file('b.json', b'')
+        a = self.write_file('a.json', b'')
+        c = self.write_file('c.csv', b'')
+        pattern = os.path.join(self.tmpdir, '*.json')
+        self.assertEqual(
+            [c, a, b, '-'], expand_input_paths([c, pattern, '-']))
+        with self.assertRaises(Exception):
+            expand_input_paths([os.path.join(self.tmpdir, '*.txt')])
+
+    def test_deduce_schema_from_paths_reports_file_and_line(self):
+        first = self.write_file('first.json', b'{ "a": 1 }\n{ "a": 2 }\n')
+        second = self.write_file(
+            'second.json.gz', gzip.compress(b'{ "b": 1 }\n{ "a": "x" }\n'))
+        for jobs in [1, 2]:
+            generator = SchemaGenerator()
+            _, error_logs = generator.deduce_schema_from_paths(
+                [first, second], jobs=jobs)
+            self.assertEqual(1, len(error_logs))
+            self.assertEqual(second, error_logs[0]['input_path'])
+            if jobs == 1:
+                self.assertEqual(2, error_logs[0]['line_number'])
+
+    def test_deduce_schema_from_paths_parallel_reports_file_conflicts(self):
+        paths = [
+            self.write_file('1.json', b'{ "a": 1, "r": { "x": 1 } }\n'),
+            self.write_file('2.json', b'{ "a": "x" }\n'),
+            self.write_file('3.json', b'{ "r": [{ "x": 2 }] }\n'),
+        ]
+        # Each worker starts from a copy of the given schema_map, not from
+        # the one being merged into.
+        existing_schema_map = bq_schema_to_map(
+            [{'name': 'c', 'type': 'INTEGER', 'mode': 'NULLABLE'}])
+        generator = SchemaGenerator()
+        schema_map, error_logs = generator.deduce_schema_from_paths(
+            paths, schema_map=existing_schema_map, jobs=3)
+        self.assertEqual(['c', 'a', 'r'], list(schema_map))
+        self.assertEqual('ignore', schema_map['a']['status'])
+        # The conflicts between files are reported on the later file.
+        self.assertEqual(
+            [(paths[1], None), (paths[2], None)],
+            [(e['input_path'], e['line_number']) for e in error_logs])
+        self.assertEqual(
+            paths[1], format_location(paths[1], error_logs[0]['line_number']))
+        with self.assertLogs(level='INFO') as logs:
+            generator.log_problems(error_logs)
+        self.assertTrue(logs.output[0].startswith(
+            f'INFO:root:Problem on {paths[1]}: Ignoring field with'
+            ' mismatched type'))
+        self.assertTrue(logs.output[1].startswith(
+            f'INFO:root:Problem on {paths[2]}: Converting schema for "r"'))
+
+    def test_deduce_schema_from_paths_parallel_fail_fast(self):
+        paths = [
+            self.write_file('1.json', b'{ "a": 1 }\n'),
+            self.write_file('2.json', b'{ "a": 2 }\n{ "a": "x" }\n'),
+        ]
+        generator = SchemaGenerator(fail_fast=True)
+        with self.assertRaises(SchemaIncompatibleError) as context:
+            generator.deduce_schema_from_paths(
+                paths,
+                schema_map=bq_schema_to_map(
+                    [{'name': 'a', 'type': 'INTEGER', 'mode': 'NULLABLE'}]),
+                jobs=2)
+        e = context.exception
+        self.assertEqual((paths[1], 2, 'a'), (e.input_path, e.line_number,
+                                              e.path))
+        self.assertEqual({'a': 'x'}, e.record)
+
+    def test_deduce_schema_from_paths_parallel_matches_sequential(self):
+        files = [
+            ('1.csv', b'z,y,x\n1,,2020-01-01\n'),
+            ('2.csv', b'y,w,z\n1.5,true,\n'),
+            ('3.csv', b'v,z\nabc,3\n'),
+        ]
+        paths = [self.write_file(name, data) for name, data in files]
+        schemas = []
+        for jobs in [1, 3]:
+            generator = SchemaGenerator(input_format='csv', infer_mode=True)
+            schema_map, _ = generator.deduce_schema_from_paths(
+                paths, jobs=jobs)
+            schemas.append(generator.flatten_schema(schema_map))
+        self.assertEqual(schemas[0], schemas[1])
+        self.assertEqual(
+            ['z', 'y', 'x', 'w', 'v'], [f['name'] for f in schemas[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
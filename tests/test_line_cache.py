@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import unittest
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.generate_schema import bq_schema_to_map
+from bigquery_schema_generator.line_cache import DUPLICATE_LINE
+from bigquery_schema_generator.line_cache import LineCache
+from bigquery_schema_generator.shape_cache import MIN_LOOKUPS
+from .data_reader import DataReader
+
+
+class TestLineCache(unittest.TestCase):
+    def test_reader(self):
+        cache = LineCache(2)
+        records = []
+        for record in cache.reader(['{"a": 1}', '{"a": 1}', '{', '{"a": 1}']):
+            records.append(record)
+            if isinstance(record, dict):
+                cache.add_last_line()
+        self.assertEqual({'a': 1}, records[0])
+        self.assertIs(DUPLICATE_LINE, records[1])
+        self.assertIsInstance(records[2], json.JSONDecodeError)
+        self.assertIs(DUPLICATE_LINE, records[3])
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(2, cache.misses)
+        self.assertEqual(0.5, cache.hit_rate())
+
+    def test_max_size_and_disable(self):
+        cache = LineCache(2)
+        for record in cache.reader([f'{{"k{i}": 1}}' for i in range(3)]):
+            cache.add_last_line()
+        self.assertEqual(1, len(cache.lines))
+
+        # Almost all lines are different.
+        for record in cache.reader(
+                [f'{{"k{i}": 1}}' for i in range(MIN_LOOKUPS)]):
+            cache.add_last_line()
+        self.assertFalse(cache.enabled)
+        self.assertEqual(0, len(cache.lines))
+
+    def test_deduce_schema_skips_identical_lines(self):
+        generator = SchemaGenerator(line_cache_size=10)
+        input_data = ['{ "a": 1, "b": null }'] * 3 + [
+            '{ "a": 1.5, "b": "x" }',
+            '{ "a": 1, "b": null }',
+        ]
+        schema_map, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual(3, generator.line_cache.hits)
+        self.assertEqual(2, generator.line_cache.misses)
+        self.assertEqual(5, generator.line_number)
+        self.assertEqual('FLOAT', schema_map['a']['info']['type'])
+        self.assertFalse(schema_map['b']['filled'])
+
+    def test_errors_are_reported_on_each_line(self):
+        generator = SchemaGenerator(line_cache_size=10)
+        input_data = [
+            '{ "r": { "b": 1 } }',
+            '{ "r": [{ "b": 1 }] }',
+            '{ "r": { "b": 1 } }',
+            '{ "r": { "b": 1 } }',
+            '{ "a": [1, "x"] }',
+            '{ "a": [1, "x"] }',
+        ]
+        _, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual(
+            [2, 3, 4, 5, 6], [error['line_number'] for error in error_logs])
+
+    def test_only_json_input(self):
+        self.assertIsNone(
+            SchemaGenerator(input_format='csv', line_cache_size=10).line_cache)
+        self.assertIsNone(
+            SchemaGenerator(line_cache_size=10, field_stats=True).line_cache)
+
+
+class TestLineCacheDataChunks(unittest.TestCase):
+    """Verify that the line cache does not change the schema or the errors
+    of the JSON test cases of 'testdata.txt', with each line repeated.
+    """
+
+    def test_all_data_chunks(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        testdata_path = os.path.join(dir_path, 'testdata.txt')
+        with open(testdata_path) as testdatafile:
+            data_reader = DataReader(testdatafile)
+            while True:
+                chunk = data_reader.read_chunk()
+                if chunk is None:
+                    break
+                if 'csv' in chunk['data_flags']:
+                    continue
+                with self.subTest(line_number=chunk['line_number']):
+                    self.verify_data_chunk(chunk)
+
+    def verify_data_chunk(self, chunk):
+        data_flags = chunk['data_flags']
+        records = [r for r in chunk['records'] for _ in range(3)]
+
+        results = []
+        for line_cache_size in [None, 100]:
+            generator = SchemaGenerator(
+                infer_mode=('infer_mode' in data_flags),
+                keep_nulls=('keep_nulls' in data_flags),
+                quoted_values_are_strings=(
+                    'quoted_values_are_strings' in data_flags),
+                sanitize_names=('sanitize_names' in data_flags),
+                ignore_invalid_lines=('ignore_invalid_lines' in data_flags),
+                preserve_input_sort_order=(
+                    'preserve_input_sort_order' in data_flags),
+                line_cache_size=line_cache_size,
+            )
+            existing_schema_map = None
+            if chunk['existing_schema']:
+                existing_schema_map = bq_schema_to_map(
+                    json.loads(chunk['existing_schema']))
+            try:
+                schema_map, error_logs = generator.deduce_schema(
+                    records, schema_map=existing_schema_map)
+            except Exception as e:
+                results.append(repr(e))
+                continue
+            results.append(
+                (generator.flatten_schema(schema_map), error_logs))
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.numeric import classify_integer_literal
+from bigquery_schema_generator.numeric import loads_json
+from bigquery_schema_generator.numeric import parse_integer_literal
+from bigquery_schema_generator.numeric import raw_decode_json
+
+# Longer than the default limit of the conversion of a string into an int.
+LONG_LITERAL = '1' * 5000
+
+
+class TestNumeric(unittest.TestCase):
+    def test_classify_integer_literal_boundaries(self):
+        for value, expected in [
+            (2**63 - 1, 'INTEGER'),
+            (2**63, 'FLOAT'),
+            (-2**63, 'INTEGER'),
+            (-2**63 - 1, 'FLOAT'),
+            (10**18 - 1, 'INTEGER'),
+            (10**18, 'INTEGER'),
+            (10**19, 'FLOAT'),
+            (-10**19, 'FLOAT'),
+            (0, 'INTEGER'),
+        ]:
+            literal = str(value)
+            with self.subTest(literal=literal):
+                self.assertEqual(expected, classify_integer_literal(literal))
+                # Neither do a plus sign or leading zeros change the value.
+                sign = '-' if value < 0 else '+'
+                padded = sign + '000' + str(abs(value))
+                self.assertEqual(expected, classify_integer_literal(padded))
+
+    def test_classify_long_literals(self):
+        self.assertEqual('FLOAT', classify_integer_literal(LONG_LITERAL))
+        self.assertEqual('FLOAT', classify_integer_literal('-' + LONG_LITERAL))
+        self.assertEqual(
+            'INTEGER', classify_integer_literal('0' * 5000 + '12'))
+
+    def test_parse_integer_literal(self):
+        self.assertEqual(12, parse_integer_literal('12'))
+        self.assertEqual(-2**63, parse_integer_literal(str(-2**63)))
+        self.assertEqual(-12, parse_integer_literal('-' + '0' * 5000 + '12'))
+        self.assertIsInstance(parse_integer_literal(str(2**63)), float)
+        self.assertEqual(float('inf'), parse_integer_literal(LONG_LITERAL))
+
+    def test_decode_long_literals(self):
+        text = f'{{"a": {LONG_LITERAL}, "b": 1}}'
+        self.assertEqual({'a': float('inf'), 'b': 1}, loads_json(text))
+        self.assertEqual(({'a': float('inf'), 'b': 1}, len(text)),
+                         raw_decode_json(text))
+        with self.assertRaises(json.JSONDecodeError):
+            loads_json('{"a": ')
+
+    def test_deduce_schema(self):
+        generator = SchemaGenerator()
+        schema_map, error_logs = generator.deduce_schema([
+            f'{{"a": {LONG_LITERAL}, "q": "{LONG_LITERAL}"}}',
+            f'{{"a": {2**63 - 1}, "q": "-{2**63}"}}',
+        ])
+        self.assertEqual([], error_logs)
+        self.assertEqual('FLOAT', schema_map['a']['info']['type'])
+        self.assertEqual('QFLOAT', schema_map['q']['info']['type'])
+        self.assertEqual(
+            'QINTEGER', generator.infer_value_type(str(-2**63)))
+        self.assertEqual(
+            'QFLOAT', generator.infer_value_type(str(-2**63 - 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
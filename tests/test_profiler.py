@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.profiler import ProfileStats
+
+
+class TestProfileStats(unittest.TestCase):
+    def test_nested_phases_are_exclusive(self):
+        stats = ProfileStats()
+        stats.enter('merge')
+        time.sleep(0.02)
+        stats.enter('inference')
+        time.sleep(0.05)
+        stats.exit()
+        stats.exit()
+        self.assertGreaterEqual(stats.seconds['inference'], 0.05)
+        self.assertGreaterEqual(stats.seconds['merge'], 0.02)
+        self.assertLess(stats.seconds['merge'], 0.05)
+        self.assertEqual([], stats.stack)
+
+    def test_merge(self):
+        a = ProfileStats()
+        a.seconds['decode'] = 1.0
+        a.counts['merges'] = 2
+        b = ProfileStats()
+        b.seconds['decode'] = 0.5
+        b.counts['merges'] = 3
+        a.merge(b)
+        self.assertEqual(1.5, a.seconds['decode'])
+        self.assertEqual(5, a.counts['merges'])
+
+
+class TestSchemaGeneratorProfile(unittest.TestCase):
+    def test_disabled_by_default(self):
+        generator = SchemaGenerator()
+        self.assertIsNone(generator.stats)
+        # No wrapper is installed on the instance.
+        self.assertNotIn('merge_schema_entry', vars(generator))
+        self.assertNotIn('infer_value_type', vars(generator))
+
+    def test_deduce_schema_counts(self):
+        generator = SchemaGenerator(profile=True)
+        input_data = [
+            '{ "i": 1, "s": "a", "r": { "x": 1 } }',
+            '{ "i": 2.5, "s": 3, "r": { "x": null } }',
+            '{ "i": 3, "s": "b" }',
+        ]
+        schema_map, _ = generator.deduce_schema(input_data)
+        generator.flatten_schema(schema_map)
+        counts = generator.stats.counts
+        self.assertEqual(3, counts['records'])
+        # 4 entries in the first 2 records, 2 in the last one.
+        self.assertEqual(10, counts['entries_allocated'])
+        # i, s, r, r.x in the second record; i, s in the third one.
+        self.assertEqual(6, counts['merges'])
+        self.assertEqual(1, counts['widenings'])
+        self.assertEqual(1, counts['ignores'])
+        for phase in ['decode', 'inference', 'merge', 'other', 'flatten']:
+            self.assertGreater(generator.stats.seconds[phase], 0)
+
+    def test_deduce_schema_from_paths_merges_worker_stats(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            paths = []
+            for i in range(3):
+                path = os.path.join(tmpdir, f'{i}.json')
+                with open(path, 'w') as f:
+                    f.write('{ "a": 1 }\n{ "a": 2 }\n')
+                paths.append(path)
+            generator = SchemaGenerator(profile=True)
+            generator.deduce_schema_from_paths(paths, jobs=2)
+            self.assertEqual(6, generator.stats.counts['records'])
+            # The second value of 'a' in each file has the same type, so no
+            # entry is allocated for it.
+            self.assertEqual(3, generator.stats.counts['entries_allocated'])
+            # Only the 2 merges of the per-file schemas.
+            self.assertEqual(2, generator.stats.counts['merges'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
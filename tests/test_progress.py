@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.input_files import input_position
+from bigquery_schema_generator.input_files import open_input_file
+from bigquery_schema_generator.progress import count_fields
+from bigquery_schema_generator.progress import json_lines_callback
+
+DATA = ''.join(
+    f'{{ "i": {i}, "r": {{ "s": "string{i}" }} }}\n' for i in range(1000)
+).encode('utf-8')
+
+
+class TestProgress(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_file(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_input_position(self):
+        path = self.write_file('data.json.gz', gzip.compress(DATA))
+        size = os.path.getsize(path)
+        with open_input_file(path) as f:
+            self.assertEqual(size, input_position(f)[1])
+            f.read()
+            self.assertEqual((size, size), input_position(f))
+        self.assertEqual((None, None), input_position(['a list']))
+
+    def test_count_fields(self):
+        schema_map, _ = SchemaGenerator().deduce_schema(
+            ['{ "a": 1, "r": { "b": 1, "c": { "d": 1 } } }'])
+        self.assertEqual(5, count_fields(schema_map))
+
+    def test_deduce_schema_from_paths_reports_progress(self):
+        first = self.write_file('first.json.gz', gzip.compress(DATA))
+        second = self.write_file('second.json', DATA)
+        total = os.path.getsize(first) + os.path.getsize(second)
+        for jobs in [1, 2]:
+            reports = []
+            generator = SchemaGenerator(
+                debugging_interval=300, progress_callback=reports.append)
+            generator.deduce_schema_from_paths([first, second], jobs=jobs)
+
+            events = [report['event'] for report in reports]
+            if jobs == 1:
+                self.assertEqual(
+                    ['progress'] * 3 + ['input_done']
+                    + ['progress'] * 3 + ['input_done'],
+                    events)
+                self.assertEqual(
+                    [300, 600, 900, 1000, 1300, 1600, 1900, 2000],
+                    [report['records'] for report in reports])
+            else:
+                self.assertEqual(['input_done', 'input_done'], events)
+            last = reports[-1]
+            self.assertEqual(second, last['input_path'])
+            self.assertEqual(2000, last['records'])
+            self.assertEqual(total, last['bytes_consumed'])
+            self.assertEqual(total, last['bytes_total'])
+            self.assertEqual(0, last['eta_seconds'])
+            self.assertEqual(3, last['num_fields'])
+            self.assertEqual(0, last['error_count'])
+            self.assertGreater(last['rss_bytes'], 0)
+
+    def test_run_writes_json_lines(self):
+        output = StringIO()
+        generator = SchemaGenerator(
+            progress_callback=json_lines_callback(output))
+        generator.run(
+            StringIO('{ "a": 1 }\n{ "a": "x" }\n'), StringIO())
+        reports = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(['input_done', 'done'],
+                         [report['event'] for report in reports])
+        self.assertEqual(2, reports[-1]['records'])
+        self.assertEqual(1, reports[-1]['error_count'])
+        self.assertIsNone(reports[-1]['bytes_total'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.generate_schema import bq_schema_to_map
+from bigquery_schema_generator.projection import FieldProjection
+
+RECORD = {
+    'id': 1,
+    'payload': {'raw': [1, 'x'], 'size': 10},
+    'meta': {'host': 'a', 'debug_trace': {'x': 1}, 'debug_level': 2},
+    'items': [{'sku': 'a', 'blob': {'b': 1}}, {'sku': 'b'}],
+}
+
+
+class TestProjection(unittest.TestCase):
+    def project(self, record, include_paths=None, exclude_paths=None,
+                **options):
+        projection = FieldProjection(
+            SchemaGenerator(**options), include_paths, exclude_paths)
+        return projection.project(record)
+
+    def test_exclude_paths(self):
+        projected = self.project(
+            RECORD, exclude_paths=['payload', 'meta.debug_*', 'items.blob'])
+        self.assertEqual({
+            'id': 1,
+            'meta': {'host': 'a'},
+            'items': [{'sku': 'a'}, {'sku': 'b'}],
+        }, projected)
+        # The subtrees without a removed field are shared.
+        self.assertIs(RECORD['items'][1], projected['items'][1])
+        # The original record is unchanged.
+        self.assertIn('payload', RECORD)
+
+    def test_include_paths(self):
+        self.assertEqual({
+            'id': 1,
+            'meta': {'host': 'a'},
+            'items': [{'sku': 'a'}, {'sku': 'b'}],
+        }, self.project(RECORD, include_paths=['ID', 'meta.host', 'items.s*']))
+        self.assertEqual({
+            'meta': {'host': 'a'},
+        }, self.project(
+            RECORD, include_paths=['meta'], exclude_paths=['meta.debug_*']))
+
+    def test_include_paths_remove_other_values(self):
+        # The values which are not RECORDs on the path of a pattern, and the
+        # RECORDs without an included field.
+        include_paths = ['id', 'user.name']
+        for record in [
+            {'id': 1, 'user': 'x'},
+            {'id': 1, 'user': None},
+            {'id': 1, 'user': {'age': 1}},
+            {'id': 1, 'user': {}},
+            {'id': 1, 'user': [1, {'age': 1}]},
+            {'id': 1, 'user': []},
+        ]:
+            self.assertEqual(
+                {'id': 1}, self.project(record, include_paths=include_paths))
+        self.assertEqual(
+            {'id': 1, 'user': [{'name': 'a'}]},
+            self.project({'id': 1, 'user': [{'name': 'a'}, 'b', {'age': 1}]},
+                         include_paths=include_paths))
+
+    def test_emptied_records_are_removed(self):
+        self.assertEqual(
+            {'id': 1, 'items': [{'sku': 'a'}]},
+            self.project({
+                'id': 1,
+                'meta': {'debug_level': 2},
+                'items': [{'sku': 'a', 'blob': 1}, {'blob': 2}],
+            }, exclude_paths=['meta.debug_*', 'items.blob']))
+        # The records which were already empty are kept.
+        record = {'id': 1, 'meta': {}}
+        self.assertIs(
+            record, self.project(record, exclude_paths=['meta.debug_*']))
+
+    def test_include_paths_deduce_schema(self):
+        generator = SchemaGenerator(
+            input_format='dict', keep_nulls=True,
+            include_paths=['id', 'user.name'])
+        schema_map, error_logs = generator.deduce_schema([
+            {'id': 1, 'user': {'age': 1}},
+            {'id': 2, 'user': 'x'},
+        ])
+        self.assertEqual([], error_logs)
+        self.assertEqual(['id'], list(schema_map))
+
+    def test_unchanged_record(self):
+        self.assertIs(RECORD, self.project(RECORD, exclude_paths=['x.y']))
+        self.assertIs(RECORD, self.project(RECORD, include_paths=['*']))
+
+    def test_sanitized_names(self):
+        record = {'a-b': 1, 'c': 2}
+        self.assertEqual(
+            {'c': 2},
+            self.project(record, exclude_paths=['a_b'], sanitize_names=True))
+        self.assertEqual(
+            record, self.project(record, exclude_paths=['a_b']))
+
+    def test_deduce_schema(self):
+        generator = SchemaGenerator(
+            input_format='dict',
+            exclude_paths=['payload', 'meta.debug_*', 'items.blob'])
+        schema_map, error_logs = generator.deduce_schema([
+            RECORD,
+            {'id': 2, 'payload': 'not a record'},
+        ])
+        self.assertEqual([], error_logs)
+        self.assertEqual(
+            ['id', 'items', 'meta'],
+            [field['name'] for field in generator.flatten_schema(schema_map)])
+        self.assertEqual(
+            ['host'], list(schema_map['meta']['info']['fields']))
+
+    def test_validate(self):
+        generator = SchemaGenerator(
+            input_format='dict', include_paths=['id', 'meta.host'])
+        schema_map = bq_schema_to_map([
+            {'name': 'id', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+            {'name': 'meta', 'type': 'RECORD', 'mode': 'NULLABLE', 'fields': [
+                {'name': 'host', 'type': 'STRING', 'mode': 'NULLABLE'},
+            ]},
+        ])
+        self.assertEqual([], generator.validate([RECORD], schema_map))
+
+    def test_not_used_with_csv(self):
+        generator = SchemaGenerator(input_format='csv', exclude_paths=['a'])
+        self.assertIsNone(generator.projection)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.router import route_file_names
+
+RECORDS = [
+    '{ "type": "click", "x": 1, "y": 2 }',
+    '{ "type": "view", "page": "home" }',
+    '{ "type": "click", "x": 1.5 }',
+    '{ "x": "a" }',
+    '{ "type": 3, "x": true }',
+]
+
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def deduce(self, records, **options):
+        generator = SchemaGenerator(**options)
+        schema_maps, error_logs = generator.deduce_schema(records)
+        schemas = [
+            (route, [(f['name'], f['type'])
+                     for f in generator.flatten_schema(schema_map)])
+            for route, schema_map in schema_maps.items()
+        ]
+        return schemas, error_logs
+
+    def test_route_by(self):
+        schemas, error_logs = self.deduce(RECORDS, route_by='type')
+        self.assertEqual([
+            ('click', [('type', 'STRING'), ('x', 'FLOAT'), ('y', 'INTEGER')]),
+            ('view', [('page', 'STRING'), ('type', 'STRING')]),
+            (None, [('x', 'STRING')]),
+            ('3', [('type', 'INTEGER'), ('x', 'BOOLEAN')]),
+        ], schemas)
+        self.assertEqual([], error_logs)
+
+    def test_nested_path_and_invalid_values(self):
+        schemas, error_logs = self.deduce([
+            '{ "meta": { "kind": "a" }, "x": 1 }',
+            '{ "meta": { "kind": { "b": 1 } }, "x": 1 }',
+            '{ "meta": "a", "x": 1 }',
+        ], route_by='meta.kind')
+        self.assertEqual(['a', None], [route for route, _ in schemas])
+        self.assertEqual([{
+            'line_number': 2,
+            'input_path': None,
+            'msg': 'Cannot route record by "meta.kind" with a value of type'
+                   ' dict',
+        }], error_logs)
+
+    def test_max_routes(self):
+        schemas, error_logs = self.deduce(
+            RECORDS, route_by='type', max_routes=2)
+        self.assertEqual(['click', 'view'], [route for route, _ in schemas])
+        self.assertEqual([
+            (4, 'Ignoring record with route "null", more than 2 routes'),
+            (5, 'Ignoring record with route "3", more than 2 routes'),
+        ], [(error['line_number'], error['msg']) for error in error_logs])
+
+    def test_null_route_and_null_string(self):
+        schemas, error_logs = self.deduce([
+            '{ "type": "null", "x": 1 }',
+            '{ "x": "a" }',
+        ], route_by='type')
+        self.assertEqual([
+            ('null', [('type', 'STRING'), ('x', 'INTEGER')]),
+            (None, [('x', 'STRING')]),
+        ], schemas)
+        self.assertEqual([], error_logs)
+
+    def test_ignored_records_keep_the_caches(self):
+        generator = SchemaGenerator(
+            route_by='type', max_routes=1, shape_cache_size=10)
+        _, error_logs = generator.deduce_schema(
+            ['{ "type": "a", "x": 1 }'] + [
+                '{ "type": "b" }', '{ "type": "a", "x": 2 }',
+            ] * 10)
+        self.assertEqual(10, len(error_logs))
+        self.assertEqual(10, generator.router.routes['a'].shape_cache.hits)
+
+    def test_caches_of_each_route(self):
+        generator = SchemaGenerator(
+            route_by='type', shape_cache_size=10, specialize_after=1)
+        generator.deduce_schema([
+            '{ "type": "a", "x": 1 }',
+            '{ "type": "b", "y": "z" }',
+        ] * 10)
+        routes = generator.router.routes
+        self.assertEqual(9, routes['a'].specializer.hits)
+        self.assertEqual(0, routes['a'].shape_cache.hits)
+        self.assertEqual(9, routes['b'].specializer.hits)
+
+    def test_route_file_names(self):
+        self.assertEqual({
+            'click': 'click.schema.json',
+            'a/b': 'a_b.schema.json',
+            'a_b': 'a_b_2.schema.json',
+            'A_B': 'A_B_3.schema.json',
+            '': '_.schema.json',
+            None: 'null.schema.json',
+            'null': 'null_2.schema.json',
+        }, route_file_names(['click', 'a/b', 'a_b', 'A_B', '', None, 'null']))
+
+    def test_run_writes_schema_files(self):
+        generator = SchemaGenerator(route_by='type')
+        generator.run(input_file=RECORDS, output_dir=self.tmpdir)
+        self.assertEqual(
+            ['3.schema.json', 'click.schema.json', 'null.schema.json',
+             'view.schema.json'],
+            sorted(os.listdir(self.tmpdir)))
+        with open(os.path.join(self.tmpdir, 'view.schema.json')) as f:
+            self.assertEqual([
+                {'mode': 'NULLABLE', 'name': 'page', 'type': 'STRING'},
+                {'mode': 'NULLABLE', 'name': 'type', 'type': 'STRING'},
+            ], json.load(f))
+
+    def test_deduce_schema_from_paths_parallel(self):
+        paths = []
+        for i, lines in enumerate([RECORDS[:2], RECORDS[2:]]):
+            path = os.path.join(self.tmpdir, f'{i}.json')
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            paths.append(path)
+        results = []
+        for jobs in [1, 2]:
+            generator = SchemaGenerator(route_by='type', max_routes=3)
+            schema_maps, error_logs = generator.deduce_schema_from_paths(
+                paths, jobs=jobs)
+            results.append((
+                {route: generator.flatten_schema(schema_map)
+                 for route, schema_map in schema_maps.items()},
+                [error['msg'] for error in error_logs],
+            ))
+        self.assertEqual(['click', 'view', None], list(results[1][0]))
+        self.assertEqual(results[0][0], results[1][0])
+        # The routes of the files are merged after the records were read.
+        self.assertEqual(
+            ['Ignoring record with route "3", more than 3 routes'],
+            results[0][1])
+        self.assertEqual(
+            ['Ignoring route "3", more than 3 routes'], results[1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import json
+import unittest
+from io import StringIO
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.generate_schema import bq_schema_to_map
+from bigquery_schema_generator.schema_diff import summarize_changes
+
+EXISTING_SCHEMA = [
+    {'name': 'a', 'type': 'INTEGER', 'mode': 'NULLABLE'},
+    {'name': 'b', 'type': 'STRING', 'mode': 'REQUIRED'},
+    {'name': 'd', 'type': 'DATE', 'mode': 'NULLABLE'},
+    {'name': 'r', 'type': 'RECORD', 'mode': 'NULLABLE', 'fields': [
+        {'name': 'x', 'type': 'INTEGER', 'mode': 'NULLABLE'},
+        {'name': 'y', 'type': 'STRING', 'mode': 'NULLABLE'},
+    ]},
+    {'name': 's', 'type': 'STRING', 'mode': 'NULLABLE'},
+]
+
+RECORDS = [
+    {'a': 1, 'b': 'x', 'd': '2020-01-01', 'r': {'x': 1}, 's': 'x'},
+    {'a': 1.5, 'b': None, 'r': [{'x': 1.5, 'y': 'y'}], 's': 1},
+    {'n': '2', 'z': None},
+]
+
+
+class TestSchemaDiff(unittest.TestCase):
+    def test_diff_schema(self):
+        generator = SchemaGenerator(input_format='dict', infer_mode=True)
+        schema_map = bq_schema_to_map(EXISTING_SCHEMA)
+        old_schema_map = copy.deepcopy(schema_map)
+        schema_map, _ = generator.deduce_schema(RECORDS, schema_map=schema_map)
+        changes = generator.diff_schema(old_schema_map, schema_map)
+        self.assertEqual([
+            ('widened', 'a', 'INTEGER', 'FLOAT'),
+            ('relaxed', 'b', 'STRING', 'STRING'),
+            ('added', 'n', None, 'INTEGER'),
+            ('repeated', 'r', 'RECORD', 'RECORD'),
+            ('widened', 'r.x', 'INTEGER', 'FLOAT'),
+            ('ignored', 's', 'STRING', None),
+        ], [
+            (c['change'], c['path'], c['old_type'], c['new_type'])
+            for c in changes
+        ])
+        self.assertEqual('REQUIRED', changes[1]['old_mode'])
+        self.assertEqual('NULLABLE', changes[1]['new_mode'])
+        self.assertEqual(
+            '1 added, 2 widened, 1 relaxed, 1 repeated, 1 ignored',
+            summarize_changes(changes))
+
+    def test_no_changes(self):
+        generator = SchemaGenerator(input_format='dict')
+        schema_map = bq_schema_to_map(EXISTING_SCHEMA)
+        old_schema_map = copy.deepcopy(schema_map)
+        schema_map, _ = generator.deduce_schema(
+            RECORDS[:1], schema_map=schema_map)
+        self.assertEqual([], generator.diff_schema(old_schema_map, schema_map))
+
+    def test_run_with_diff_file(self):
+        generator = SchemaGenerator(input_format='dict', keep_nulls=True)
+        diff_file = StringIO()
+        generator.run(
+            input_file=RECORDS[2:],
+            output_file=StringIO(),
+            schema_map=bq_schema_to_map(EXISTING_SCHEMA),
+            diff_file=diff_file,
+        )
+        changes = json.loads(diff_file.getvalue())
+        self.assertEqual(
+            [('added', 'n'), ('added', 'z')],
+            [(c['change'], c['path']) for c in changes])
+        self.assertEqual({
+            'change': 'added',
+            'path': 'z',
+            'old_mode': None,
+            'old_type': None,
+            'new_mode': 'NULLABLE',
+            'new_type': 'STRING',
+        }, changes[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import unittest
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.generate_schema import bq_schema_to_map
+from bigquery_schema_generator.shape_cache import MIN_LOOKUPS
+from bigquery_schema_generator.shape_cache import ShapeCache
+from .data_reader import DataReader
+
+
+class TestShapeCache(unittest.TestCase):
+    def test_fingerprint(self):
+        cache = ShapeCache(SchemaGenerator().infer_value_type, 10)
+        a = cache.fingerprint({'a': 1, 'b': '2', 'c': 'x', 'd': ''}, 0)
+        self.assertEqual(
+            ('a', 'INTEGER', 'b', 'QINTEGER', 'c', 'STRING', 'd', ''), a)
+        # Same shape, different values.
+        self.assertEqual(
+            a, cache.fingerprint({'a': 5, 'b': '7', 'c': 'y', 'd': ''}, 0))
+        # Different order of the keys.
+        self.assertNotEqual(
+            a, cache.fingerprint({'b': '2', 'a': 1, 'c': 'x', 'd': ''}, 0))
+        # The distinct elements of an array.
+        self.assertEqual(
+            cache.fingerprint({'r': [{'x': 1}, {'x': 2}, {}]}, 0),
+            cache.fingerprint({'r': [{'x': 3}, {}]}, 0))
+        # A record with an '__array__' key is not an array.
+        self.assertNotEqual(
+            cache.fingerprint({'a': {'__array__': 'INTEGER'}}, 0),
+            cache.fingerprint({'a': [1]}, 0))
+
+    def test_max_size_and_disable(self):
+        cache = ShapeCache(SchemaGenerator().infer_value_type, 2)
+        schema_map = {}
+        for i in range(3):
+            cache.add(cache.lookup(schema_map, {f'k{i}': 1}))
+        self.assertEqual(1, len(cache.fingerprints))
+        # A different schema_map starts from an empty cache.
+        self.assertIsNot(True, cache.lookup({}, {'k2': 1}))
+
+        # Almost all records have different shapes.
+        for i in range(MIN_LOOKUPS):
+            cache.lookup(schema_map, {f'k{i}': 1})
+        self.assertFalse(cache.enabled)
+
+    def test_deduce_schema_skips_known_shapes(self):
+        generator = SchemaGenerator(shape_cache_size=10)
+        input_data = ['{ "a": 1, "r": { "b": "x" } }'] * 5 + [
+            '{ "a": 1.5, "r": { "b": null } }',
+            '{ "a": 2, "r": { "b": "y" } }',
+        ]
+        schema_map, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual(5, generator.shape_cache.hits)
+        self.assertEqual(2, generator.shape_cache.misses)
+        self.assertEqual('FLOAT', schema_map['a']['info']['type'])
+
+    def test_errors_are_not_skipped(self):
+        generator = SchemaGenerator(shape_cache_size=10)
+        input_data = [
+            '{ "r": { "b": 1 } }',
+            '{ "r": [{ "b": 1 }] }',
+            '{ "r": { "b": 1 } }',
+            '{ "r": { "b": 1 } }',
+        ]
+        _, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual(
+            [2, 3, 4], [error['line_number'] for error in error_logs])
+
+    def test_disabled_with_field_stats(self):
+        generator = SchemaGenerator(shape_cache_size=10, field_stats=True)
+        self.assertIsNone(generator.shape_cache)
+
+
+class TestShapeCacheDataChunks(unittest.TestCase):
+    """Verify that the shape cache does not change the schema or the errors
+    of the test cases of 'testdata.txt', with each record repeated.
+    """
+
+    def test_all_data_chunks(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        testdata_path = os.path.join(dir_path, 'testdata.txt')
+        with open(testdata_path) as testdatafile:
+            data_reader = DataReader(testdatafile)
+            while True:
+                chunk = data_reader.read_chunk()
+                if chunk is None:
+                    break
+                with self.subTest(line_number=chunk['line_number']):
+                    self.verify_data_chunk(chunk)
+
+    def verify_data_chunk(self, chunk):
+        data_flags = chunk['data_flags']
+        input_format = 'csv' if ('csv' in data_flags) else 'json'
+        records = chunk['records']
+        if input_format == 'csv':
+            records = records[:1] + [r for r in records[1:] for _ in range(3)]
+        else:
+            records = [r for r in records for _ in range(3)]
+
+        results = []
+        for shape_cache_size in [None, 100]:
+            generator = SchemaGenerator(
+                input_format=input_format,
+                infer_mode=('infer_mode' in data_flags),
+                keep_nulls=('keep_nulls' in data_flags),
+                quoted_values_are_strings=(
+                    'quoted_values_are_strings' in data_flags),
+                sanitize_names=('sanitize_names' in data_flags),
+                ignore_invalid_lines=('ignore_invalid_lines' in data_flags),
+                preserve_input_sort_order=(
+                    'preserve_input_sort_order' in data_flags),
+                shape_cache_size=shape_cache_size,
+            )
+            existing_schema_map = None
+            if chunk['existing_schema']:
+                existing_schema_map = bq_schema_to_map(
+                    json.loads(chunk['existing_schema']))
+            try:
+                schema_map, error_logs = generator.deduce_schema(
+                    records, schema_map=existing_schema_map)
+            except Exception as e:
+                results.append(repr(e))
+                continue
+            results.append(
+                (generator.flatten_schema(schema_map), error_logs))
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
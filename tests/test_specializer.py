@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import unittest
+from collections import OrderedDict
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.generate_schema import bq_schema_to_map
+from bigquery_schema_generator.shape_cache import MIN_LOOKUPS
+from bigquery_schema_generator.specializer import SchemaSpecializer
+from .data_reader import DataReader
+
+
+class TestSpecializer(unittest.TestCase):
+    def compile(self, records, **options):
+        generator = SchemaGenerator(input_format='dict', **options)
+        schema_map, _ = generator.deduce_schema(records)
+        specializer = SchemaSpecializer(generator, 1)
+        specializer.schema_map = schema_map
+        specializer.compile()
+        return specializer.function
+
+    def test_scalar_predicates(self):
+        match = self.compile([{
+            'i': 1, 'f': 1.5, 'b': True, 's': 'x', 'd': '2020-01-01',
+            'q': '1.5', 'n': None,
+        }])
+        self.assertTrue(match({'i': 2, 'f': 3, 'b': False, 's': '1'}))
+        self.assertTrue(match({'d': '2021-12-31', 'q': '2'}))
+        self.assertTrue(match({}))
+        self.assertFalse(match({'i': 1.5}))
+        self.assertFalse(match({'i': 2**63}))
+        self.assertFalse(match({'i': True}))
+        self.assertFalse(match({'i': '1'}))
+        self.assertFalse(match({'s': 1}))
+        self.assertFalse(match({'d': '2020-01-01T00:00:00'}))
+        # A null in a filled column, a key of a 'soft' entry, a new column.
+        self.assertFalse(match({'i': None}))
+        self.assertFalse(match({'n': None}))
+        self.assertFalse(match({'x': 1}))
+
+    def test_nulls_and_arrays(self):
+        match = self.compile([
+            {'i': 1, 'a': [1, 2]},
+            {'i': None, 'a': []},
+        ])
+        self.assertTrue(match({'i': None, 'a': None}))
+        self.assertTrue(match({'a': []}))
+        self.assertTrue(match({'a': [1, 2, 3]}))
+        self.assertFalse(match({'a': 1}))
+        self.assertFalse(match({'a': [1, 'x']}))
+        self.assertFalse(match({'i': [1]}))
+
+    def test_nested_records(self):
+        match = self.compile([
+            {'r': {'x': 1, 's': 'a'}, 'rs': [{'y': 2.5}]},
+        ])
+        self.assertTrue(match({'r': {'x': 2}, 'rs': [{'y': 1}, {'y': 2.0}]}))
+        self.assertFalse(match({'r': {}}))
+        self.assertFalse(match({'r': {'x': 'a'}}))
+        self.assertFalse(match({'r': {'z': 1}}))
+        self.assertFalse(match({'r': [{'x': 1}]}))
+        self.assertFalse(match({'rs': [{'y': 1}, {}]}))
+        self.assertFalse(match({'rs': {'y': 1}}))
+
+    def test_ignore_and_json_entries(self):
+        match = self.compile(
+            [{'x': 1, 'j': {'a': 1, 'b': 2}, 'r': {'x': 1}},
+             {'x': 'a', 'r': {'x': 'a'}}],
+            max_record_keys=1,
+        )
+        self.assertTrue(match({'x': 2.5, 'j': {'c': [1, 'x']}}))
+        self.assertFalse(match({'x': [1]}))
+        self.assertFalse(match({'j': None}))
+        # The 'ignore' entries of nested RECORDs are not specialized.
+        self.assertFalse(match({'r': {'x': 1}}))
+
+    def test_csv_empty_values(self):
+        generator = SchemaGenerator(input_format='csvdictreader')
+        schema_map, _ = generator.deduce_schema([
+            OrderedDict([('a', '1'), ('s', 'x')]),
+            OrderedDict([('a', ''), ('s', 'y')]),
+        ])
+        specializer = SchemaSpecializer(generator, 1)
+        specializer.schema_map = schema_map
+        specializer.compile()
+        self.assertTrue(specializer.function({'a': '', 's': 'z'}))
+        self.assertFalse(specializer.function({'a': '2', 's': ''}))
+
+    def test_deduce_schema_skips_matching_records(self):
+        generator = SchemaGenerator(specialize_after=2)
+        input_data = ['{ "a": 1, "r": { "b": "x" } }'] * 5 + [
+            '{ "a": 1.5, "r": { "b": null } }',
+            '{ "a": 2, "r": { "b": "y" } }',
+            '{ "a": 3, "r": { "b": null } }',
+            '{ "a": 4, "r": { "b": null } }',
+        ]
+        schema_map, error_logs = generator.deduce_schema(input_data)
+        specializer = generator.specializer
+        # Compiled after the 2nd record, and again 2 records after the miss
+        # of the 6th record, with the 'a' FLOAT and the 'r.b' not filled.
+        # The stale function still accepts the 7th record.
+        self.assertEqual(2, specializer.compilations)
+        self.assertEqual(5, specializer.hits)
+        self.assertEqual(2, specializer.misses)
+        self.assertEqual('FLOAT', schema_map['a']['info']['type'])
+        self.assertFalse(schema_map['r']['info']['fields']['b']['filled'])
+
+    def test_errors_invalidate_function(self):
+        generator = SchemaGenerator(specialize_after=1)
+        input_data = [
+            '{ "r": { "b": 1 } }',
+            '{ "r": [{ "b": 1 }] }',
+            '{ "r": { "b": 1 } }',
+            '{ "r": { "b": 1 } }',
+        ]
+        _, error_logs = generator.deduce_schema(input_data)
+        self.assertEqual(
+            [2, 3, 4], [error['line_number'] for error in error_logs])
+
+    def test_disabled_on_unstable_shapes(self):
+        generator = SchemaGenerator(input_format='dict', specialize_after=1)
+        generator.deduce_schema(
+            [{f'k{i}': 1} for i in range(2 * MIN_LOOKUPS)])
+        self.assertFalse(generator.specializer.enabled)
+        self.assertIsNone(generator.specializer.function)
+
+    def test_disabled_with_field_stats(self):
+        generator = SchemaGenerator(specialize_after=10, field_stats=True)
+        self.assertIsNone(generator.specializer)
+
+
+class TestSpecializerDataChunks(unittest.TestCase):
+    """Verify that the specializer does not change the schema or the errors
+    of the test cases of 'testdata.txt', with each record repeated.
+    """
+
+    def test_all_data_chunks(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        testdata_path = os.path.join(dir_path, 'testdata.txt')
+        with open(testdata_path) as testdatafile:
+            data_reader = DataReader(testdatafile)
+            while True:
+                chunk = data_reader.read_chunk()
+                if chunk is None:
+                    break
+                with self.subTest(line_number=chunk['line_number']):
+                    self.verify_data_chunk(chunk)
+
+    def verify_data_chunk(self, chunk):
+        data_flags = chunk['data_flags']
+        input_format = 'csv' if ('csv' in data_flags) else 'json'
+        records = chunk['records']
+        if input_format == 'csv':
+            records = records[:1] + [r for r in records[1:] for _ in range(3)]
+        else:
+            records = [r for r in records for _ in range(3)]
+
+        results = []
+        for specialize_after in [None, 1]:
+            generator = SchemaGenerator(
+                input_format=input_format,
+                infer_mode=('infer_mode' in data_flags),
+                keep_nulls=('keep_nulls' in data_flags),
+                quoted_values_are_strings=(
+                    'quoted_values_are_strings' in data_flags),
+                sanitize_names=('sanitize_names' in data_flags),
+                ignore_invalid_lines=('ignore_invalid_lines' in data_flags),
+                preserve_input_sort_order=(
+                    'preserve_input_sort_order' in data_flags),
+                specialize_after=specialize_after,
+            )
+            existing_schema_map = None
+            if chunk['existing_schema']:
+                existing_schema_map = bq_schema_to_map(
+                    json.loads(chunk['existing_schema']))
+            try:
+                schema_map, error_logs = generator.deduce_schema(
+                    records, schema_map=existing_schema_map)
+            except Exception as e:
+                results.append(repr(e))
+                continue
+            results.append(
+                (generator.flatten_schema(schema_map), error_logs))
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
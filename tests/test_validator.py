@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from io import StringIO
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.generate_schema import SchemaIncompatibleError
+from bigquery_schema_generator.generate_schema import bq_schema_to_map
+from bigquery_schema_generator.validator import compile_schema_map
+
+EXISTING_SCHEMA = [
+    {'name': 'id', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+    {'name': 'score', 'type': 'FLOAT', 'mode': 'NULLABLE'},
+    {'name': 'name', 'type': 'STRING', 'mode': 'NULLABLE'},
+    {'name': 'tags', 'type': 'STRING', 'mode': 'REPEATED'},
+    {'name': 'payload', 'type': 'JSON', 'mode': 'NULLABLE'},
+    {'name': 'User', 'type': 'RECORD', 'mode': 'NULLABLE', 'fields': [
+        {'name': 'login', 'type': 'STRING', 'mode': 'REQUIRED'},
+        {'name': 'age', 'type': 'INTEGER', 'mode': 'NULLABLE'},
+    ]},
+]
+
+
+class TestValidator(unittest.TestCase):
+    def validate(self, records, **options):
+        generator = SchemaGenerator(input_format='dict', **options)
+        error_logs = generator.validate(
+            records, bq_schema_to_map(EXISTING_SCHEMA))
+        return [error['msg'] for error in error_logs]
+
+    def test_compile_schema_map(self):
+        root = compile_schema_map(bq_schema_to_map(EXISTING_SCHEMA))
+        self.assertEqual(('id',), root.required_keys)
+        user = root.fields['user']
+        self.assertEqual('User', user.name)
+        self.assertEqual(('login',), user.required_keys)
+        self.assertEqual('INTEGER', user.fields['age'].type)
+
+    def test_valid_records(self):
+        self.assertEqual([], self.validate([
+            {'id': 1},
+            {'id': '2', 'score': 3, 'name': '2020-01-01', 'tags': []},
+            {'id': 3, 'score': '1.5', 'tags': ['a', '1'], 'name': None},
+            {'id': 4, 'payload': {'any': [1, 'x']}, 'user': None},
+            {'ID': 5, 'user': {'login': 'x', 'AGE': '7'}},
+            {'id': 6, 'user': {}, 'unknown': None},
+        ]))
+
+    def test_violations(self):
+        self.assertEqual([
+            'New column "color" is not in the existing schema',
+            'Field "id" must be widened from INTEGER to FLOAT',
+            'Field "name" of type STRING cannot hold a value of type INTEGER',
+            'REQUIRED field "id" is null',
+            'Field "tags" of mode REPEATED cannot hold a value of mode'
+            ' NULLABLE',
+            'Field "score" of mode NULLABLE cannot hold a value of mode'
+            ' REPEATED',
+            'REQUIRED field "id" is missing',
+            'Field "User.age" must be widened from INTEGER to FLOAT',
+            'REQUIRED field "User.login" is missing',
+            'Field "User.age" of type INTEGER cannot hold a value of type'
+            ' quoted BOOLEAN',
+            'Field "name" of type STRING cannot hold a value of type RECORD',
+            'Elements of "tags" must be the same compatible type',
+        ], self.validate([
+            {'id': 1, 'color': 'red'},
+            {'id': 1.5, 'name': 3},
+            {'id': None, 'tags': 'a'},
+            {'id': 1, 'score': [1.0]},
+            {'user': {'age': '1.5'}},
+            {'id': 1, 'user': {'login': 'x', 'age': 'true'}},
+            {'id': 1, 'name': {'a': 1}},
+            {'id': 1, 'tags': ['a', 1]},
+        ]))
+
+    def test_keep_nulls_reports_null_new_columns(self):
+        self.assertEqual([
+            'New column "unknown" is not in the existing schema',
+        ], self.validate([{'id': 1, 'unknown': []}], keep_nulls=True))
+
+    def test_valid_shapes_are_cached(self):
+        generator = SchemaGenerator(input_format='dict', max_error_samples=3)
+        error_logs = generator.validate(
+            [{'id': 1}] * 5 + [{'id': 1, 'name': 1}] * 3,
+            bq_schema_to_map(EXISTING_SCHEMA),
+        )
+        # The invalid shape is never cached, so each record is reported.
+        self.assertEqual(1, len(error_logs))
+        self.assertEqual(3, error_logs[0]['count'])
+        self.assertEqual(6, error_logs[0]['line_number'])
+
+    def test_fail_fast(self):
+        generator = SchemaGenerator(input_format='dict', fail_fast=True)
+        with self.assertRaises(SchemaIncompatibleError) as context:
+            generator.validate(
+                [{'id': 1}, {'id': 2, 'user': {'login': 1}}, {'id': 'x'}],
+                bq_schema_to_map(EXISTING_SCHEMA),
+            )
+        self.assertEqual(2, context.exception.line_number)
+        self.assertEqual('User.login', context.exception.path)
+        self.assertEqual({'login': 1}, context.exception.record['user'])
+        self.assertEqual(1, len(generator.error_logs))
+
+    def test_csv(self):
+        generator = SchemaGenerator(input_format='csv')
+        schema_map = bq_schema_to_map([
+            {'name': 'id', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+            {'name': 'score', 'type': 'FLOAT', 'mode': 'NULLABLE'},
+        ])
+        error_logs = generator.validate(
+            StringIO('id,score\n1,\n,2.5\n3,x\n'), schema_map)
+        self.assertEqual([
+            {'line_number': 2, 'input_path': None,
+             'msg': 'REQUIRED field "id" is null'},
+            {'line_number': 3, 'input_path': None,
+             'msg': 'Field "score" of type FLOAT cannot hold a value of type'
+                    ' STRING'},
+        ], error_logs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017 Brian T. Park
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from bigquery_schema_generator.generate_schema import SchemaGenerator
+from bigquery_schema_generator.variants import CHUNK_SIZE
+from bigquery_schema_generator.variants import SchemaVariants
+from bigquery_schema_generator.variants import parse_variant
+
+RECORDS = [
+    '{ "a": "1", "b": null, "c": 1 }',
+    '{ "a": "2", "c": "x" }',
+] * (CHUNK_SIZE // 2 + 1)
+
+VARIANTS = {
+    'nulls': {'keep_nulls': True},
+    'strings': {'quoted_values_are_strings': True},
+    'strings_nulls': {'quoted_values_are_strings': True, 'keep_nulls': True},
+}
+
+
+class TestVariants(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_same_schemas_as_separate_runs(self):
+        variants = SchemaVariants(SchemaGenerator(), VARIANTS)
+        variants.deduce_schema(RECORDS)
+        results = variants.results()
+        self.assertEqual([None] + list(VARIANTS), list(results))
+        for name, (schema_map, error_logs) in results.items():
+            generator = SchemaGenerator(**VARIANTS.get(name, {}))
+            expected_map, expected_logs = generator.deduce_schema(RECORDS)
+            self.assertEqual(
+                generator.flatten_schema(expected_map),
+                variants.generators[name].flatten_schema(schema_map))
+            self.assertEqual(expected_logs, error_logs)
+
+    def test_shared_schema_maps(self):
+        variants = SchemaVariants(SchemaGenerator(), VARIANTS)
+        self.assertEqual(2, len(variants.schema_maps))
+        self.assertIs(variants.deducers[None], variants.deducers['nulls'])
+        self.assertIs(
+            variants.deducers['strings'], variants.deducers['strings_nulls'])
+
+    def test_fixed_options(self):
+        with self.assertRaises(Exception):
+            SchemaVariants(SchemaGenerator(), {'csv': {'input_format': 'csv'}})
+        with self.assertRaises(Exception):
+            SchemaVariants(SchemaGenerator(line_cache_size=10), VARIANTS)
+
+    def test_run(self):
+        output_file = io.StringIO()
+        SchemaVariants(SchemaGenerator(), VARIANTS).run(
+            RECORDS, output_file, output_dir=self.tmpdir)
+        self.assertEqual(
+            ['a'], [field['name'] for field in json.loads(
+                output_file.getvalue())])
+        self.assertEqual(
+            ['nulls.schema.json', 'strings.schema.json',
+             'strings_nulls.schema.json'],
+            sorted(os.listdir(self.tmpdir)))
+        with open(os.path.join(self.tmpdir, 'strings_nulls.schema.json')) as f:
+            self.assertEqual([
+                {'mode': 'NULLABLE', 'name': 'a', 'type': 'STRING'},
+                {'mode': 'NULLABLE', 'name': 'b', 'type': 'STRING'},
+            ], json.load(f))
+
+    def test_parse_variant(self):
+        self.assertEqual(
+            ('strings', {'quoted_values_are_strings': True,
+                         'keep_nulls': False}),
+            parse_variant('strings:quoted_values_are_strings,no_keep_nulls'))
+        self.assertEqual(('base', {}), parse_variant('base'))
+        with self.assertRaises(ValueError):
+            parse_variant('a/b:keep_nulls')
+        with self.assertRaises(ValueError):
+            parse_variant('a:input_format')
+
+
+if __name__ == '__main__':
+    unittest.main()